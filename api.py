@@ -0,0 +1,468 @@
+"""
+Read-only HTTP API over the library for dashboards and other local tools.
+
+    GET /books?words=storm&author=Ada+Brown&status=reading&fav=true
+    GET /quotes?words=storm&book=Dune&order_by=id&limit=50&after=<cursor>
+
+Responses are JSON objects with the rows under the name of the endpoint and
+the cursor of the next page under `next`. Rows have the fields of the JSON
+lines written by `list --format jsonl`.
+"""
+
+import json
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+
+from commands.print import BOOK_FIELDS, QUOTE_FIELDS, book_rows, quote_rows
+from commands.utils import TrackedRows, author_hint, title_hint
+from models import BookStatus
+from repositories import AuthorRepository, BookRepository, QuoteRepository, ResultCache
+from repositories.cache import data_generation, library_id
+from repositories.enums import BookOrder, QuoteOrder
+
+HOST = "127.0.0.1"
+LIST_CHUNK_SIZE = 500
+# Rows are sent in chunks of about this many bytes.
+CHUNK_BYTES = 64 * 1024
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class DataVersion:
+    """
+    ID and data generation of the library, only read again from the database
+    once its files changed. Every write goes through the WAL or, in rollback
+    journal mode, the database file itself, so while neither changed the
+    version last read is still the current one. The ID keeps a recreated
+    library from reusing the versions of the one it replaced.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.paths = [db_path, db_path.with_name(f"{db_path.name}-wal")]
+        self._lock = threading.Lock()
+        self._signature = None
+        self._version = None
+
+    def _files(self) -> tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+
+        return tuple(signature)
+
+    def cached(self) -> str | None:
+        signature = self._files()
+        with self._lock:
+            return self._version if signature == self._signature else None
+
+    def replaced(self) -> bool:
+        """
+        Whether the database file is another one than when last read, so
+        pooled connections still point to the one it replaced.
+        """
+
+        current = self._files()[0]
+        with self._lock:
+            previous = self._signature[0] if self._signature else None
+
+        return None not in (current, previous) and current[0] != previous[0]
+
+    def read(self, session: Session) -> str:
+        # The files are looked at first, so a write in between makes the next
+        # request read the version again instead of keeping a stale one.
+        signature = self._files()
+        version = f"{library_id(session)}-{data_generation(session)}"
+        with self._lock:
+            self._signature, self._version = signature, version
+
+        return version
+
+
+def etag(version: str) -> str:
+    return f'"{version}"'
+
+
+def matches(if_none_match: str | None, version: str | None) -> bool:
+    if if_none_match is None or version is None:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag(version) in tags
+
+
+@dataclass
+class Listing:
+    rows: TrackedRows
+    fields: list[str]
+    to_tuples: Callable
+    cursor: Callable[[object], str]
+    limit: int | None
+
+
+class Params:
+    """
+    Query parameters of a request, each parsed as it is read. Whatever is
+    left unread once the endpoint is done is an unknown parameter.
+    """
+
+    def __init__(self, query: str) -> None:
+        self._values = parse_qs(query, keep_blank_values=True)
+
+    def _get(self, name: str) -> str | None:
+        values = self._values.pop(name, None)
+        return values[-1] if values else None
+
+    def text(self, name: str) -> str | None:
+        return self._get(name)
+
+    def words(self, name: str) -> list[str] | None:
+        values = self._values.pop(name, [])
+        words = [w for value in values for w in value.split(",") if w.strip()]
+        return words or None
+
+    def boolean(self, name: str) -> bool | None:
+        value = self._get(name)
+        if value is None:
+            return None
+
+        if value.lower() in ("1", "true", "yes"):
+            return True
+        if value.lower() in ("0", "false", "no"):
+            return False
+
+        raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must be true or false")
+
+    def positive(self, name: str) -> int | None:
+        value = self._get(name)
+        if value is None:
+            return None
+
+        if not value.isdigit() or int(value) < 1:
+            raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must be a positive number")
+
+        return int(value)
+
+    def choice(self, name: str, enum: type[Enum]) -> Enum | None:
+        value = self._get(name)
+        if value is None:
+            return None
+
+        try:
+            return enum(value)
+        except ValueError:
+            choices = ", ".join(member.value for member in enum)
+            raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must be one of: {choices}")
+
+    def check_unused(self) -> None:
+        if self._values:
+            unknown = ", ".join(sorted(self._values))
+            raise APIError(HTTPStatus.BAD_REQUEST, f"unknown parameters: {unknown}")
+
+
+def _author_id(session: Session, name: str | None) -> int | None:
+    if name is None:
+        return None
+
+    author = AuthorRepository().get_by_name(session, name)
+    if author is None:
+        raise APIError(
+            HTTPStatus.NOT_FOUND,
+            f'the author "{name}" was not found{author_hint(session, name)}',
+        )
+
+    return author.id
+
+
+def list_books(session: Session, params: Params, cache: ResultCache) -> Listing:
+    book_repo = BookRepository()
+    words = params.words("words")
+    author_id = _author_id(session, params.text("author"))
+    status = params.choice("status", BookStatus)
+    fav = params.boolean("fav")
+    order_by = params.choice("order_by", BookOrder) or BookOrder.title
+    reverse = params.boolean("reverse") or False
+    limit = params.positive("limit")
+    after = params.text("after")
+    params.check_unused()
+
+    rows = book_repo.list(
+        session,
+        words=words,
+        author_id=author_id,
+        status=status,
+        fav=fav,
+        order_by=order_by,
+        reverse_order=reverse,
+        limit=limit,
+        after=after,
+        chunk_size=LIST_CHUNK_SIZE,
+        cache=cache,
+    )
+    return Listing(
+        TrackedRows(rows),
+        BOOK_FIELDS,
+        book_rows,
+        lambda last: book_repo.cursor(last, order_by),
+        limit,
+    )
+
+
+def list_quotes(session: Session, params: Params, cache: ResultCache) -> Listing:
+    quote_repo = QuoteRepository()
+    words = params.words("words")
+    author_id = _author_id(session, params.text("author"))
+
+    book_id = None
+    title = params.text("book")
+    if title is not None:
+        book = BookRepository().get_by_title(session, title)
+        if book is None:
+            raise APIError(
+                HTTPStatus.NOT_FOUND,
+                f'the book "{title}" was not found{title_hint(session, title)}',
+            )
+        book_id = book.id
+
+    fav = params.boolean("fav")
+    order_by = params.choice("order_by", QuoteOrder)
+    reverse = params.boolean("reverse") or False
+    limit = params.positive("limit")
+    after = params.text("after")
+    params.check_unused()
+
+    rows = quote_repo.list(
+        session,
+        words=words,
+        book_id=book_id,
+        author_id=author_id,
+        fav=fav,
+        order_by=order_by,
+        reverse_order=reverse,
+        limit=limit,
+        after=after,
+        chunk_size=LIST_CHUNK_SIZE,
+        cache=cache,
+    )
+    return Listing(
+        TrackedRows(rows),
+        QUOTE_FIELDS,
+        quote_rows,
+        lambda last: quote_repo.cursor(last, order_by),
+        limit,
+    )
+
+
+ENDPOINTS = {
+    "/books": ("books", list_books),
+    "/quotes": ("quotes", list_quotes),
+}
+
+
+class ChunkedWriter:
+    """
+    Writes the body of a response with chunked transfer encoding, gathering
+    small writes into chunks of `CHUNK_BYTES`.
+    """
+
+    def __init__(self, wfile) -> None:
+        self.wfile = wfile
+        self._parts: list[bytes] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode()
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= CHUNK_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._size:
+            self.wfile.write(b"%X\r\n%s\r\n" % (self._size, b"".join(self._parts)))
+            self._parts, self._size = [], 0
+
+    def close(self) -> None:
+        self.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "clibr"
+    # Keep-alive connections hold a thread of the pool, so idle ones are
+    # closed soon.
+    timeout = 5
+
+    server: "Server"
+
+    def do_GET(self) -> None:
+        self._streaming = False
+        url = urlsplit(self.path)
+        if url.path not in ENDPOINTS:
+            self._send_error(APIError(HTTPStatus.NOT_FOUND, "no such endpoint"))
+            return
+
+        # Polls of data that didn't change are answered from the files alone.
+        if_none_match = self.headers.get("If-None-Match")
+        cached = self.server.version.cached()
+        if matches(if_none_match, cached):
+            self._send_not_modified(cached)
+            return
+
+        if self.server.version.replaced():
+            self.server.engine.dispose()
+
+        name, endpoint = ENDPOINTS[url.path]
+        session = self.server.session()
+        try:
+            version = self.server.version.read(session)
+            if matches(if_none_match, version):
+                self._send_not_modified(version)
+                return
+
+            listing = endpoint(session, Params(url.query), self.server.cache())
+            # Invalid cursors only fail once the rows are read.
+            listing.rows.empty()
+            self._send_listing(name, listing, version)
+        except APIError as e:
+            self._send_error(e)
+        except ValueError as e:
+            self._send_error(APIError(HTTPStatus.BAD_REQUEST, str(e)))
+        except SQLAlchemyError as e:
+            self.log_error("%s", e)
+            self._send_error(
+                APIError(HTTPStatus.INTERNAL_SERVER_ERROR, "something went wrong")
+            )
+        finally:
+            session.close()
+
+    def _send_listing(self, name: str, listing: Listing, version: str) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("ETag", etag(version))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self._streaming = True
+
+        body = ChunkedWriter(self.wfile)
+        body.write(f'{{"{name}": [')
+        separator = "\n"
+        for row in listing.to_tuples(listing.rows):
+            body.write(separator)
+            body.write(json.dumps(dict(zip(listing.fields, row)), ensure_ascii=False))
+            separator = ",\n"
+
+        next_page = None
+        if listing.limit is not None and listing.rows.count == listing.limit:
+            next_page = listing.cursor(listing.rows.last)
+
+        body.write(f'\n], "next": {json.dumps(next_page)}}}\n')
+        body.close()
+
+    def _send_not_modified(self, version: str) -> None:
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header("ETag", etag(version))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send_error(self, error: APIError) -> None:
+        if self._streaming:
+            # The status was sent along with the first rows. Closing the
+            # connection before the last chunk tells the client the body is
+            # incomplete, where an error response would corrupt it.
+            self.log_error("listing cut short: %s", error)
+            self.close_connection = True
+            return
+
+        body = json.dumps({"error": str(error)}).encode()
+        self.send_response(error.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-") -> None:
+        if self.server.log_requests:
+            super().log_request(code, size)
+
+
+class Server(HTTPServer):
+    """
+    HTTP server that answers requests on a fixed pool of threads, each with
+    a session and a result cache of its own that are reused across requests.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        engine,
+        db_path: Path,
+        cache_path: Path,
+        cache_max_bytes: int,
+        threads: int = 8,
+        log_requests: bool = False,
+    ) -> None:
+        super().__init__((HOST, port), Handler)
+        self.engine = engine
+        self.version = DataVersion(db_path)
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.log_requests = log_requests
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="clibr-api")
+        self._local = threading.local()
+
+    def session(self) -> Session:
+        # Closing a session returns its connection to the pool, and the next
+        # request of the thread opens a new transaction with the same session.
+        if not hasattr(self._local, "session"):
+            self._local.session = Session(self.engine)
+
+        return self._local.session
+
+    def cache(self) -> ResultCache:
+        if not hasattr(self._local, "cache"):
+            self._local.cache = ResultCache(self.cache_path, self.cache_max_bytes)
+
+        return self._local.cache
+
+    def process_request(self, request, client_address) -> None:
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
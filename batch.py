@@ -0,0 +1,148 @@
+"""
+Runs many clibr commands in one process, grouping their writes into a few
+transactions instead of committing once per command.
+"""
+
+import json
+import os
+import shlex
+import sys
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import batched
+
+import daemon
+
+# Top-level commands a batch can run. The rest manage the database or the
+# process itself and need a connection of their own.
+COMMANDS = {"books", "quotes", "stats"}
+
+
+@dataclass
+class Result:
+    line: int
+    args: list[str]
+    ok: bool
+    error: str | None = None
+
+
+def parse_line(line: str) -> list[str] | None:
+    """
+    Arguments of a batch line, written like in a shell or as a JSON array.
+    A leading `clibr` is dropped so existing scripts can be piped in as they
+    are. Blank lines and comments return None.
+    """
+
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    if line.startswith("["):
+        args = json.loads(line)
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            raise ValueError("JSON lines must be an array of strings")
+    else:
+        args = shlex.split(line)
+
+    if args and args[0] == "clibr":
+        args = args[1:]
+
+    return args
+
+
+def _commands(lines: Iterable[str]) -> Iterator[tuple[int, list[str], str | None]]:
+    for number, line in enumerate(lines, start=1):
+        try:
+            args = parse_line(line)
+        except ValueError as e:
+            yield number, [], f"can't be parsed: {e}"
+            continue
+
+        if args is not None:
+            yield number, args, None
+
+
+@contextmanager
+def savepoints(connection) -> Iterator[None]:
+    """
+    Keeps a savepoint open on `connection` while sessions run on it. A session
+    bound to a connection in a transaction uses its innermost savepoint, which
+    its commit releases; reopening one right after means the next rollback of
+    the command only undoes its own changes and never the whole batch.
+    """
+
+    from sqlalchemy import event
+    from sqlmodel import Session
+
+    def reopen(session, transaction):
+        if (
+            session.bind is connection
+            and transaction.parent is None
+            and connection.in_transaction()
+            and not connection.in_nested_transaction()
+        ):
+            connection.begin_nested()
+
+    event.listen(Session, "after_transaction_end", reopen)
+    try:
+        yield
+    finally:
+        event.remove(Session, "after_transaction_end", reopen)
+
+
+def _run_line(command, args: list[str]) -> tuple[dict, str | None]:
+    if not args or args[0] not in COMMANDS:
+        name = args[0] if args else "nothing"
+        allowed = ", ".join(sorted(COMMANDS))
+        return {}, f"{name} can't run in a batch, use one of: {allowed}"
+
+    response = daemon.run(command, {"args": args, "cwd": os.getcwd()})
+    if response.get("fallback"):
+        return {}, "it asks for input, pass every option it needs"
+
+    if response["exit_code"] != 0:
+        return response, f"exit code {response['exit_code']}"
+
+    # Commands report most errors without failing, on stderr.
+    if response["stderr"]:
+        message = response["stderr"].strip().splitlines()[-1]
+        return response, message.removeprefix("Oops, ")
+
+    return response, None
+
+
+def run(
+    command,
+    connection,
+    lines: Iterable[str],
+    batch_size: int = 100,
+) -> Iterator[Result]:
+    """
+    Runs the commands in `lines` with `command`, the root click command of the
+    CLI, while every session they open is bound to `connection`. Each group of
+    `batch_size` commands is committed at once, and each command runs in a
+    savepoint that is rolled back when it fails, so the rest still apply.
+    Their output is written as they finish, and a result is yielded for each.
+    """
+
+    for group in batched(_commands(lines), batch_size):
+        with connection.begin(), savepoints(connection):
+            for number, args, error in group:
+                savepoint = connection.begin_nested()
+                response = {}
+                if error is None:
+                    response, error = _run_line(command, args)
+
+                sys.stdout.write(response.get("stdout", ""))
+                sys.stderr.write(response.get("stderr", ""))
+
+                # The command may have ended the savepoint and opened another.
+                savepoint = connection.get_nested_transaction() or savepoint
+                if savepoint.is_active:
+                    if error is None:
+                        savepoint.commit()
+                    else:
+                        savepoint.rollback()
+
+                yield Result(number, args, error is None, error)
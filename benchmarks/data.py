@@ -0,0 +1,141 @@
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from itertools import batched
+
+from sqlmodel import Session
+
+from models import BookStatus, normalize_key
+from repositories import AuthorRepository, BookRepository, QuoteRepository
+
+# fmt: off
+FIRST_NAMES = [
+    "Ada", "Brandon", "Clara", "Daniel", "Elena", "Frank", "Grace", "Hugo",
+    "Irene", "Jorge", "Karen", "Leo", "Maria", "Nora", "Oscar", "Paula",
+    "Quentin", "Rosa", "Samuel", "Teresa", "Ursula", "Victor", "Wendy", "Yusuf",
+]
+LAST_NAMES = [
+    "Alvarez", "Brown", "Castillo", "Dumas", "Evans", "Fischer", "Garcia",
+    "Hughes", "Ibarra", "Jordan", "Kowalski", "Lewis", "Moreno", "Nakamura",
+    "Okafor", "Petrov", "Quinn", "Rossi", "Sanderson", "Tanaka", "Ueda",
+    "Vega", "Walker", "Zhang",
+]
+WORDS = [
+    "ancient", "art", "blood", "book", "bright", "city", "cold", "dark",
+    "dawn", "dream", "empire", "end", "eye", "fire", "forest", "garden",
+    "glass", "gold", "heart", "house", "iron", "king", "last", "light",
+    "long", "lost", "love", "memory", "moon", "night", "ocean", "old",
+    "path", "queen", "rain", "red", "river", "road", "sea", "secret",
+    "shadow", "silent", "silver", "sky", "song", "stone", "storm", "star",
+    "sun", "time", "tower", "war", "water", "way", "wind", "winter",
+    "wolf", "world", "year", "young",
+]
+# fmt: on
+
+STATUS_WEIGHTS = {
+    BookStatus.pending: 5,
+    BookStatus.reading: 1,
+    BookStatus.finished: 3,
+    BookStatus.wanted: 1,
+}
+
+
+@dataclass
+class LibrarySize:
+    authors: int
+    books: int
+    quotes: int
+    multi_author_ratio: float = 0.1
+    fav_ratio: float = 0.1
+
+    @classmethod
+    def from_rows(cls, rows: int) -> "LibrarySize":
+        """
+        Size used by the benchmarks for a library of `rows` books and `rows`
+        quotes, with a fifth as many authors.
+        """
+
+        return cls(authors=max(rows // 5, 1), books=rows, quotes=rows)
+
+
+def author_names(count: int) -> Iterator[str]:
+    combinations = len(FIRST_NAMES) * len(LAST_NAMES)
+    for i in range(count):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        suffix = f" {i // combinations + 1}" if i >= combinations else ""
+        yield f"{first} {last}{suffix}"
+
+
+def title(rng: random.Random, number: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(2, 5))
+    return f"The {' '.join(words)} {number}".capitalize()
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 30))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_library(
+    session: Session,
+    size: LibrarySize,
+    seed: int = 0,
+    batch_size: int = 10_000,
+) -> None:
+    """
+    Fills the database with a synthetic library of the received size. The same
+    seed always generates the same library, so results can be compared across
+    runs and versions.
+    """
+
+    rng = random.Random(seed)
+    author_repo = AuthorRepository()
+    book_repo = BookRepository()
+    quote_repo = QuoteRepository()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+
+    author_ids = []
+    for names in batched(author_names(size.authors), batch_size):
+        ids = author_repo.bulk_add(session, list(names))
+        author_ids.extend(ids[normalize_key(name)] for name in names)
+        session.commit()
+
+    book_ids = []
+    for numbers in batched(range(size.books), batch_size):
+        books = [
+            {
+                "title": title(rng, number),
+                "status": rng.choices(statuses, weights)[0],
+                "fav": rng.random() < size.fav_ratio,
+            }
+            for number in numbers
+        ]
+        ids = book_repo.bulk_add(session, books)
+        added = [ids[normalize_key(book["title"])] for book in books]
+        book_ids.extend(added)
+
+        links = []
+        for book_id in added:
+            authors = 1
+            if rng.random() < size.multi_author_ratio:
+                authors = rng.randint(2, 3)
+
+            for author_id in rng.sample(author_ids, min(authors, len(author_ids))):
+                links.append((book_id, author_id))
+
+        book_repo.bulk_link_authors(session, links)
+        session.commit()
+
+    for numbers in batched(range(size.quotes), batch_size):
+        quotes = [
+            {
+                "quote": sentence(rng),
+                "book_id": rng.choice(book_ids),
+                "fav": rng.random() < size.fav_ratio,
+            }
+            for _ in numbers
+        ]
+        quote_repo.bulk_add(session, quotes)
+        session.commit()
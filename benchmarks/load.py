@@ -0,0 +1,223 @@
+"""
+Load tests the JSON API of `clibr serve` with concurrent keep-alive clients,
+first with plain requests and then polling with the ETags they got back.
+
+    python -m benchmarks.load --rows 100000 --clients 16 --output load.json
+    python -m benchmarks.load --url http://127.0.0.1:8765
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from sqlmodel import Session, create_engine
+
+import config
+from migrations import migrate
+
+from .data import LibrarySize, generate_library
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_PATHS = [
+    "/books?limit=50",
+    "/books?words=storm&limit=50",
+    "/books?status=reading&fav=true",
+    "/quotes?limit=50",
+    "/quotes?words=storm,night&limit=50",
+]
+STARTUP_TIMEOUT = 60
+
+
+@contextmanager
+def library_server(rows: int, seed: int, threads: int):
+    """
+    Serves a synthetic library of `rows` books and quotes and yields its URL.
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_home = Path(tmp)
+        db_path = config_home / config.Config().APP_NAME / "clibr.db"
+        db_path.parent.mkdir(parents=True)
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        migrate(engine)
+        with Session(engine) as session:
+            generate_library(session, LibrarySize.from_rows(rows), seed=seed)
+        engine.dispose()
+
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                str(ROOT / "main.py"),
+                "serve",
+                "--port",
+                "0",
+                "--threads",
+                str(threads),
+            ],
+            cwd=ROOT,
+            env=os.environ | {"XDG_CONFIG_HOME": str(config_home)},
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            line = server.stderr.readline()
+            if "http://" not in line:
+                raise RuntimeError(f"the server didn't start: {line}")
+
+            yield line.split("http://")[1].split(",")[0].strip()
+        finally:
+            server.terminate()
+            server.wait(timeout=STARTUP_TIMEOUT)
+
+
+def client(
+    address: str,
+    paths: list[str],
+    requests: int,
+    etags: dict[str, str] | None,
+    latencies: list[float],
+    statuses: Counter,
+) -> None:
+    host, _, port = address.partition(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=60)
+    try:
+        for i in range(requests):
+            path = paths[i % len(paths)]
+            headers = {}
+            if etags is not None and path in etags:
+                headers["If-None-Match"] = etags[path]
+
+            start = time.perf_counter()
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] += 1
+    finally:
+        connection.close()
+
+
+def run_phase(
+    address: str,
+    paths: list[str],
+    clients: int,
+    requests: int,
+    etags: dict[str, str] | None = None,
+) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    workers = [
+        threading.Thread(
+            target=client,
+            args=(address, paths, requests, etags, latencies, statuses),
+        )
+        for _ in range(clients)
+    ]
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "per_second": len(latencies) / elapsed,
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+def fetch_etags(address: str, paths: list[str]) -> dict[str, str]:
+    host, _, port = address.partition(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=60)
+    etags = {}
+    for path in paths:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        if response.getheader("ETag") is not None:
+            etags[path] = response.getheader("ETag")
+
+    connection.close()
+    return etags
+
+
+def load_test(address: str, paths: list[str], clients: int, requests: int) -> dict:
+    results = {}
+    for name, etags in [
+        ("plain", None),
+        ("conditional", fetch_etags(address, paths)),
+    ]:
+        results[name] = run_phase(address, paths, clients, requests, etags)
+        measurement = results[name]
+        print(
+            f"{name:<12} {measurement['per_second']:>9.0f} req/s  "
+            f"p50 {measurement['p50'] * 1000:>7.2f} ms  "
+            f"p95 {measurement['p95'] * 1000:>7.2f} ms  "
+            f"p99 {measurement['p99'] * 1000:>7.2f} ms  "
+            f"{measurement['statuses']}",
+            file=sys.stderr,
+        )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Load test a server that is already running")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the server")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Per client")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("load.json"))
+    args = parser.parse_args()
+
+    if args.url is not None:
+        address = urlsplit(args.url).netloc
+        results = load_test(address, args.paths, args.clients, args.requests)
+    else:
+        with library_server(args.rows, args.seed, args.threads) as address:
+            results = load_test(address, args.paths, args.clients, args.requests)
+
+    report = {
+        "version": config.Config().APP_VERSIOn,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "url": args.url,
+        "rows": None if args.url else args.rows,
+        "threads": None if args.url else args.threads,
+        "clients": args.clients,
+        "requests": args.requests,
+        "paths": args.paths,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compares the throughput of the storage profiles on the same synthetic library:
+bulk inserts, many small transactions and the repository reads.
+
+    python -m benchmarks.profiles --rows 100000 --output profiles.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine, update
+
+import config
+import storage
+from migrations import migrate
+from models import Book
+
+from .data import LibrarySize, generate_library
+from .run import measure, repository_cases
+
+
+def small_transactions(session: Session, book_ids: int, count: int, seed: int) -> int:
+    """
+    Updates `count` random books one transaction at a time, like a user
+    editing their library. This is where syncing to disk on commit shows.
+    """
+
+    rng = random.Random(seed)
+    for _ in range(count):
+        session.execute(
+            update(Book)
+            .where(Book.id == rng.randint(1, book_ids))
+            .values(fav=rng.random() < 0.5)
+        )
+        session.commit()
+
+    return count
+
+
+def benchmark_profile(
+    name: str,
+    rows: int,
+    transactions: int,
+    repeat: int,
+    seed: int,
+) -> list[dict]:
+    results = []
+
+    def record(case: str, measurement: dict, operations: int | None = None) -> None:
+        if operations is not None:
+            measurement["per_second"] = operations / max(measurement["median"], 1e-9)
+
+        results.append({"profile": name, "name": case, **measurement})
+        rate = measurement.get("per_second")
+        print(
+            f"{name:<9} {case:<28} {measurement['median']:>9.3f} s"
+            + (f" {rate:>12,.0f}/s" if rate is not None else ""),
+            file=sys.stderr,
+        )
+
+    profile = storage.PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{Path(tmp) / 'clibr.db'}", poolclass=QueuePool
+        )
+        storage.configure(engine, lambda: profile)
+        migrate(engine)
+
+        with Session(engine) as session:
+            size = LibrarySize.from_rows(rows)
+            record(
+                "generate",
+                measure(lambda: generate_library(session, size, seed=seed), 1),
+                size.authors + size.books + size.quotes,
+            )
+            record(
+                "small transactions",
+                measure(
+                    lambda: small_transactions(session, rows, transactions, seed),
+                    repeat,
+                ),
+                transactions,
+            )
+
+            for case, fn in repository_cases(session).items():
+                record(case, measure(fn, repeat))
+
+        engine.dispose()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=list(storage.PROFILES),
+        default=list(storage.PROFILES),
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("profiles.json"))
+    args = parser.parse_args()
+
+    results = []
+    for name in args.profiles:
+        results.extend(
+            benchmark_profile(
+                name, args.rows, args.transactions, args.repeat, args.seed
+            )
+        )
+
+    report = {
+        "version": config.Config().APP_VERSIOn,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "rows": args.rows,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Times the repository methods and the CLI commands on synthetic libraries of
+increasing size and writes the results to a JSON report.
+
+    python -m benchmarks.run --sizes 10000 100000 --output report.json
+    python -m benchmarks.run --baseline old.json --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+from sqlmodel import Session, create_engine
+
+import config
+from migrations import migrate
+from repositories import BookRepository, QuoteRepository, StatsRepository
+from repositories.enums import BookOrder, QuoteOrder
+
+from .data import LibrarySize, generate_library
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def consume(rows) -> int:
+    count = 0
+    for _ in rows:
+        count += 1
+
+    return count
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+
+    measurement = {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+    }
+    if isinstance(result, int):
+        measurement["rows"] = result
+
+    return measurement
+
+
+def repository_cases(session: Session) -> dict[str, Callable[[], object]]:
+    books = BookRepository()
+    quotes = QuoteRepository()
+    stats = StatsRepository()
+
+    return {
+        "books.list first page": lambda: len(
+            books.list(session, order_by=BookOrder.title, limit=50)
+        ),
+        "books.list all": lambda: consume(
+            books.list(session, order_by=BookOrder.title, chunk_size=500)
+        ),
+        "books.list words": lambda: consume(
+            books.list(session, words=["storm"], chunk_size=500)
+        ),
+        "books.count": lambda: books.count(session),
+        "books.export_rows": lambda: consume(books.export_rows(session)),
+        "quotes.list first page": lambda: len(
+            quotes.list(session, order_by=QuoteOrder.quote, limit=50)
+        ),
+        "quotes.list all": lambda: consume(
+            quotes.list(session, order_by=QuoteOrder.quote, chunk_size=500)
+        ),
+        "quotes.list words": lambda: consume(
+            quotes.list(session, words=["storm"], chunk_size=500)
+        ),
+        "quotes.count": lambda: quotes.count(session),
+        "quotes.export_rows": lambda: consume(quotes.export_rows(session)),
+        "stats.summary": lambda: stats.summary(session),
+    }
+
+
+def cli_cases(workdir: Path) -> dict[str, list[str]]:
+    return {
+        "--help": ["--help"],
+        "books list --limit 50": [
+            "books",
+            "list",
+            "--limit",
+            "50",
+            "--no-pager",
+            "--no-cache",
+        ],
+        "books list --limit 50 cached": [
+            "books",
+            "list",
+            "--limit",
+            "50",
+            "--no-pager",
+        ],
+        "books list --format csv": ["books", "list", "--format", "csv", "--no-cache"],
+        "books list --total": ["books", "list", "--total"],
+        "quotes list --words storm": [
+            "quotes",
+            "list",
+            "--words",
+            "storm",
+            "--format",
+            "csv",
+            "--no-cache",
+        ],
+        "quotes list --total": ["quotes", "list", "--total"],
+        "stats": ["stats", "--raw"],
+        "books export": ["books", "export", "--path", str(workdir / "books.csv")],
+        "quotes export": ["quotes", "export", "--path", str(workdir / "quotes.csv")],
+    }
+
+
+def run_cli(args: list[str], config_home: Path) -> None:
+    env = os.environ | {"XDG_CONFIG_HOME": str(config_home)}
+    subprocess.run(
+        [sys.executable, str(ROOT / "main.py"), *args],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def measure_import(workdir: Path, kind: str, repeat: int) -> dict:
+    """
+    Imports the file written by the export benchmark into an empty library.
+    Every run gets a fresh library so they all do the same work.
+    """
+
+    def fn():
+        config_home = Path(tempfile.mkdtemp(dir=workdir))
+        run_cli([kind, "import", "--path", str(workdir / f"{kind}.csv")], config_home)
+
+    return measure(fn, repeat)
+
+
+def benchmark_size(rows: int, repeat: int, seed: int) -> list[dict]:
+    results = []
+
+    def record(group: str, name: str, measurement: dict) -> None:
+        results.append({"size": rows, "group": group, "name": name, **measurement})
+        print(
+            f"{rows:>9} {group:<11} {name:<28} {measurement['median']:>9.3f} s",
+            file=sys.stderr,
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        config_home = workdir / "config"
+        db_path = config_home / config.Config().APP_NAME / "clibr.db"
+        db_path.parent.mkdir(parents=True)
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        migrate(engine)
+
+        with Session(engine) as session:
+            size = LibrarySize.from_rows(rows)
+            record(
+                "data",
+                "generate",
+                measure(lambda: generate_library(session, size, seed=seed), 1),
+            )
+
+            for name, fn in repository_cases(session).items():
+                record("repository", name, measure(fn, repeat))
+
+        engine.dispose()
+
+        for name, args in cli_cases(workdir).items():
+            record("cli", name, measure(partial(run_cli, args, config_home), repeat))
+
+        for kind in ["books", "quotes"]:
+            record("cli", f"{kind} import", measure_import(workdir, kind, repeat))
+
+    return results
+
+
+def compare(results: list[dict], baseline: dict) -> None:
+    """
+    Prints how the median of every benchmark changed against a previous
+    report. Ratios above 1 mean the benchmark got slower.
+    """
+
+    previous = {
+        (result["size"], result["group"], result["name"]): result["median"]
+        for result in baseline["results"]
+    }
+    for result in results:
+        key = (result["size"], result["group"], result["name"])
+        if key not in previous:
+            continue
+
+        ratio = result["median"] / max(previous[key], 1e-9)
+        print(
+            f"{result['size']:>9} {result['group']:<11} {result['name']:<28} "
+            f"{previous[key]:>9.3f} s -> {result['median']:>9.3f} s ({ratio:.2f}x)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--baseline", type=Path, help="Report to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.sizes:
+        results.extend(benchmark_size(rows, args.repeat, args.seed))
+
+    report = {
+        "version": config.Config().APP_VERSIOn,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline is not None:
+        compare(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,13 @@
-from .books import app as books_app
-from .quotes import app as quotes_app
+# The command modules are imported on demand, see main.LazyGroup.
+def __getattr__(name: str):
+    if name == "books_app":
+        from .books import app
+
+        return app
+
+    if name == "quotes_app":
+        from .quotes import app
+
+        return app
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
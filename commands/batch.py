@@ -0,0 +1,96 @@
+import json
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Optional
+
+import typer
+from rich.console import Console
+from sqlalchemy.exc import SQLAlchemyError
+from typing_extensions import Annotated
+
+import batch
+import config
+
+app = typer.Typer()
+cfg = config.Config()
+err_console = Console(stderr=True)
+
+
+@app.command(
+    "batch",
+    help="Run many books and quotes commands at once, one per line",
+)
+def run_batch(
+    ctx: typer.Context,
+    file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--path",
+            help="File with the commands, written like in a shell or as JSON arrays. Read from stdin by default",
+        ),
+    ] = None,
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            "--batch-size",
+            min=1,
+            help="Number of commands committed per transaction",
+        ),
+    ] = 100,
+    report: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--report",
+            help="Also write the result of every command to this file as JSON lines",
+        ),
+    ] = None,
+) -> None:
+    root = ctx.find_root().command
+    failed = 0
+    total = 0
+
+    # stdin is left open, it belongs to the process.
+    with ExitStack() as files:
+        try:
+            lines = files.enter_context(open(file)) if file is not None else sys.stdin
+            report_file = (
+                files.enter_context(open(report, "w")) if report is not None else None
+            )
+        except OSError as e:
+            err_console.print(f"Oops, {e.filename} couldn't be opened: {e.strerror}")
+            raise typer.Exit(code=1)
+
+        try:
+            with cfg.DB_WRITE_ENGINE.connect() as connection, cfg.bound_to(connection):
+                for result in batch.run(root, connection, lines, batch_size):
+                    total += 1
+                    if not result.ok:
+                        failed += 1
+                        err_console.print(
+                            f"Oops, line {result.line} failed: {result.error}",
+                            highlight=False,
+                        )
+
+                    if report_file is not None:
+                        report_file.write(
+                            json.dumps(
+                                {
+                                    "line": result.line,
+                                    "args": result.args,
+                                    "ok": result.ok,
+                                    "error": result.error,
+                                }
+                            )
+                            + "\n"
+                        )
+        except SQLAlchemyError:
+            err_console.print(
+                "Oops, something went wrong! The commands of the last batch have "
+                "been rolled back"
+            )
+            raise typer.Exit(code=1)
+
+    err_console.print(f"{total - failed} of {total} commands succeeded")
+    if failed:
+        raise typer.Exit(code=1)
@@ -1,4 +1,5 @@
 import csv
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -11,16 +12,30 @@ from sqlmodel import Session
 from typing_extensions import Annotated
 
 import config
+import profiling
 from models import BookStatus
-from repositories import AuthorRepository, BookRepository
+from repositories import AuthorRepository, BookRepository, ResultCache
 from repositories.enums import BookOrder
-from .utils import get_or_create_author, get_or_create_book
-from .print import print_raw_books_output, print_formatted_books_output
+from . import importers
+from .utils import (
+    TrackedRows,
+    author_hint,
+    confirm_unlocked,
+    get_or_create_author,
+    get_or_create_book,
+    parse_assignments,
+    parse_bool,
+    parse_id_ranges,
+)
+from .print import OutputFormat, print_formatted_books_output, write_books_output
 
 app = typer.Typer()
 cfg = config.Config()
 err_console = Console(stderr=True)
 
+EXPORT_BUFFER_SIZE = 1 << 20
+LIST_CHUNK_SIZE = 500
+
 
 @app.command(
     "add",
@@ -64,7 +79,7 @@ def add_book(
         ),
     ] = False,
 ):
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
     with Session(engine) as session:
         try:
@@ -78,18 +93,83 @@ def add_book(
             session.rollback()
 
 
+def book_filters(session: Session, where: list[tuple[str, str]]) -> dict:
+    """
+    Turns `--where` assignments into the filters taken by the repository.
+    """
+
+    filters = {}
+    for field, value in where:
+        if field == "words":
+            filters["words"] = [word for word in value.split(",") if word.strip()]
+        elif field == "author":
+            author = AuthorRepository().get_by_name(session, value)
+            if author is None:
+                raise ValueError(
+                    f'the author "{value}" was not found{author_hint(session, value)}'
+                )
+
+            filters["author_id"] = author.id
+        elif field == "status":
+            filters["status"] = BookStatus(value.lower())
+        elif field == "fav":
+            filters["fav"] = parse_bool(value)
+        elif field == "id":
+            filters["ids"] = parse_id_ranges([value])
+        else:
+            raise ValueError(f"books can't be filtered by {field}")
+
+    return filters
+
+
+def book_changes(changes: list[tuple[str, str]]) -> dict:
+    """
+    Turns `--set` assignments into the new values of the book fields.
+    """
+
+    values = {}
+    for field, value in changes:
+        if field == "title":
+            values["title"] = value
+        elif field == "status":
+            values["status"] = BookStatus(value.lower())
+        elif field == "fav":
+            values["fav"] = parse_bool(value)
+        else:
+            raise ValueError(f"books can't be updated by {field}")
+
+    return values
+
+
 @app.command(
     "update",
-    help="Update a book in your library",
+    help="Update the books matching the filters in a single statement",
 )
-def update_book(
-    book_id: Annotated[
-        int,
+def update_books(
+    book_ids: Annotated[
+        list[str],
         typer.Option(
             "--id",
-            help="ID of the book to update",
+            callback=parse_id_ranges,
+            help="IDs of the books to update, like 7, 1,2,3 or 10-20",
         ),
-    ],
+    ] = None,
+    where: Annotated[
+        list[str],
+        typer.Option(
+            "--where",
+            callback=parse_assignments,
+            help="Filter as field=value, with fields words, author, status, fav or id. Can be repeated",
+        ),
+    ] = None,
+    new_values: Annotated[
+        list[str],
+        typer.Option(
+            "--set",
+            callback=parse_assignments,
+            help="New value as field=value, with fields title, status or fav. Can be repeated",
+        ),
+    ] = None,
     new_title: Annotated[
         str,
         typer.Option(
@@ -123,34 +203,63 @@ def update_book(
             help="Unmarks the book as a favorite",
         ),
     ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only show how many books would be updated",
+        ),
+    ] = False,
 ):
+    if not book_ids and not where:
+        err_console.print("Specify the books to update with --id or --where")
+        raise typer.Exit(code=1)
+
     book_repo = BookRepository()
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
     with Session(engine) as session:
         try:
-            original_book = book_repo.get_by_id(session, book_id)
-            if original_book is None:
-                pprint(f"No book found with received ID {book_id}")
-                return
-
-            if (
-                new_title is None
-                and new_status is None
-                and mark_as_fav is None
-                and unmark_as_fav is None
-            ):
+            filters = book_filters(session, where)
+            if book_ids:
+                filters["ids"] = book_ids
+
+            changes = book_changes(new_values)
+            if new_title is not None:
+                changes["title"] = new_title
+            if new_status is not None:
+                changes["status"] = new_status
+            if mark_as_fav or unmark_as_fav:
+                changes["fav"] = bool(mark_as_fav)
+
+            if not changes:
                 pprint(
                     "There are no attributes marked to update. The book hasn't been updated"
                 )
                 return
 
-            new_fav = mark_as_fav if mark_as_fav else False if unmark_as_fav else None
-            book_repo.update(session, book_id, new_title, new_status, new_fav)
+            single_book = len(book_ids) == 1 and book_ids[0][0] == book_ids[0][1]
+            if "title" in changes and (where or not single_book):
+                raise ValueError("a title can only be set on a single book by --id")
+
+            if dry_run:
+                count = book_repo.count(session, **filters)
+                pprint(f"{count} books would be updated")
+                return
+
+            updated = book_repo.update_matching(session, changes, **filters)
             session.commit()
+            if not updated:
+                pprint("No books with the specified criteria were found")
+                return
+
+            pprint(f"{updated} books have been updated")
+        except ValueError as e:
+            err_console.print(f"Oops, {e}!")
         except SQLAlchemyError as e:
             err_console.print(
-                "Oops, something went wrong! The book couldn't be updated"
+                "Oops, something went wrong! The books couldn't be updated"
             )
             if cfg.DEBUG:
                 err_console.print(e)
@@ -219,12 +328,51 @@ def list_books(
             help="Limit the number of results displayed",
         ),
     ] = None,
+    page_size: Annotated[
+        int,
+        typer.Option(
+            "--page-size",
+            min=1,
+            help="Display results in pages of this size and print the cursor of the next page",
+        ),
+    ] = None,
+    after: Annotated[
+        str,
+        typer.Option(
+            "--after",
+            help="Cursor printed by a previous page to continue from",
+        ),
+    ] = None,
     raw: Annotated[
         bool,
         typer.Option(
             "--raw",
             is_flag=True,
-            help="Display raw output without formatting",
+            help="Display raw output without formatting. Same as --format csv",
+        ),
+    ] = False,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            show_choices=True,
+            help="Format of the output. Everything but table is written as is to stdout",
+        ),
+    ] = OutputFormat.table.value,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            is_flag=True,
+            help="Run the query even if its results are cached",
+        ),
+    ] = False,
+    no_pager: Annotated[
+        bool,
+        typer.Option(
+            "--no-pager",
+            is_flag=True,
+            help="Print every page of the table instead of piping them to $PAGER",
         ),
     ] = False,
     total: Annotated[
@@ -247,35 +395,131 @@ def list_books(
                 author = author_repo.get_by_name(session, book_author)
                 if author is None:
                     err_console.print(
-                        "The author specified was not found",
+                        "The author specified was not found"
+                        + author_hint(session, book_author)
                     )
                     return
 
             author_id = author.id if author else None
-            results = book_repo.list(
-                session,
-                words=words_in_title,
-                author_id=author_id,
-                status=book_status,
-                fav=book_fav,
-                order_by=order_by,
-                reverse_order=reverse_order,
-                limit=limit,
+            if total:
+                count = book_repo.count(
+                    session,
+                    words=words_in_title,
+                    author_id=author_id,
+                    status=book_status,
+                    fav=book_fav,
+                )
+                pprint(f"Total: {count}")
+                return
+
+            cache = None
+            if not no_cache:
+                cache = ResultCache(cfg.CACHE_PATH, cfg.CACHE_MAX_BYTES)
+
+            results = TrackedRows(
+                profiling.rows(
+                    book_repo.list(
+                        session,
+                        words=words_in_title,
+                        author_id=author_id,
+                        status=book_status,
+                        fav=book_fav,
+                        order_by=order_by,
+                        reverse_order=reverse_order,
+                        limit=page_size if page_size is not None else limit,
+                        after=after,
+                        chunk_size=LIST_CHUNK_SIZE,
+                        cache=cache,
+                    )
+                )
             )
-            if not len(results):
+            if results.empty():
                 err_console.print(
                     "No books with the specified criteria were found in your library",
                 )
                 return
 
-            if total:
-                pprint(f"Total: {len(results)}")
+            if raw:
+                output_format = OutputFormat.csv
+
+            with profiling.phase("rendering"):
+                if output_format != OutputFormat.table:
+                    write_books_output(results, output_format)
+                else:
+                    print_formatted_books_output(results, use_pager=not no_pager)
+
+            if page_size is not None and results.count == page_size:
+                next_page = book_repo.cursor(results.last, order_by)
+                err_console.print(f"Next page: --after {next_page}")
+
+        except ValueError as e:
+            err_console.print(f"Oops, {e}!")
+        except SQLAlchemyError:
+            err_console.print("Oops, something went wrong!")
+
+
+@app.command(
+    "find",
+    help="Find books by title or author even when they are misspelled, best matches first",
+)
+def find_books(
+    book_title: Annotated[
+        str,
+        typer.Option(
+            "--title",
+            "-t",
+            help="Title of the book, or something close to it",
+        ),
+    ] = None,
+    book_author: Annotated[
+        str,
+        typer.Option(
+            "--author",
+            "-a",
+            help="Name of the author, or something close to it",
+        ),
+    ] = None,
+    limit: Annotated[
+        int,
+        typer.Option(
+            "--limit",
+            min=1,
+            help="Maximum number of books displayed",
+        ),
+    ] = 10,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            show_choices=True,
+            help="Format of the output. Everything but table is written as is to stdout",
+        ),
+    ] = OutputFormat.table.value,
+):
+    if book_title is None and book_author is None:
+        err_console.print("Specify the title or the author of the books to find")
+        raise typer.Exit(code=1)
+
+    book_repo = BookRepository()
+    engine = cfg.DB_ENGINE
+
+    with Session(engine) as session:
+        try:
+            results = book_repo.find_similar(
+                session,
+                title=book_title,
+                author=book_author,
+                limit=limit,
+            )
+            if not results:
+                err_console.print("No books similar to that were found in your library")
                 return
 
-            if raw:
-                print_raw_books_output(results)
-            else:
-                print_formatted_books_output(results)
+            with profiling.phase("rendering"):
+                if output_format != OutputFormat.table:
+                    write_books_output(results, output_format)
+                else:
+                    print_formatted_books_output(results, use_pager=False)
 
         except SQLAlchemyError:
             err_console.print("Oops, something went wrong!")
@@ -283,28 +527,122 @@ def list_books(
 
 @app.command(
     "delete",
-    help="Delete a book form your library",
+    help="Delete the books matching the filters, along with their quotes",
 )
-def delete_book(
-    book_id: Annotated[
-        int,
+def delete_books(
+    book_ids: Annotated[
+        list[str],
         typer.Option(
             "--id",
-            prompt="ID of the book",
-            help="ID of the book",
+            callback=parse_id_ranges,
+            help="IDs of the books to delete, like 7, 1,2,3 or 10-20",
         ),
-    ],
+    ] = None,
+    words_in_title: Annotated[
+        list[str],
+        typer.Option(
+            "--words",
+            "-w",
+            help="List of words to filter books by title",
+        ),
+    ] = None,
+    book_author: Annotated[
+        str,
+        typer.Option(
+            "--author",
+            "-a",
+            help="Name of the author to filter by",
+        ),
+    ] = None,
+    book_status: Annotated[
+        BookStatus,
+        typer.Option(
+            "--status",
+            "-s",
+            help="Status of the books to filter by",
+        ),
+    ] = None,
+    book_fav: Annotated[
+        bool,
+        typer.Option(
+            "--fav",
+            "-f",
+            is_flag=True,
+            help="Filter books by whether they are favorites or not",
+        ),
+    ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only show how many books would be deleted",
+        ),
+    ] = False,
+    yes: Annotated[
+        bool,
+        typer.Option(
+            "--yes",
+            "-y",
+            is_flag=True,
+            help="Don't ask for confirmation",
+        ),
+    ] = False,
 ):
-    typer.confirm(
-        f"Are you sure you want to delete the book with ID '{book_id}'?",
-        abort=True,
-    )
+    if (
+        not book_ids
+        and not words_in_title
+        and book_author is None
+        and book_status is None
+        and book_fav is None
+    ):
+        err_console.print("Specify at least one filter for the books to delete")
+        raise typer.Exit(code=1)
+
+    book_repo = BookRepository()
+    engine = cfg.DB_WRITE_ENGINE
 
-    engine = cfg.DB_ENGINE
     with Session(engine) as session:
         try:
-            BookRepository().delete(session, book_id)
+            author_id = None
+            if book_author is not None:
+                author = AuthorRepository().get_by_name(session, book_author)
+                if author is None:
+                    err_console.print(
+                        "The author specified was not found"
+                        + author_hint(session, book_author)
+                    )
+                    return
+
+                author_id = author.id
+
+            filters = {
+                "words": words_in_title or None,
+                "author_id": author_id,
+                "status": book_status,
+                "fav": book_fav,
+                "ids": book_ids,
+            }
+            count = book_repo.count(session, **filters)
+            if not count:
+                err_console.print(
+                    "No books with the specified criteria were found in your library"
+                )
+                return
+
+            pprint(f"{count} books match the specified criteria")
+            if dry_run:
+                return
+
+            if not yes:
+                confirm_unlocked(
+                    session,
+                    f"Are you sure you want to delete {count} books and their quotes?",
+                )
+
+            deleted = book_repo.delete_matching(session, **filters)
             session.commit()
+            pprint(f"{deleted} books have been deleted")
         except SQLAlchemyError:
             err_console.print(
                 "Oops, something went wrong! Changes have been rolled back"
@@ -330,28 +668,32 @@ def export_books(
 
     with Session(engine) as session:
         try:
-            results = book_repo.list(session, order_by=BookOrder.id)
-            if not len(results):
+            total = book_repo.count_export_rows(session)
+            if not total:
                 err_console.print(
                     "No books found in your library",
                 )
                 return
 
             file_path = file if file is not None else "books.csv"
-            with open(file_path, mode="w") as books_file:
-                fieldnames = ["id", "title", "author", "status", "fav"]
-                writer = csv.DictWriter(books_file, fieldnames=fieldnames)
-
-                writer.writeheader()
-                for result in track(results, description="Exporting..."):
+            with open(
+                file_path, mode="w", newline="", buffering=EXPORT_BUFFER_SIZE
+            ) as books_file:
+                writer = csv.writer(books_file)
+
+                writer.writerow(["id", "title", "author", "status", "fav"])
+                rows = book_repo.export_rows(session)
+                for id, title, author, status, fav in track(
+                    rows, total=total, description="Exporting..."
+                ):
                     writer.writerow(
-                        {
-                            "id": result["Book"].id,
-                            "title": f"{result["Book"].title.title()}",
-                            "author": f"{result["Author"].name}",
-                            "status": result["Book"].status.capitalize(),
-                            "fav": "Yes" if result["Book"].fav else "No",
-                        }
+                        [
+                            id,
+                            title.title(),
+                            author,
+                            status.capitalize(),
+                            "Yes" if fav else "No",
+                        ]
                     )
 
                 pprint("CSV file has been successfully created")
@@ -373,29 +715,38 @@ def import_books(
             help="Optional path to the file from which books will be imported",
         ),
     ] = None,
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            "--batch-size",
+            min=1,
+            help="Number of rows inserted per transaction",
+        ),
+    ] = 1000,
 ) -> None:
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
-    with Session(engine) as session:
+    with cfg.storage_profile("bulk"), Session(engine) as session:
         try:
             file_path = file if file is not None else "books.csv"
-            with open(file_path) as books_file:
-                reader = csv.DictReader(books_file)
-                for row in track(reader, description="Importing..."):
-                    author_name = row["author"]
-                    author = get_or_create_author(session, author_name)
-                    get_or_create_book(
-                        session,
-                        row["title"],
-                        author,
-                        row["status"],
-                        True if row["fav"] == "Yes" else False,
-                    )
-
-                    session.commit()
+            with importers.csv_rows(file_path) as rows:
+                start = time.perf_counter()
+                read, added = importers.import_books(
+                    session,
+                    rows,
+                    batch_size=batch_size,
+                )
+                elapsed = time.perf_counter() - start
 
                 pprint("Import has been successful!")
+                pprint(
+                    f"{added} books added from {read} rows "
+                    f"({read / max(elapsed, 1e-9):,.0f} rows/s)"
+                )
 
+        except ValueError as e:
+            err_console.print(f"Oops, the file has an invalid row! Import failed: {e}")
+            session.rollback()
         except SQLAlchemyError:
             err_console.print("Oops, something went wrong! Import failed")
             session.rollback()
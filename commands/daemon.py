@@ -0,0 +1,52 @@
+import typer
+from rich import print as pprint
+from rich.console import Console
+from typing_extensions import Annotated
+
+import config
+import daemon
+
+app = typer.Typer()
+cfg = config.Config()
+err_console = Console(stderr=True)
+
+
+@app.command(
+    "daemon",
+    help="Keep clibr running in the background to answer commands faster",
+)
+def run_daemon(
+    ctx: typer.Context,
+    stop: Annotated[
+        bool,
+        typer.Option(
+            "--stop",
+            is_flag=True,
+            help="Stop the daemon that is running",
+        ),
+    ] = False,
+) -> None:
+    if stop:
+        if not daemon.stop(cfg.DAEMON_SOCKET):
+            err_console.print("Oops, no daemon is running")
+            raise typer.Exit(code=1)
+
+        pprint("Daemon stopped")
+        return
+
+    if daemon.running(cfg.DAEMON_SOCKET):
+        err_console.print(f"Oops, a daemon is already listening on {cfg.DAEMON_SOCKET}")
+        raise typer.Exit(code=1)
+
+    root = ctx.find_root().command
+
+    def warm_up() -> None:
+        # The first commands forwarded shouldn't pay for importing the
+        # commands, applying pending migrations or connecting to the library.
+        for name in root.list_commands(ctx):
+            root.get_command(ctx, name)
+        with cfg.DB_ENGINE.connect():
+            pass
+
+    err_console.print(f"Listening on {cfg.DAEMON_SOCKET}, stop with Ctrl+C")
+    daemon.serve(cfg.DAEMON_SOCKET, root, warm_up)
@@ -0,0 +1,162 @@
+import typer
+from rich import print as pprint
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy.exc import SQLAlchemyError
+from typing_extensions import Annotated
+
+import config
+import maintenance
+import migrations
+
+app = typer.Typer()
+cfg = config.Config()
+err_console = Console(stderr=True)
+
+
+# Keeps `db` a group of subcommands even while it only has one of them.
+@app.callback()
+def db() -> None:
+    pass
+
+
+@app.command(
+    "migrate",
+    help="Apply pending schema migrations to your library",
+)
+def migrate(
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only list the pending migrations",
+        ),
+    ] = False,
+) -> None:
+    # cfg.DB_ENGINE applies pending migrations on its own, so a bare engine is
+    # used to be able to report them.
+    engine = cfg.create_engine()
+
+    try:
+        pending = migrations.pending_migrations(engine)
+        if not pending:
+            pprint(f"The library is up to date (version {migrations.LATEST_VERSION})")
+            return
+
+        if dry_run:
+            for number, description in pending:
+                pprint(f"Pending {number}: {description}")
+            return
+
+        for number, description in migrations.migrate(engine):
+            pprint(f"Applied {number}: {description}")
+
+    except SQLAlchemyError as e:
+        err_console.print("Oops, something went wrong! Migrations couldn't be applied")
+        if cfg.DEBUG:
+            err_console.print(e)
+
+
+def print_storage(title: str, report: dict) -> None:
+    page_size = report["page_size"]
+    table = Table(title=title)
+    table.add_column("Table")
+    table.add_column("KiB", justify="right")
+    for name, size in report["tables"].items():
+        table.add_row(name, f"{size / 1024:,.0f}")
+
+    table.add_row(
+        "total",
+        f"{report['pages'] * page_size / 1024:,.0f}",
+        style="bold",
+    )
+    table.add_row("free", f"{report['free_pages'] * page_size / 1024:,.0f}")
+    pprint(table)
+
+
+@app.command(
+    "maintain",
+    help="Sweep orphaned rows, refresh the query planner statistics and give "
+    "free space back. Safe to run from cron while the library is in use",
+)
+def maintain(
+    step_pages: Annotated[
+        int,
+        typer.Option(
+            "--step-pages",
+            min=1,
+            help="Pages released in each short vacuum transaction",
+        ),
+    ] = 1000,
+    max_steps: Annotated[
+        int,
+        typer.Option(
+            "--max-steps",
+            min=0,
+            help="Stop vacuuming after this many steps",
+        ),
+    ] = 100,
+    enable_incremental_vacuum: Annotated[
+        bool,
+        typer.Option(
+            "--enable-incremental-vacuum",
+            is_flag=True,
+            help="Rewrite the library once so free space can be given back "
+            "incrementally. Blocks other commands while it runs",
+        ),
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only report orphaned rows and storage",
+        ),
+    ] = False,
+) -> None:
+    engine = cfg.DB_WRITE_ENGINE
+
+    try:
+        with engine.connect() as connection:
+            print_storage("Before", maintenance.storage_report(connection))
+
+        if dry_run:
+            with engine.connect() as connection:
+                orphans = maintenance.count_orphans(connection)
+            for name, count in orphans.items():
+                pprint(f"Orphaned {name}: {count}")
+            return
+
+        with engine.begin() as connection:
+            orphans = maintenance.sweep_orphans(connection)
+        for name, count in orphans.items():
+            pprint(f"Deleted orphaned {name}: {count}")
+
+        if enable_incremental_vacuum:
+            maintenance.enable_incremental_vacuum(engine)
+
+        with engine.begin() as connection:
+            maintenance.analyze(connection)
+            incremental = maintenance.incremental_vacuum_enabled(connection)
+
+        if incremental:
+            released = maintenance.incremental_vacuum(engine, step_pages, max_steps)
+            pprint(f"Released {released} free pages")
+        else:
+            pprint(
+                "Free space is only reused, not given back. "
+                "Run once with --enable-incremental-vacuum to change that"
+            )
+
+        with engine.connect() as connection:
+            print_storage("After", maintenance.storage_report(connection))
+
+    except SQLAlchemyError as e:
+        err_console.print("Oops, something went wrong! Maintenance couldn't finish")
+        if cfg.DEBUG:
+            err_console.print(e)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,204 @@
+"""
+Set-based CSV imports. Imports can be rerun if they are interrupted, so the
+commands run them under the bulk storage profile, trading durability for
+speed.
+"""
+
+import csv
+import hashlib
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from itertools import batched
+from pathlib import Path
+
+from rich.progress import track
+from sqlmodel import Session
+
+from models import BookStatus, normalize_key
+from repositories import AuthorRepository, BookRepository, QuoteRepository
+from repositories.cache import data_generation
+
+
+@contextmanager
+def csv_rows(path: Path | str) -> Iterator[Iterator[dict]]:
+    """
+    Rows of the CSV file at `path`, with a progress bar. The bar is closed as
+    soon as the import fails. Left to the garbage collector, it hangs the
+    process on exit.
+    """
+
+    with open(path, newline="") as f:
+        rows = track(csv.DictReader(f), description="Importing...")
+        try:
+            yield rows
+        finally:
+            rows.close()
+
+
+def quote_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def import_books(
+    session: Session,
+    rows: Iterable[dict],
+    batch_size: int = 1000,
+) -> tuple[int, int]:
+    """
+    Imports books from CSV rows with set-based inserts, committing once per
+    batch. Existing authors and titles are loaded up front so no row needs a
+    lookup of its own. Names and titles are matched by their normalized keys.
+    Books already in the library are skipped, and repeated rows for a book
+    imported in this run add its extra authors. The maps are reloaded when
+    another process changed the library since the last batch.
+
+    Returns the number of rows read and the number of books added.
+    """
+
+    author_repo = AuthorRepository()
+    book_repo = BookRepository()
+
+    generation = None
+    imported_ids: set[int] = set()
+    linked: set[tuple[int, int]] = set()
+    read = 0
+
+    for batch in batched(rows, batch_size):
+        read += len(batch)
+        if data_generation(session) != generation:
+            author_ids = author_repo.ids_by_key(session)
+            book_ids = book_repo.ids_by_key(session)
+
+        for row in batch:
+            row["author_key"] = normalize_key(row["author"])
+            row["title_key"] = normalize_key(row["title"])
+
+        new_authors = {}
+        for row in batch:
+            if row["author_key"] not in author_ids:
+                new_authors.setdefault(row["author_key"], row["author"])
+
+        author_ids.update(author_repo.bulk_add(session, list(new_authors.values())))
+
+        new_books = {}
+        for row in batch:
+            key = row["title_key"]
+            if key in book_ids or key in new_books:
+                continue
+
+            new_books[key] = {
+                "title": row["title"],
+                "status": BookStatus(row["status"].lower()),
+                "fav": row["fav"] == "Yes",
+            }
+
+        added_ids = book_repo.bulk_add(session, list(new_books.values()))
+        book_ids.update(added_ids)
+        imported_ids.update(added_ids.values())
+
+        links = {}
+        for row in batch:
+            book_id = book_ids[row["title_key"]]
+            link = (book_id, author_ids[row["author_key"]])
+            if book_id in imported_ids and link not in linked:
+                links[link] = None
+
+        book_repo.bulk_link_authors(session, list(links))
+        linked.update(links)
+
+        generation = data_generation(session)
+        session.commit()
+
+    return read, len(imported_ids)
+
+
+def import_quotes(
+    session: Session,
+    rows: Iterable[dict],
+    batch_size: int = 1000,
+) -> tuple[int, int]:
+    """
+    Imports quotes from CSV rows with set-based inserts, committing once per
+    batch. Authors and books are resolved through maps loaded up front, and
+    quotes already in the library are detected by a hash of their text so the
+    existing quotes are read only once and never kept in memory. Books that
+    aren't in the library yet are created with the author of the row. Like
+    with books, everything is reloaded if another process changed the library
+    in between batches.
+
+    Returns the number of rows read and the number of quotes added.
+    """
+
+    author_repo = AuthorRepository()
+    book_repo = BookRepository()
+    quote_repo = QuoteRepository()
+
+    generation = None
+    read = 0
+    added = 0
+
+    for batch in batched(rows, batch_size):
+        read += len(batch)
+        if data_generation(session) != generation:
+            author_ids = author_repo.ids_by_key(session)
+            book_ids = book_repo.ids_by_key(session)
+            known_quotes = {quote_hash(text) for text in quote_repo.texts(session)}
+
+        new_quotes = {}
+        for row in batch:
+            digest = quote_hash(row["quote"])
+            if digest not in known_quotes and digest not in new_quotes:
+                row["author_key"] = normalize_key(row["author"])
+                row["book_key"] = normalize_key(row["book"])
+                new_quotes[digest] = row
+
+        if not new_quotes:
+            # Nothing was written, but the generation is recorded all the
+            # same or the next batch would load everything again.
+            generation = data_generation(session)
+            session.rollback()
+            continue
+
+        new_books = {}
+        for row in new_quotes.values():
+            if row["book_key"] not in book_ids and row["book_key"] not in new_books:
+                new_books[row["book_key"]] = row
+
+        new_authors = {}
+        for row in new_books.values():
+            if row["author_key"] not in author_ids:
+                new_authors.setdefault(row["author_key"], row["author"])
+
+        author_ids.update(author_repo.bulk_add(session, list(new_authors.values())))
+
+        added_ids = book_repo.bulk_add(
+            session,
+            [{"title": row["book"]} for row in new_books.values()],
+        )
+        book_ids.update(added_ids)
+        book_repo.bulk_link_authors(
+            session,
+            [
+                (added_ids[key], author_ids[row["author_key"]])
+                for key, row in new_books.items()
+            ],
+        )
+
+        quote_repo.bulk_add(
+            session,
+            [
+                {
+                    "quote": row["quote"],
+                    "book_id": book_ids[row["book_key"]],
+                    "fav": row["fav"] == "Yes",
+                }
+                for row in new_quotes.values()
+            ],
+        )
+        generation = data_generation(session)
+        session.commit()
+
+        known_quotes.update(new_quotes)
+        added += len(new_quotes)
+
+    return read, added
@@ -1,58 +1,280 @@
-from rich import print as pprint
+import csv
+import json
+import os
+import shlex
+import subprocess
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from enum import Enum
+from itertools import islice
+from typing import Any, TextIO
+
+from rich.console import Console
 from rich.table import Table
 
+from models import BookStatus
+
+
+class OutputFormat(str, Enum):
+    table = "table"
+    csv = "csv"
+    tsv = "tsv"
+    jsonl = "jsonl"
+
+
+BOOK_FIELDS = ["id", "title", "author", "status", "fav"]
+QUOTE_FIELDS = ["id", "book", "quote", "author", "fav"]
+
+# Rows per page when the output isn't a terminal.
+PAGE_ROWS = 100
 
-def print_raw_books_output(results: list[dict]) -> None:
-    pprint("[bold]id, title, author, status, fav")
-    for result in results:
-        pprint(
-            f"{result['Book'].id},\"{result['Book'].title}\",{result['Author'].name},{result['Book'].status},{'Yes' if result['Book'].fav else 'No'}"
+
+def _page_rows(console: Console, lines_per_row: int) -> int:
+    if not console.is_terminal:
+        return PAGE_ROWS
+
+    # Leave room for the title, the header and the borders of the table.
+    return max(1, (console.size.height - 6) // lines_per_row)
+
+
+def _open_pager(console: Console) -> tuple[subprocess.Popen, Console] | None:
+    env = {**os.environ, "LESS": os.environ.get("LESS", "-R")}
+    command = shlex.split(os.environ.get("PAGER", "less"))
+    if not command:
+        # An empty $PAGER turns paging off.
+        return None
+
+    try:
+        pager = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            env=env,
         )
+    except OSError:
+        return None
+
+    pager_console = Console(
+        file=pager.stdin,
+        force_terminal=True,
+        color_system=console.color_system,
+        width=console.width,
+    )
+    return pager, pager_console
 
 
-def print_formatted_books_output(results: list[list[dict]]) -> None:
-    table = Table(title="Books", show_lines=True)
-    table.add_column("ID", style="bold", justify="center")
-    table.add_column("Title", style="bold")
-    table.add_column("Author")
-    table.add_column("Status", justify="center")
-    table.add_column("Favourite", justify="center")
+def print_paged_table(
+    rows: Iterable,
+    new_table: Callable[[bool], Table],
+    table_row: Callable[[Any], list[str]],
+    lines_per_row: int = 2,
+    use_pager: bool = True,
+) -> None:
+    """
+    Renders rows one screen at a time, pulling only as many rows from `rows`
+    as fit in the page being laid out. When the rows don't fit in a single
+    screen of a terminal, the pages are piped to $PAGER as they are rendered,
+    so the first one shows up right away no matter how many rows there are.
+    """
 
-    for result in results:
-        table.add_row(
+    console = Console()
+    page_rows = _page_rows(console, lines_per_row)
+    rows = iter(rows)
+
+    pager = None
+    output = console
+    page = list(islice(rows, page_rows))
+    first = True
+    try:
+        while page:
+            next_page = list(islice(rows, page_rows))
+            if first and next_page and use_pager and console.is_terminal:
+                opened = _open_pager(console)
+                if opened is not None:
+                    pager, output = opened
+
+            table = new_table(first)
+            for row in page:
+                table.add_row(*table_row(row))
+
+            output.print(table)
+            page = next_page
+            first = False
+    except (BrokenPipeError, KeyboardInterrupt):
+        # The pager was closed before reaching the end.
+        pass
+    finally:
+        if pager is not None:
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+
+            pager.wait()
+
+
+def _books_table(first_page: bool) -> Table:
+    table = Table(
+        title="Books" if first_page else None,
+        show_lines=True,
+        expand=True,
+    )
+    table.add_column("ID", style="bold", justify="center", width=7)
+    table.add_column("Title", style="bold", ratio=4)
+    table.add_column("Author", ratio=3)
+    table.add_column("Status", justify="center", width=10)
+    table.add_column("Favourite", justify="center", width=9)
+    return table
+
+
+def print_formatted_books_output(
+    results: Iterable[dict],
+    use_pager: bool = True,
+) -> None:
+    print_paged_table(
+        results,
+        _books_table,
+        lambda result: [
             f"{result['Book'].id}",
             result["Book"].title.title(),
             result["Author"].name,
             result["Book"].status.capitalize(),
             "Yes" if result["Book"].fav else "No",
-        )
-
-    pprint(table)
-
+        ],
+        use_pager=use_pager,
+    )
 
-def print_raw_quotes_output(results: list[dict]) -> None:
-    pprint("[bold]id, book, quote, author, fav")
-    for result in results:
-        pprint(
-            f"{result['Quote'].id},\"{result['Book'].title}\",\"{result['Quote'].quote}\",{result['Author'].name},{'Yes' if result['Quote'].fav else 'No'}"
-        )
 
+def _quotes_table(first_page: bool) -> Table:
+    table = Table(
+        title="Quotes" if first_page else None,
+        show_lines=True,
+        expand=True,
+    )
+    table.add_column("ID", style="bold", justify="center", width=7)
+    table.add_column("Book", style="bold", ratio=2)
+    table.add_column("Quote", overflow="ignore", ratio=5)
+    table.add_column("Author", ratio=2)
+    table.add_column("Favourite", justify="center", width=9)
+    return table
 
-def print_formatted_quotes_output(results: list[dict]) -> None:
-    table = Table(title="Quotes", show_lines=True)
-    table.add_column("ID", style="bold", justify="center")
-    table.add_column("Book", style="bold")
-    table.add_column("Quote", overflow="ignore")
-    table.add_column("Author")
-    table.add_column("Favourite", justify="center")
 
-    for result in results:
-        table.add_row(
+def print_formatted_quotes_output(
+    results: Iterable[dict],
+    use_pager: bool = True,
+) -> None:
+    print_paged_table(
+        results,
+        _quotes_table,
+        lambda result: [
             f"{result['Quote'].id}",
             result["Book"].title.title(),
             result["Quote"].quote,
             result["Author"].name,
             "Yes" if result["Quote"].fav else "No",
+        ],
+        lines_per_row=3,
+        use_pager=use_pager,
+    )
+
+
+def _write_rows(
+    rows,
+    fields: list[str],
+    output_format: OutputFormat,
+    stream: TextIO,
+) -> None:
+    if output_format == OutputFormat.jsonl:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+            stream.write("\n")
+        return
+
+    dialect = "excel-tab" if output_format == OutputFormat.tsv else "excel"
+    writer = csv.writer(stream, dialect=dialect, lineterminator="\n")
+    writer.writerow(fields)
+    writer.writerows(rows)
+
+
+def _write_output(
+    rows,
+    fields: list[str],
+    output_format: OutputFormat,
+    stream: TextIO | None,
+) -> None:
+    stream = stream if stream is not None else sys.stdout
+    try:
+        _write_rows(rows, fields, output_format, stream)
+        stream.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`), so there's nobody to write to.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def book_rows(results: Iterable[dict]) -> Iterator[tuple]:
+    """
+    Values of `BOOK_FIELDS` for each book and author pair in `results`.
+    """
+
+    return (
+        (
+            result["Book"].id,
+            result["Book"].title,
+            result["Author"].name,
+            BookStatus(result["Book"].status).value,
+            result["Book"].fav,
         )
+        for result in results
+    )
+
+
+def quote_rows(results: Iterable[dict]) -> Iterator[tuple]:
+    """
+    Values of `QUOTE_FIELDS` for each quote and author pair in `results`.
+    """
+
+    return (
+        (
+            result["Quote"].id,
+            result["Book"].title,
+            result["Quote"].quote,
+            result["Author"].name,
+            result["Quote"].fav,
+        )
+        for result in results
+    )
+
+
+def write_books_output(
+    results: Iterable[dict],
+    output_format: OutputFormat,
+    stream: TextIO | None = None,
+) -> None:
+    """
+    Writes books as CSV, TSV or JSON lines straight to stdout, without going
+    through rich.
+    """
+
+    rows = book_rows(results)
+    if output_format != OutputFormat.jsonl:
+        rows = ((*row[:-1], "Yes" if row[-1] else "No") for row in rows)
+
+    _write_output(rows, BOOK_FIELDS, output_format, stream)
+
+
+def write_quotes_output(
+    results: Iterable[dict],
+    output_format: OutputFormat,
+    stream: TextIO | None = None,
+) -> None:
+    """
+    Writes quotes as CSV, TSV or JSON lines straight to stdout, without going
+    through rich.
+    """
+
+    rows = quote_rows(results)
+    if output_format != OutputFormat.jsonl:
+        rows = ((*row[:-1], "Yes" if row[-1] else "No") for row in rows)
 
-    pprint(table)
+    _write_output(rows, QUOTE_FIELDS, output_format, stream)
@@ -1,4 +1,5 @@
 import csv
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -11,19 +12,34 @@ from sqlmodel import Session
 from typing_extensions import Annotated
 
 import config
-from models import Quote, Author, Book
+import profiling
+from models import Quote
 from repositories import (
     AuthorRepository,
     BookRepository,
     QuoteRepository,
     QuoteOrder,
+    ResultCache,
+)
+from . import importers
+from .print import OutputFormat, print_formatted_quotes_output, write_quotes_output
+from .utils import (
+    TrackedRows,
+    author_hint,
+    confirm_unlocked,
+    parse_assignments,
+    parse_bool,
+    parse_id_ranges,
+    title_hint,
 )
-from .print import print_raw_quotes_output, print_formatted_quotes_output
 
 app = typer.Typer()
 cfg = config.Config()
 err_console = Console(stderr=True)
 
+EXPORT_BUFFER_SIZE = 1 << 20
+LIST_CHUNK_SIZE = 500
+
 
 @app.command(
     "add",
@@ -60,14 +76,15 @@ def add_quote(
 ):
     book_repo = BookRepository()
     quote_repo = QuoteRepository()
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
     with Session(engine) as session:
         try:
             book = book_repo.get_by_title(session, book_title)
             if book is None:
                 err_console.print(
-                    f'Oops, the book "{book_title}" isn\'t in the library yet!'
+                    f'Oops, the book "{book_title}" isn\'t in the library yet'
+                    f"{title_hint(session, book_title)}!"
                 )
                 return
 
@@ -88,18 +105,95 @@ def add_quote(
             session.rollback()
 
 
+def quote_filters(session: Session, where: list[tuple[str, str]]) -> dict:
+    """
+    Turns `--where` assignments into the filters taken by the repository.
+    """
+
+    filters = {}
+    for field, value in where:
+        if field == "words":
+            filters["words"] = [word for word in value.split(",") if word.strip()]
+        elif field == "book":
+            book = BookRepository().get_by_title(session, value)
+            if book is None:
+                raise ValueError(
+                    f'the book "{value}" was not found{title_hint(session, value)}'
+                )
+
+            filters["book_id"] = book.id
+        elif field == "author":
+            author = AuthorRepository().get_by_name(session, value)
+            if author is None:
+                raise ValueError(
+                    f'the author "{value}" was not found{author_hint(session, value)}'
+                )
+
+            filters["author_id"] = author.id
+        elif field == "fav":
+            filters["fav"] = parse_bool(value)
+        elif field == "id":
+            filters["ids"] = parse_id_ranges([value])
+        else:
+            raise ValueError(f"quotes can't be filtered by {field}")
+
+    return filters
+
+
+def quote_changes(session: Session, changes: list[tuple[str, str]]) -> dict:
+    """
+    Turns `--set` assignments into the new values of the quote fields.
+    """
+
+    values = {}
+    for field, value in changes:
+        if field == "quote":
+            values["quote"] = value
+        elif field == "book":
+            book = BookRepository().get_by_title(session, value)
+            if book is None:
+                raise ValueError(
+                    f'the book "{value}" was not found{title_hint(session, value)}'
+                )
+
+            values["book_id"] = book.id
+        elif field == "fav":
+            values["fav"] = parse_bool(value)
+        else:
+            raise ValueError(f"quotes can't be updated by {field}")
+
+    return values
+
+
 @app.command(
     "update",
-    help="Update a quote",
+    help="Update the quotes matching the filters in a single statement",
 )
 def update(
-    quote_id: Annotated[
-        int,
+    quote_ids: Annotated[
+        list[str],
         typer.Option(
             "--id",
-            help="ID of the quote to update",
+            callback=parse_id_ranges,
+            help="IDs of the quotes to update, like 7, 1,2,3 or 10-20",
         ),
-    ],
+    ] = None,
+    where: Annotated[
+        list[str],
+        typer.Option(
+            "--where",
+            callback=parse_assignments,
+            help="Filter as field=value, with fields words, book, author, fav or id. Can be repeated",
+        ),
+    ] = None,
+    new_values: Annotated[
+        list[str],
+        typer.Option(
+            "--set",
+            callback=parse_assignments,
+            help="New value as field=value, with fields quote, book or fav. Can be repeated",
+        ),
+    ] = None,
     new_text: Annotated[
         str,
         typer.Option(
@@ -133,45 +227,63 @@ def update(
             help="Unmarks the quote as a favorite",
         ),
     ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only show how many quotes would be updated",
+        ),
+    ] = False,
 ):
-    book_repo = BookRepository()
+    if not quote_ids and not where:
+        err_console.print("Specify the quotes to update with --id or --where")
+        raise typer.Exit(code=1)
+
     quote_repo = QuoteRepository()
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
     with Session(engine) as session:
         try:
-            original_quote = quote_repo.get_by_id(session, quote_id)
-            if original_quote is None:
-                pprint(f"No quote found with received ID {quote_id}")
-                return
-            if (
-                new_text is None
-                and new_book_title is None
-                and mark_as_fav is None
-                and unmark_as_fav is None
-            ):
+            filters = quote_filters(session, where)
+            if quote_ids:
+                filters["ids"] = quote_ids
+
+            if new_text is not None:
+                new_values.append(("quote", new_text))
+            if new_book_title is not None:
+                new_values.append(("book", new_book_title))
+            if mark_as_fav or unmark_as_fav:
+                new_values.append(("fav", "yes" if mark_as_fav else "no"))
+
+            changes = quote_changes(session, new_values)
+            if not changes:
                 pprint(
                     "There are no attributes marked to update. The quote hasn't been updated"
                 )
                 return
 
-            new_book = None
-            if new_book_title:
-                book_repo.get_by_title(session, new_book_title)
-                if new_book is None:
-                    err_console.print(
-                        f'The book "{new_book_title}" was not found',
-                    )
-                    return
+            single_quote = len(quote_ids) == 1 and quote_ids[0][0] == quote_ids[0][1]
+            if "quote" in changes and (where or not single_quote):
+                raise ValueError("a quote can only be set on a single quote by --id")
 
-            new_fav = mark_as_fav if mark_as_fav else False if unmark_as_fav else None
-            quote_repo.update(session, quote_id, new_text, new_book, new_fav)
+            if dry_run:
+                count = quote_repo.count(session, **filters)
+                pprint(f"{count} quotes would be updated")
+                return
 
+            updated = quote_repo.update_matching(session, changes, **filters)
             session.commit()
+            if not updated:
+                pprint("No quotes with the specified criteria were found")
+                return
 
+            pprint(f"{updated} quotes have been updated")
+        except ValueError as e:
+            err_console.print(f"Oops, {e}!")
         except SQLAlchemyError as e:
             err_console.print(
-                "Oops, something went wrong! The quote couldn't be updated"
+                "Oops, something went wrong! The quotes couldn't be updated"
             )
             if cfg.DEBUG:
                 err_console.print(e)
@@ -189,7 +301,7 @@ def list_quotes(
         typer.Option(
             "--words",
             "-w",
-            help="List of words to filter quotes by content",
+            help="List of words to filter quotes by content. Use 'word*' for prefixes and quotes for phrases",
         ),
     ] = None,
     book_title: Annotated[
@@ -221,9 +333,9 @@ def list_quotes(
         QuoteOrder,
         typer.Option(
             "--order-by",
-            help="Specify the order in which results are displayed",
+            help="Specify the order in which results are displayed. Defaults to rank when searching by words and to quote otherwise",
         ),
-    ] = QuoteOrder.quote.value,
+    ] = None,
     reverse_order: Annotated[
         bool,
         typer.Option(
@@ -239,12 +351,51 @@ def list_quotes(
             help="Limit the number of results displayed",
         ),
     ] = None,
+    page_size: Annotated[
+        int,
+        typer.Option(
+            "--page-size",
+            min=1,
+            help="Display results in pages of this size and print the cursor of the next page",
+        ),
+    ] = None,
+    after: Annotated[
+        str,
+        typer.Option(
+            "--after",
+            help="Cursor printed by a previous page to continue from",
+        ),
+    ] = None,
     raw: Annotated[
         bool,
         typer.Option(
             "--raw",
             is_flag=True,
-            help="Display raw output without formatting",
+            help="Display raw output without formatting. Same as --format csv",
+        ),
+    ] = False,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            show_choices=True,
+            help="Format of the output. Everything but table is written as is to stdout",
+        ),
+    ] = OutputFormat.table.value,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            is_flag=True,
+            help="Run the query even if its results are cached",
+        ),
+    ] = False,
+    no_pager: Annotated[
+        bool,
+        typer.Option(
+            "--no-pager",
+            is_flag=True,
+            help="Print every page of the table instead of piping them to $PAGER",
         ),
     ] = False,
     total: Annotated[
@@ -268,7 +419,8 @@ def list_quotes(
                 author = author_repo.get_by_name(session, book_author)
                 if author is None:
                     err_console.print(
-                        "The author specified was not found",
+                        "The author specified was not found"
+                        + author_hint(session, book_author)
                     )
                     return
 
@@ -279,37 +431,177 @@ def list_quotes(
                 book = book_repo.get_by_title(session, book_title)
                 if book is None:
                     err_console.print(
-                        "The book specified was not found",
+                        "The book specified was not found"
+                        + title_hint(session, book_title)
                     )
                     return
 
             book_id = book.id if book else None
 
-            results = quote_repo.list(
+            if total:
+                count = quote_repo.count(
+                    session,
+                    words=words_in_quote,
+                    book_id=book_id,
+                    author_id=author_id,
+                    fav=quote_fav,
+                )
+                pprint(f"Total: {count}")
+                return
+
+            cache = None
+            if not no_cache:
+                cache = ResultCache(cfg.CACHE_PATH, cfg.CACHE_MAX_BYTES)
+
+            results = TrackedRows(
+                profiling.rows(
+                    quote_repo.list(
+                        session,
+                        words=words_in_quote,
+                        book_id=book_id,
+                        author_id=author_id,
+                        fav=quote_fav,
+                        order_by=order_by,
+                        reverse_order=reverse_order,
+                        limit=page_size if page_size is not None else limit,
+                        after=after,
+                        chunk_size=LIST_CHUNK_SIZE,
+                        cache=cache,
+                    )
+                )
+            )
+
+            if results.empty():
+                err_console.print(
+                    "No quotes with the specified criteria were found in your library",
+                )
+                return
+
+            if raw:
+                output_format = OutputFormat.csv
+
+            with profiling.phase("rendering"):
+                if output_format != OutputFormat.table:
+                    write_quotes_output(results, output_format)
+                else:
+                    print_formatted_quotes_output(results, use_pager=not no_pager)
+
+            if page_size is not None and results.count == page_size:
+                next_page = quote_repo.cursor(results.last, order_by)
+                err_console.print(f"Next page: --after {next_page}")
+
+        except ValueError as e:
+            err_console.print(f"Oops, {e}!")
+        except SQLAlchemyError:
+            err_console.print(
+                "Oops, something went wrong!",
+            )
+
+
+@app.command(
+    "random",
+    help="Show random quotes, optionally from an author, a book or your favorites",
+)
+def random_quotes(
+    count: Annotated[
+        int,
+        typer.Option(
+            "--count",
+            "-n",
+            min=1,
+            help="Number of distinct quotes to show",
+        ),
+    ] = 1,
+    book_title: Annotated[
+        str,
+        typer.Option(
+            "--title",
+            "-t",
+            help="Title of the book to pick quotes from",
+        ),
+    ] = None,
+    book_author: Annotated[
+        str,
+        typer.Option(
+            "--author",
+            "-a",
+            help="Name of the author to pick quotes from",
+        ),
+    ] = None,
+    quote_fav: Annotated[
+        bool,
+        typer.Option(
+            "--fav",
+            "-f",
+            is_flag=True,
+            help="Only pick favorite quotes",
+        ),
+    ] = None,
+    fav_weight: Annotated[
+        float,
+        typer.Option(
+            "--fav-weight",
+            min=1,
+            help="How many times more likely favorites are to be picked",
+        ),
+    ] = 1.0,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            show_choices=True,
+            help="Format of the output. Everything but table is written as is to stdout",
+        ),
+    ] = OutputFormat.table.value,
+):
+    quote_repo = QuoteRepository()
+    engine = cfg.DB_ENGINE
+
+    with Session(engine) as session:
+        try:
+            author_id = None
+            if book_author is not None:
+                author = AuthorRepository().get_by_name(session, book_author)
+                if author is None:
+                    err_console.print(
+                        "The author specified was not found"
+                        + author_hint(session, book_author)
+                    )
+                    return
+
+                author_id = author.id
+
+            book_id = None
+            if book_title is not None:
+                book = BookRepository().get_by_title(session, book_title)
+                if book is None:
+                    err_console.print(
+                        "The book specified was not found"
+                        + title_hint(session, book_title)
+                    )
+                    return
+
+                book_id = book.id
+
+            results = quote_repo.sample(
                 session,
-                words=words_in_quote,
+                count,
                 book_id=book_id,
                 author_id=author_id,
                 fav=quote_fav,
-                order_by=order_by,
-                reverse_order=reverse_order,
-                limit=limit,
+                fav_weight=fav_weight,
             )
-
-            if not len(results):
+            if not results:
                 err_console.print(
                     "No quotes with the specified criteria were found in your library",
                 )
                 return
-            
-            if total:
-                pprint(f"Total: {len(results)}")
-                return
 
-            if raw:
-                print_raw_quotes_output(results)
-            else:
-                print_formatted_quotes_output(results)
+            with profiling.phase("rendering"):
+                if output_format != OutputFormat.table:
+                    write_quotes_output(results, output_format)
+                else:
+                    print_formatted_quotes_output(results, use_pager=False)
 
         except SQLAlchemyError:
             err_console.print(
@@ -319,28 +611,134 @@ def list_quotes(
 
 @app.command(
     "delete",
-    help="Delete a quote",
+    help="Delete the quotes matching the filters",
 )
-def delete_quote(
-    quote_id: Annotated[
-        int,
+def delete_quotes(
+    quote_ids: Annotated[
+        list[str],
         typer.Option(
             "--id",
-            prompt="Quote ID",
-            help="ID of the quote to delete",
+            callback=parse_id_ranges,
+            help="IDs of the quotes to delete, like 7, 1,2,3 or 10-20",
         ),
-    ],
+    ] = None,
+    words_in_quote: Annotated[
+        list[str],
+        typer.Option(
+            "--words",
+            "-w",
+            help="List of words to filter quotes by content. Use 'word*' for prefixes and quotes for phrases",
+        ),
+    ] = None,
+    book_title: Annotated[
+        str,
+        typer.Option(
+            "--title",
+            "-t",
+            help="Title of the book to filter by",
+        ),
+    ] = None,
+    book_author: Annotated[
+        str,
+        typer.Option(
+            "--author",
+            "-a",
+            help="Name of the author to filter by",
+        ),
+    ] = None,
+    quote_fav: Annotated[
+        bool,
+        typer.Option(
+            "--fav",
+            "-f",
+            is_flag=True,
+            help="Filter quotes by whether they are favorites or not",
+        ),
+    ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run",
+            is_flag=True,
+            help="Only show how many quotes would be deleted",
+        ),
+    ] = False,
+    yes: Annotated[
+        bool,
+        typer.Option(
+            "--yes",
+            "-y",
+            is_flag=True,
+            help="Don't ask for confirmation",
+        ),
+    ] = False,
 ):
-    typer.confirm(
-        "Are you sure you want to delete the quote with id '{quote_id}'?",
-        abort=True,
-    )
+    if (
+        not quote_ids
+        and not words_in_quote
+        and book_title is None
+        and book_author is None
+        and quote_fav is None
+    ):
+        err_console.print("Specify at least one filter for the quotes to delete")
+        raise typer.Exit(code=1)
+
+    quote_repo = QuoteRepository()
+    engine = cfg.DB_WRITE_ENGINE
 
-    engine = cfg.DB_ENGINE
     with Session(engine) as session:
         try:
-            QuoteRepository().delete(session, quote_id)
+            author_id = None
+            if book_author is not None:
+                author = AuthorRepository().get_by_name(session, book_author)
+                if author is None:
+                    err_console.print(
+                        "The author specified was not found"
+                        + author_hint(session, book_author)
+                    )
+                    return
+
+                author_id = author.id
+
+            book_id = None
+            if book_title is not None:
+                book = BookRepository().get_by_title(session, book_title)
+                if book is None:
+                    err_console.print(
+                        "The book specified was not found"
+                        + title_hint(session, book_title)
+                    )
+                    return
+
+                book_id = book.id
+
+            filters = {
+                "words": words_in_quote or None,
+                "book_id": book_id,
+                "author_id": author_id,
+                "fav": quote_fav,
+                "ids": quote_ids,
+            }
+            count = quote_repo.count(session, **filters)
+            if not count:
+                err_console.print(
+                    "No quotes with the specified criteria were found in your library"
+                )
+                return
+
+            pprint(f"{count} quotes match the specified criteria")
+            if dry_run:
+                return
+
+            if not yes:
+                confirm_unlocked(
+                    session,
+                    f"Are you sure you want to delete {count} quotes?",
+                )
+
+            deleted = quote_repo.delete_matching(session, **filters)
             session.commit()
+            pprint(f"{deleted} quotes have been deleted")
         except SQLAlchemyError:
             err_console.print(
                 "Oops, something went wrong! Changes have been rolled back"
@@ -366,28 +764,26 @@ def export_quotes(
 
     with Session(engine) as session:
         try:
-            results = quote_repo.list(session, order_by=QuoteOrder.id)
-            if not len(results):
+            total = quote_repo.count_export_rows(session)
+            if not total:
                 err_console.print(
                     "No quotes found in your library",
                 )
                 return
 
             file_path = file if file is not None else "quotes.csv"
-            with open(file_path, mode="w") as quotes_file:
-                fieldnames = ["id", "quote", "book", "author", "fav"]
-                writer = csv.DictWriter(quotes_file, fieldnames=fieldnames)
-
-                writer.writeheader()
-                for result in track(results, description="Exporting..."):
+            with open(
+                file_path, mode="w", newline="", buffering=EXPORT_BUFFER_SIZE
+            ) as quotes_file:
+                writer = csv.writer(quotes_file)
+
+                writer.writerow(["id", "quote", "book", "author", "fav"])
+                rows = quote_repo.export_rows(session)
+                for id, quote, book, author, fav in track(
+                    rows, total=total, description="Exporting..."
+                ):
                     writer.writerow(
-                        {
-                            "id": result["Quote"].id,
-                            "quote": f"{result["Quote"].quote}",
-                            "book": f"{result["Book"].title.title()}",
-                            "author": f"{result["Author"].name}",
-                            "fav": "Yes" if result["Quote"].fav else "No",
-                        }
+                        [id, quote, book.title(), author, "Yes" if fav else "No"]
                     )
 
                 pprint("CSV file has been successfully created")
@@ -408,50 +804,38 @@ def import_quotes(
             help="Optional path to the file from which quotes will be imported",
         ),
     ] = None,
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            "--batch-size",
+            min=1,
+            help="Number of rows inserted per transaction",
+        ),
+    ] = 1000,
 ) -> None:
-    author_repo = AuthorRepository()
-    book_repo = BookRepository()
-    quote_repo = QuoteRepository()
-    engine = cfg.DB_ENGINE
+    engine = cfg.DB_WRITE_ENGINE
 
-    with Session(engine) as session:
+    with cfg.storage_profile("bulk"), Session(engine) as session:
         try:
             file_path = file if file is not None else "quotes.csv"
-            with open(file_path) as books_file:
-                reader = csv.DictReader(books_file)
-                for row in track(reader, description="Importing..."):
-                    author_name = row["author"]
-                    author = author_repo.get_by_name(session, author_name)
-                    if author is None:
-                        author = Author(name=author_name)
-                        author_repo.add(session, author)
-
-                    book_title = row["book"]
-                    book = book_repo.get_by_title(session, book_title)
-                    if book is None:
-                        book = Book(
-                            title=book_title,
-                            authors=[author],
-                        )
-                        book_repo.add(session, book)
-
-                    quote_text = row["quote"]
-                    quote = quote_repo.get_by_quote(session, quote_text)
-                    if quote is None:
-                        quote = Quote(
-                            quote=quote_text,
-                            book=book,
-                            book_id=book.id,
-                            fav=True if row["fav"] == "Yes" else False,
-                        )
-                        quote_repo.add(session, quote)
-
-                    session.commit()
+            with importers.csv_rows(file_path) as rows:
+                start = time.perf_counter()
+                read, added = importers.import_quotes(
+                    session,
+                    rows,
+                    batch_size=batch_size,
+                )
+                elapsed = time.perf_counter() - start
 
                 pprint("Import has been successful!")
+                pprint(
+                    f"{added} quotes added from {read} rows "
+                    f"({read / max(elapsed, 1e-9):,.0f} rows/s)"
+                )
 
         except SQLAlchemyError:
             err_console.print("Oops, something went wrong! Import failed")
+            session.rollback()
 
 
 if __name__ == "__main__":
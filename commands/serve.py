@@ -0,0 +1,57 @@
+import typer
+from rich.console import Console
+from typing_extensions import Annotated
+
+import api
+import config
+
+app = typer.Typer()
+cfg = config.Config()
+err_console = Console(stderr=True)
+
+
+@app.command(
+    "serve",
+    help="Serve your library as a read-only JSON API on localhost",
+)
+def serve(
+    port: Annotated[
+        int,
+        typer.Option(
+            "--port",
+            "-p",
+            min=0,
+            max=65535,
+            help="Port to listen on. 0 picks a free one",
+        ),
+    ] = 8765,
+    threads: Annotated[
+        int,
+        typer.Option(
+            "--threads",
+            min=1,
+            help="Number of requests answered at once",
+        ),
+    ] = 8,
+) -> None:
+    try:
+        server = api.Server(
+            port,
+            cfg.DB_ENGINE,
+            cfg.DB_PATH,
+            cfg.CACHE_PATH,
+            cfg.CACHE_MAX_BYTES,
+            threads=threads,
+            log_requests=cfg.DEBUG,
+        )
+    except OSError as e:
+        err_console.print(f"Oops, the API can't listen on port {port}: {e.strerror}")
+        raise typer.Exit(code=1)
+
+    err_console.print(f"Serving your library on {server.url}, stop with Ctrl+C")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
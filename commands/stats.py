@@ -0,0 +1,68 @@
+import typer
+from rich import print as pprint
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+from typing_extensions import Annotated
+
+import config
+from repositories import StatsRepository
+
+app = typer.Typer()
+cfg = config.Config()
+err_console = Console(stderr=True)
+
+
+@app.command(
+    "stats",
+    help="Show a summary of your library",
+)
+def show_stats(
+    raw: Annotated[
+        bool,
+        typer.Option(
+            "--raw",
+            is_flag=True,
+            help="Display raw output without formatting",
+        ),
+    ] = False,
+):
+    engine = cfg.DB_ENGINE
+
+    with Session(engine) as session:
+        try:
+            stats = StatsRepository().summary(session)
+        except SQLAlchemyError:
+            err_console.print("Oops, something went wrong!")
+            return
+
+    rows = [
+        ("books", stats["books"]),
+        *[(f"books_{status.value}", n) for status, n in stats["by_status"].items()],
+        ("fav_books", stats["fav_books"]),
+        ("quotes", stats["quotes"]),
+        ("fav_quotes", stats["fav_quotes"]),
+        ("books_with_quotes", stats["books_with_quotes"]),
+        ("quotes_per_book", f"{stats['quotes_per_book']:.2f}"),
+        ("max_quotes_per_book", stats["max_quotes_per_book"]),
+        ("authors", stats["authors"]),
+        ("books_per_author", f"{stats['books_per_author']:.2f}"),
+        ("max_books_per_author", stats["max_books_per_author"]),
+    ]
+
+    if raw:
+        print("\n".join(f"{name} {value}" for name, value in rows))
+        return
+
+    table = Table(title="Library", show_header=False)
+    table.add_column("Stat", style="bold")
+    table.add_column("Value", justify="right")
+    for name, value in rows:
+        table.add_row(name.replace("_", " ").capitalize(), f"{value}")
+
+    pprint(table)
+
+
+if __name__ == "__main__":
+    app()
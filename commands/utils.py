@@ -1,5 +1,9 @@
-from sqlmodel import Session
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+import typer
 from rich import print as pprint
+from sqlmodel import Session
 
 from models import Author, Book, BookStatus
 from repositories import AuthorRepository, BookRepository
@@ -39,3 +43,120 @@ def get_or_create_book(
         pprint(f'Book "{book_title}" is already in the library')
 
     return book
+
+
+def _did_you_mean(options: list[str]) -> str:
+    if not options:
+        return ""
+
+    quoted = [f'"{option}"' for option in options]
+    if len(quoted) > 1:
+        quoted = [", ".join(quoted[:-1]), quoted[-1]]
+
+    return f" (did you mean {' or '.join(quoted)}?)"
+
+
+def author_hint(session: Session, name: str) -> str:
+    """
+    Suggests the authors with names closest to `name`, to add to the message
+    saying it wasn't found.
+    """
+
+    authors = AuthorRepository().similar(session, name, limit=3)
+    return _did_you_mean([author.name for author, _ in authors])
+
+
+def title_hint(session: Session, title: str) -> str:
+    """
+    Suggests the books with titles closest to `title`, to add to the message
+    saying it wasn't found.
+    """
+
+    books = BookRepository().similar(session, title, limit=3)
+    return _did_you_mean([book.title for book, _ in books])
+
+
+class TrackedRows:
+    """
+    Iterator over `rows` that remembers how many of them have been consumed
+    and which one was the last, so results can be streamed to the output and
+    still be described afterwards.
+    """
+
+    def __init__(self, rows: Iterable) -> None:
+        self._rows = iter(rows)
+        self._peeked = []
+        self.count = 0
+        self.last = None
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        row = self._peeked.pop() if self._peeked else next(self._rows)
+        self.count += 1
+        self.last = row
+        return row
+
+    def empty(self) -> bool:
+        if not self._peeked:
+            self._peeked = list(islice(self._rows, 1))
+
+        return not self._peeked
+
+
+def parse_id_ranges(values: list[str] | None) -> list[tuple[int, int]]:
+    """
+    Parses IDs given as `7`, `1,2,3` or inclusive ranges like `10-20` into a
+    list of (low, high) ranges.
+    """
+
+    ranges = []
+    for value in values or []:
+        for part in value.split(","):
+            low, _, high = part.strip().partition("-")
+            try:
+                low = int(low)
+                high = int(high) if high else low
+            except ValueError:
+                raise typer.BadParameter(f"'{part}' is not an ID or a range of IDs")
+
+            ranges.append((min(low, high), max(low, high)))
+
+    return ranges
+
+
+def parse_assignments(values: list[str] | None) -> list[tuple[str, str]]:
+    """
+    Parses `field=value` pairs given to options like `--where` and `--set`.
+    """
+
+    assignments = []
+    for value in values or []:
+        field, sep, assigned = value.partition("=")
+        if not sep or not field.strip():
+            raise typer.BadParameter(f"'{value}' should look like field=value")
+
+        assignments.append((field.strip().lower(), assigned.strip()))
+
+    return assignments
+
+
+def parse_bool(value: str) -> bool:
+    if value.lower() in {"yes", "y", "true", "1"}:
+        return True
+
+    if value.lower() in {"no", "n", "false", "0"}:
+        return False
+
+    raise ValueError(f"'{value}' is not yes or no")
+
+
+def confirm_unlocked(session: Session, message: str) -> None:
+    """
+    Asks for confirmation once the transaction of `session` has ended, so
+    other writers don't wait for the user to answer. Aborts if they decline.
+    """
+
+    session.rollback()
+    typer.confirm(message, abort=True)
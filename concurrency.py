@@ -0,0 +1,84 @@
+import random
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# How many times taking the write lock is tried before giving up. Every try
+# already waits up to the busy timeout of the storage profile.
+LOCK_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.05
+
+
+def is_locked(error: Exception) -> bool:
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+def backoff(attempt: int) -> float:
+    # Jitter keeps processes that were waiting on the same lock from all
+    # retrying at once.
+    return BACKOFF_SECONDS * 2**attempt * random.uniform(0.5, 1.5)
+
+
+def configure(engine) -> None:
+    """
+    Lets the engine decide how its transactions begin instead of the sqlite3
+    module, which only starts them right before the first write. Transactions
+    are deferred unless the engine is a `writer`, so readers never wait for
+    writers in WAL mode.
+    """
+
+    from sqlalchemy import event
+    from sqlalchemy.exc import OperationalError
+
+    @event.listens_for(engine, "connect")
+    def disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        options = connection.get_execution_options()
+        if options.get("isolation_level") == "AUTOCOMMIT":
+            return
+
+        mode = options.get("sqlite_begin", "DEFERRED")
+        for attempt in range(LOCK_ATTEMPTS):
+            try:
+                connection.exec_driver_sql(f"BEGIN {mode}")
+                return
+            except OperationalError as e:
+                if not is_locked(e) or attempt == LOCK_ATTEMPTS - 1:
+                    raise
+
+                time.sleep(backoff(attempt))
+
+
+def writer(engine):
+    """
+    Same engine, but its transactions take the write lock as soon as they
+    begin. A deferred transaction that writes after reading fails right away
+    if another process wrote in between, while this one waits for its turn
+    before reading anything.
+    """
+
+    return engine.execution_options(sqlite_begin="IMMEDIATE")
+
+
+def retry(fn: Callable[[], T], attempts: int = LOCK_ATTEMPTS) -> T:
+    """
+    Runs `fn` again with backoff while it fails because the library is locked.
+    `fn` must roll back everything it did when it fails.
+    """
+
+    from sqlalchemy.exc import OperationalError
+
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except OperationalError as e:
+            if not is_locked(e) or attempt == attempts - 1:
+                raise
+
+            time.sleep(backoff(attempt))
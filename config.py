@@ -1,8 +1,16 @@
+import os
+import sys
 import tomllib
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
-import typer
-from sqlmodel import SQLModel, create_engine
+import click
+
+import concurrency
+import profiling
+import storage
+import timing
 
 
 class Config:
@@ -16,7 +24,7 @@ class Config:
         return cls._instance
 
     def load(self):
-        with open("./pyproject.toml", "rb") as f:
+        with open(Path(__file__).parent / "pyproject.toml", "rb") as f:
             data = tomllib.load(f)
             poetry = data["tool"]["poetry"]
 
@@ -26,10 +34,136 @@ class Config:
 
         self.DEBUG = False
 
-        self.APP_DIR = typer.get_app_dir(self.APP_NAME)
+        self.APP_DIR = click.get_app_dir(self.APP_NAME)
         self.DB_PATH: Path = Path(self.APP_DIR) / "clibr.db"
+        self.CACHE_PATH: Path = Path(self.APP_DIR) / "cache.db"
+        self.CACHE_MAX_BYTES = 32 * 1024 * 1024
+        self.CONFIG_PATH: Path = Path(self.APP_DIR) / "config.toml"
+        self.STORAGE_PROFILE = self._storage_profile_name()
+        self.DAEMON_SOCKET: Path = Path(self.APP_DIR) / "daemon.sock"
+        self.USE_DAEMON = not os.environ.get(f"{self.APP_NAME.upper()}_NO_DAEMON")
+        self._db_engine = None
+        self._connection = None
+
+    def _storage_profile_name(self) -> str:
+        """
+        Name of the storage profile set by $CLIBR_STORAGE_PROFILE or by
+        `storage_profile` in the config file, in that order.
+        """
+
+        name = os.environ.get(f"{self.APP_NAME.upper()}_STORAGE_PROFILE")
+        if name is None and self.CONFIG_PATH.exists():
+            try:
+                with open(self.CONFIG_PATH, "rb") as f:
+                    name = tomllib.load(f).get("storage_profile")
+            except tomllib.TOMLDecodeError as e:
+                print(
+                    f"Can't read {self.CONFIG_PATH} ({e}), using "
+                    f'storage profile "{storage.DEFAULT_PROFILE}"',
+                    file=sys.stderr,
+                )
+                return storage.DEFAULT_PROFILE
+
+        if name is None:
+            return storage.DEFAULT_PROFILE
+
+        if not isinstance(name, str) or name not in storage.PROFILES:
+            print(
+                f'Unknown storage profile "{name}", using '
+                f'"{storage.DEFAULT_PROFILE}". Choose from: '
+                f"{', '.join(storage.PROFILES)}",
+                file=sys.stderr,
+            )
+            return storage.DEFAULT_PROFILE
+
+        return name
+
+    @contextmanager
+    def storage_profile(self, name: str) -> Iterator[None]:
+        """
+        Switches the connections to the library to another storage profile for
+        the duration of the block, like the bulk profile during imports.
+        """
+
+        previous = self.STORAGE_PROFILE
+        self.STORAGE_PROFILE = name
+        try:
+            yield
+        finally:
+            self.STORAGE_PROFILE = previous
+
+    @contextmanager
+    def bound_to(self, connection) -> Iterator[None]:
+        """
+        Makes commands open their sessions on `connection` for the duration of
+        the block, so `clibr batch` can group them in its own transactions.
+        Results aren't cached meanwhile, as they would be tagged with a data
+        generation that rolling back hands out again.
+        """
+
+        previous = self._connection, self.CACHE_MAX_BYTES
+        self._connection, self.CACHE_MAX_BYTES = connection, 0
+        try:
+            yield
+        finally:
+            self._connection, self.CACHE_MAX_BYTES = previous
+
+    def create_engine(self):
+        from sqlalchemy.pool import QueuePool
+        from sqlmodel import create_engine
+
         Path(self.APP_DIR).mkdir(parents=True, exist_ok=True)
 
         sqlite_url = f"sqlite:///{self.DB_PATH}"
-        self.DB_ENGINE = create_engine(sqlite_url)
-        SQLModel.metadata.create_all(self.DB_ENGINE)
+        # SQLAlchemy opens a new connection for every transaction on SQLite
+        # files by default, which means running the storage pragmas and mapping
+        # the WAL index again each time. Keeping them open makes a commit about
+        # four times as fast.
+        # The pool hands each connection to one thread at a time, so they can
+        # be shared by the threads of `clibr serve`.
+        engine = create_engine(
+            sqlite_url,
+            poolclass=QueuePool,
+            connect_args={"check_same_thread": False},
+        )
+        storage.configure(engine, lambda: storage.PROFILES[self.STORAGE_PROFILE])
+        concurrency.configure(engine)
+        if profiling.enabled():
+            profiling.instrument(engine)
+
+        return engine
+
+    @property
+    def DB_ENGINE(self):
+        """
+        The engine is only created the first time a command needs the database,
+        so SQLAlchemy isn't imported for things like `--help`. Pending schema
+        migrations are applied at that point too.
+        """
+
+        if self._connection is not None:
+            return self._connection
+
+        if self._db_engine is None:
+            import migrations
+
+            self._db_engine = self.create_engine()
+            with profiling.phase("migrations"):
+                # Another process may be applying the same migrations.
+                concurrency.retry(lambda: migrations.migrate(self._db_engine))
+            timing.mark("engine")
+
+        return self._db_engine
+
+    @property
+    def DB_WRITE_ENGINE(self):
+        """
+        Engine for commands that change the library. Their transactions wait
+        for the write lock when they begin, so concurrent writers take turns
+        instead of failing halfway.
+        """
+
+        if self._connection is not None:
+            return self._connection
+
+        return concurrency.writer(self.DB_ENGINE)
@@ -0,0 +1,264 @@
+"""
+Runs clibr commands in a long-lived process that keeps the imports, the
+engine and its caches warm, and forwards the commands of the CLI to it.
+
+Requests are a JSON object with the `args`, `cwd` and `prog_name` of the
+command, sent over a Unix socket that is then shut down for writing. The
+response is a JSON object with its `exit_code`, `stdout` and `stderr`, or
+`{"fallback": true}` when the command has to run in the terminal instead.
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+# Options whose effect would outlive the command in the daemon, or that time
+# the process running it.
+LOCAL_OPTIONS = {"--debug", "--startup-timing", "--profile", "--profile-output"}
+LOCAL_COMMANDS = {"daemon", "serve"}
+
+
+class NeedsTerminal(Exception):
+    pass
+
+
+class _NoInput(io.TextIOBase):
+    """
+    Stands in for stdin in the daemon, which can't ask the user anything.
+    """
+
+    def readline(self, size: int = -1) -> str:
+        raise NeedsTerminal()
+
+    def read(self, size: int = -1) -> str:
+        raise NeedsTerminal()
+
+
+def _receive(connection: socket.socket) -> dict:
+    chunks = []
+    while chunk := connection.recv(1 << 16):
+        chunks.append(chunk)
+
+    return json.loads(b"".join(chunks))
+
+
+def _send(connection: socket.socket, message: dict) -> None:
+    connection.sendall(json.dumps(message).encode())
+    connection.shutdown(socket.SHUT_WR)
+
+
+def _columns() -> int | None:
+    """
+    Width rich would render for in this process. The daemon can't find out,
+    as it has no terminal of its own, or another one.
+    """
+
+    columns = os.environ.get("COLUMNS")
+    if columns is not None and columns.isdigit():
+        return int(columns)
+
+    for fd in (0, 1, 2):
+        try:
+            return os.get_terminal_size(fd).columns
+        except OSError:
+            pass
+
+    return None
+
+
+def forwardable(args: list[str]) -> bool:
+    if LOCAL_OPTIONS & {arg.split("=")[0] for arg in args}:
+        return False
+
+    command = next((arg for arg in args if not arg.startswith("-")), None)
+    return command not in LOCAL_COMMANDS
+
+
+def forward(path: Path, args: list[str]) -> int | None:
+    """
+    Runs the command in the daemon listening on `path` and writes its output.
+    Returns the exit code of the command, or None when it has to run in this
+    process: there is no daemon, the command may ask for input or the output
+    is a terminal, where tables are paged and colored.
+    """
+
+    if sys.stdout.isatty() or not forwardable(args):
+        return None
+
+    request = {
+        "args": args,
+        "cwd": os.getcwd(),
+        "prog_name": os.path.basename(sys.argv[0]),
+        "columns": _columns(),
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(path))
+        except OSError:
+            return None
+
+        # Nothing can be run again from here on, the daemon may have done it.
+        try:
+            _send(connection, request)
+            response = _receive(connection)
+        except (OSError, ValueError) as e:
+            print(f"Oops, the daemon didn't answer: {e}", file=sys.stderr)
+            return 1
+
+    if response.get("fallback"):
+        return None
+
+    try:
+        sys.stdout.write(response["stdout"])
+        sys.stdout.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+    sys.stderr.write(response["stderr"])
+    return response["exit_code"]
+
+
+def _exit_code(exit: SystemExit) -> int:
+    if exit.code is None:
+        return 0
+
+    return exit.code if isinstance(exit.code, int) else 1
+
+
+def run(command, request: dict) -> dict:
+    """
+    Runs `command`, the root click command of the CLI, with the arguments of
+    `request` and captures what it writes.
+    """
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    previous_cwd, previous_stdin = os.getcwd(), sys.stdin
+    previous_columns = os.environ.pop("COLUMNS", None)
+    try:
+        os.chdir(request["cwd"])
+        if request.get("columns"):
+            os.environ["COLUMNS"] = str(request["columns"])
+        sys.stdin = _NoInput()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                command.main(
+                    args=request["args"],
+                    prog_name=request.get("prog_name"),
+                    standalone_mode=True,
+                )
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = _exit_code(e)
+            except NeedsTerminal:
+                return {"fallback": True}
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        sys.stdin = previous_stdin
+        os.chdir(previous_cwd)
+        os.environ.pop("COLUMNS", None)
+        if previous_columns is not None:
+            os.environ["COLUMNS"] = previous_columns
+
+    return {
+        "exit_code": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def running(path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(path))
+        except OSError:
+            return False
+
+    return True
+
+
+def stop(path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(path))
+            _send(connection, {"stop": True})
+            _receive(connection)
+        except OSError:
+            return False
+
+    return True
+
+
+def serve(path: Path, command, warm_up: Callable[[], None] | None = None) -> None:
+    """
+    Answers the requests sent to `path` one at a time until it is asked to
+    stop or gets SIGTERM. Commands share the process, so running them one
+    after the other keeps them from seeing each other's state.
+
+    `warm_up` runs first with the output captured, so consoles created by the
+    imports it triggers don't take the terminal of the daemon for their own.
+    """
+
+    log = sys.stderr
+    if warm_up is not None:
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            warm_up()
+
+    if path.exists():
+        path.unlink()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(str(path))
+    finally:
+        os.umask(old_umask)
+    server.listen()
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, terminate)
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                try:
+                    request = _receive(connection)
+                except (OSError, ValueError):
+                    continue
+
+                if request.get("stop"):
+                    _send(connection, {})
+                    break
+
+                start = time.perf_counter()
+                response = run(command, request)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(
+                    f"{' '.join(request['args'])} -> "
+                    f"{'fallback' if response.get('fallback') else response['exit_code']} "
+                    f"({elapsed:.1f} ms)",
+                    file=log,
+                    flush=True,
+                )
+
+                try:
+                    _send(connection, response)
+                except OSError:
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
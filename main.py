@@ -1,39 +1,156 @@
-import typer
+import timing  # noqa: I001 must come first to time the rest of the imports
+
+import atexit
+import sys
 
 import config
-from commands import books_app, quotes_app
+import daemon
 
 cfg = config.Config()
 
+# Hand the command to a running daemon before importing the rest of the CLI.
+if __name__ == "__main__" and cfg.USE_DAEMON:
+    exit_code = daemon.forward(cfg.DAEMON_SOCKET, sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+from importlib import import_module  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Optional  # noqa: E402
+
+import click  # noqa: E402
+import typer  # noqa: E402
+from typer.core import TyperGroup  # noqa: E402
+
+import profiling  # noqa: E402
+
+
+class LazyGroup(TyperGroup):
+    """
+    Group whose subcommands are only imported when they are invoked, so
+    commands that don't touch the library don't pay for SQLAlchemy and the
+    other heavy imports of the command modules.
+    """
+
+    # name: (module, help)
+    lazy_commands = {
+        "books": (
+            "commands.books",
+            "Manage and explore your book collection",
+        ),
+        "quotes": (
+            "commands.quotes",
+            "Manage and explore your quotes",
+        ),
+        "db": (
+            "commands.db",
+            "Manage the library database",
+        ),
+        "stats": (
+            "commands.stats",
+            "Show a summary of your library",
+        ),
+        "batch": (
+            "commands.batch",
+            "Run many books and quotes commands at once",
+        ),
+        "serve": (
+            "commands.serve",
+            "Serve your library as a read-only JSON API on localhost",
+        ),
+        "daemon": (
+            "commands.daemon",
+            "Keep clibr running in the background to answer commands faster",
+        ),
+    }
+
+    _listing = False
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._loaded: dict[str, click.Command] = {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: click.Context, name: str) -> click.Command | None:
+        if name not in self.lazy_commands:
+            return super().get_command(ctx, name)
+
+        module_name, help = self.lazy_commands[name]
+        if self._listing and name not in self._loaded:
+            return click.Group(name, help=help)
+
+        if name not in self._loaded:
+            module = import_module(module_name)
+            command = typer.main.get_command(module.app)
+            command.name = name
+            command.help = help
+            self._loaded[name] = command
+            timing.mark(f"import {module_name}")
+
+        return self._loaded[name]
+
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        self._listing = True
+        try:
+            super().format_help(ctx, formatter)
+        finally:
+            self._listing = False
+
 
 app = typer.Typer(
     name=cfg.APP_NAME,
     help=cfg.APP_SHORT_DESCRIPTION,
+    cls=LazyGroup,
 )
-app.add_typer(
-    books_app,
-    name="books",
-    help="Manage and explore your book collection",
-)
-app.add_typer(
-    quotes_app,
-    name="quotes",
-    help="Manage and explore your quotes",
-)
+
+
+def report_startup_timing(enabled: bool) -> None:
+    # Eager and reported at exit, as --help exits while the options are still
+    # being parsed, before the context of the command could be closed.
+    if enabled:
+        atexit.register(timing.report)
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     debug: bool = typer.Option(
         False,
         "--debug",
         is_flag=True,
         help="Enable debugging information",
     ),
+    startup_timing: bool = typer.Option(
+        False,
+        "--startup-timing",
+        is_flag=True,
+        is_eager=True,
+        callback=report_startup_timing,
+        help="Print how long each startup phase took to stderr",
+    ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        is_flag=True,
+        help="Print the time spent in each phase of the command and in each SQL statement to stderr",
+    ),
+    profile_output: Optional[Path] = typer.Option(
+        None,
+        "--profile-output",
+        help="Also run the command under cProfile and write the stats to this file. Implies --profile",
+    ),
 ):
     if debug:
         cfg.DEBUG = True
 
+    if profile or profile_output is not None:
+        profiling.enable(profile_output)
+        ctx.call_on_close(profiling.report)
+
+
+timing.mark("imports")
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,131 @@
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+# Rows left behind by deletes that didn't cascade, as (table, condition). They
+# are swept in this order, so authors whose last link was dangling go too.
+ORPHANS = {
+    "links": (
+        "bookauthorlink",
+        "NOT EXISTS (SELECT 1 FROM book WHERE book.id = bookauthorlink.book_id) "
+        "OR NOT EXISTS "
+        "(SELECT 1 FROM author WHERE author.id = bookauthorlink.author_id)",
+    ),
+    "quotes": (
+        "quote",
+        "book_id IS NULL "
+        "OR NOT EXISTS (SELECT 1 FROM book WHERE book.id = quote.book_id)",
+    ),
+    "authors": (
+        "author",
+        "NOT EXISTS "
+        "(SELECT 1 FROM bookauthorlink WHERE bookauthorlink.author_id = author.id)",
+    ),
+}
+
+# Rows ANALYZE looks at per index, so it takes about the same time no matter
+# how large the library grows.
+ANALYSIS_LIMIT = 1000
+
+
+def count_orphans(connection: Connection) -> dict[str, int]:
+    return {
+        name: connection.exec_driver_sql(
+            f"SELECT COUNT(*) FROM {table} WHERE {condition}"
+        ).scalar()
+        for name, (table, condition) in ORPHANS.items()
+    }
+
+
+def sweep_orphans(connection: Connection) -> dict[str, int]:
+    """
+    Deletes the orphaned rows of every table with a single statement each and
+    returns how many were deleted.
+    """
+
+    return {
+        name: connection.exec_driver_sql(
+            f"DELETE FROM {table} WHERE {condition}"
+        ).rowcount
+        for name, (table, condition) in ORPHANS.items()
+    }
+
+
+def analyze(connection: Connection) -> None:
+    connection.exec_driver_sql(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    connection.exec_driver_sql("ANALYZE")
+    connection.exec_driver_sql("PRAGMA optimize")
+
+
+def incremental_vacuum_enabled(connection: Connection) -> bool:
+    # 2 is INCREMENTAL.
+    return connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """
+    Switches the database to incremental vacuum. Existing databases only take
+    the change after a full VACUUM, which rewrites the whole file once.
+    """
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+
+
+def incremental_vacuum(engine: Engine, step_pages: int, max_steps: int) -> int:
+    """
+    Returns free pages to the file system `step_pages` at a time, each step in
+    its own short transaction so other processes can write in between. Stops
+    after `max_steps` steps and returns the number of pages released.
+    """
+
+    released = 0
+    for _ in range(max_steps):
+        with engine.begin() as connection:
+            free = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if not free:
+                break
+
+            # SQLite frees one page per step of the statement, so it has to be
+            # run to the end. SQLAlchemy only steps it once as it has no columns.
+            cursor = connection.connection.cursor()
+            cursor.execute(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+            cursor.close()
+            left = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            released += free - left
+
+    return released
+
+
+def storage_report(connection: Connection) -> dict:
+    """
+    Page counts of the database and the bytes taken by each table along with
+    its indexes.
+    """
+
+    pragma = connection.exec_driver_sql
+    report = {
+        "page_size": pragma("PRAGMA page_size").scalar(),
+        "pages": pragma("PRAGMA page_count").scalar(),
+        "free_pages": pragma("PRAGMA freelist_count").scalar(),
+        "tables": {},
+    }
+
+    try:
+        rows = connection.exec_driver_sql(
+            """
+            SELECT COALESCE(sqlite_master.tbl_name, dbstat.name), SUM(pgsize)
+            FROM dbstat
+            LEFT JOIN sqlite_master ON sqlite_master.name = dbstat.name
+            GROUP BY 1
+            ORDER BY 2 DESC
+            """
+        )
+        report["tables"] = {name: size for name, size in rows}
+    except OperationalError as e:
+        # SQLite builds without the dbstat table only get the page counts.
+        if "dbstat" not in str(e.orig):
+            raise
+
+    return report
@@ -0,0 +1,332 @@
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+import models  # noqa: F401 registers the tables in the metadata
+from models import normalize_key
+
+
+def _search_index_ddl(
+    name: str,
+    source: str,
+    field: str,
+    tokenize: str = "unicode61",
+) -> list[str]:
+    """
+    DDL for an external content FTS5 table over `source.field`. The text itself
+    lives only in the source table and the triggers keep the index in sync.
+    """
+
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {name}
+        USING fts5({field}, content='{source}', content_rowid='id', tokenize='{tokenize}')
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {source} BEGIN
+            INSERT INTO {name}(rowid, {field}) VALUES (new.id, new.{field});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {source} BEGIN
+            INSERT INTO {name}({name}, rowid, {field})
+            VALUES ('delete', old.id, old.{field});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE OF {field} ON {source}
+        BEGIN
+            INSERT INTO {name}({name}, rowid, {field})
+            VALUES ('delete', old.id, old.{field});
+            INSERT INTO {name}(rowid, {field}) VALUES (new.id, new.{field});
+        END
+        """,
+    ]
+
+
+SEARCH_INDEXES = {
+    "quote_fts": _search_index_ddl("quote_fts", "quote", "quote"),
+    "book_title_fts": _search_index_ddl(
+        "book_title_fts",
+        "book",
+        "title",
+        tokenize="trigram",
+    ),
+    "author_name_fts": _search_index_ddl(
+        "author_name_fts",
+        "author",
+        "name",
+        tokenize="trigram",
+    ),
+}
+
+# Same names SQLAlchemy gives to the indexes declared in the models.
+LOOKUP_INDEXES = {
+    "ix_author_name": "author(name)",
+    "ix_quote_book_id": "quote(book_id)",
+    "ix_bookauthorlink_author_id": "bookauthorlink(author_id)",
+    "ix_book_status": "book(status)",
+    "ix_book_fav": "book(fav)",
+}
+
+
+# Tables whose changes invalidate the results cached from them.
+GENERATION_TABLES = ["author", "book", "bookauthorlink", "quote"]
+
+
+def create_generation_counter(connection: Connection) -> None:
+    """
+    Keeps a counter that goes up with every change to the library, so other
+    processes can tell whether what they read before is still current.
+    SQLite's data_version only does that within a single connection.
+    """
+
+    connection.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO data_generation (id, value) VALUES (0, 0)"
+    )
+
+    for table in GENERATION_TABLES:
+        for event in ["insert", "update", "delete"]:
+            connection.exec_driver_sql(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_generation_{event}
+                AFTER {event.upper()} ON {table} BEGIN
+                    UPDATE data_generation SET value = value + 1 WHERE id = 0;
+                END
+                """
+            )
+
+
+def create_library_id(connection: Connection) -> None:
+    """
+    Gives the library a random ID of its own. Its generation counter starts
+    over whenever the database is recreated or restored, so the ID is what
+    tells whether something read before came from this same library.
+    """
+
+    connection.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS library (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            uuid TEXT NOT NULL
+        )
+        """
+    )
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO library (id, uuid) VALUES (0, ?)",
+        (uuid.uuid4().hex,),
+    )
+
+
+def _merge_duplicates(
+    connection: Connection,
+    table: str,
+    key: str,
+    moves: list[str],
+) -> None:
+    """
+    Folds the rows of `table` that share a `key` into the oldest of them.
+    `moves` are the statements that point the rows referencing a duplicate
+    (`old_id`) to the row that is kept (`keep_id`) using the `merge` table.
+    """
+
+    connection.exec_driver_sql(
+        f"""
+        CREATE TEMP TABLE merge AS
+        SELECT {table}.id AS old_id, kept.keep_id
+        FROM {table}
+        JOIN (
+            SELECT {key}, MIN(id) AS keep_id FROM {table}
+            GROUP BY {key} HAVING COUNT(*) > 1
+        ) AS kept ON {table}.{key} = kept.{key}
+        WHERE {table}.id != kept.keep_id
+        """
+    )
+    for statement in moves:
+        connection.exec_driver_sql(statement)
+
+    connection.exec_driver_sql(
+        f"DELETE FROM {table} WHERE id IN (SELECT old_id FROM merge)"
+    )
+    connection.exec_driver_sql("DROP TABLE merge")
+
+
+def add_lookup_keys(connection: Connection) -> None:
+    """
+    Adds the normalized keys of author names and book titles. Authors and
+    books that turn out to be the same once normalized are merged so the keys
+    can be unique.
+    """
+
+    connection.connection.create_function(
+        "normalize_key", 1, normalize_key, deterministic=True
+    )
+
+    for table, field, key in [
+        ("author", "name", "name_key"),
+        ("book", "title", "title_key"),
+    ]:
+        columns = connection.exec_driver_sql(f"PRAGMA table_info({table})")
+        if key not in {column[1] for column in columns}:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {key} VARCHAR")
+
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET {key} = normalize_key({field}) "
+            f"WHERE {key} IS NOT normalize_key({field})"
+        )
+
+    _merge_duplicates(
+        connection,
+        "author",
+        "name_key",
+        [
+            """
+            INSERT OR IGNORE INTO bookauthorlink (book_id, author_id)
+            SELECT book_id, keep_id FROM bookauthorlink
+            JOIN merge ON bookauthorlink.author_id = merge.old_id
+            """,
+            """
+            DELETE FROM bookauthorlink
+            WHERE author_id IN (SELECT old_id FROM merge)
+            """,
+        ],
+    )
+    _merge_duplicates(
+        connection,
+        "book",
+        "title_key",
+        [
+            """
+            INSERT OR IGNORE INTO bookauthorlink (book_id, author_id)
+            SELECT keep_id, author_id FROM bookauthorlink
+            JOIN merge ON bookauthorlink.book_id = merge.old_id
+            """,
+            """
+            DELETE FROM bookauthorlink
+            WHERE book_id IN (SELECT old_id FROM merge)
+            """,
+            """
+            UPDATE quote SET book_id = (
+                SELECT keep_id FROM merge WHERE merge.old_id = quote.book_id
+            )
+            WHERE book_id IN (SELECT old_id FROM merge)
+            """,
+            """
+            UPDATE book SET fav = 1 WHERE id IN (
+                SELECT keep_id FROM merge JOIN book ON book.id = merge.old_id
+                WHERE book.fav
+            )
+            """,
+        ],
+    )
+
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_author_name_key ON author (name_key)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_book_title_key ON book (title_key)"
+    )
+
+
+def create_search_indexes(connection: Connection) -> None:
+    for name, ddl_statements in SEARCH_INDEXES.items():
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,),
+        ).first()
+
+        for ddl in ddl_statements:
+            connection.exec_driver_sql(ddl)
+
+        # Libraries created before the index existed need to be indexed once.
+        if exists is None:
+            connection.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+
+def create_lookup_indexes(connection: Connection) -> None:
+    for name, target in LOOKUP_INDEXES.items():
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+# Ordered schema changes. A database at version N has applied the first N of
+# them. SQLite runs most DDL outside of transactions, so every migration has to
+# be safe to run again if a previous attempt was interrupted.
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("Add full-text search indexes", create_search_indexes),
+    ("Add lookup indexes", create_lookup_indexes),
+    ("Add data generation counter", create_generation_counter),
+    ("Add normalized lookup keys", add_lookup_keys),
+    ("Add author name search index", create_search_indexes),
+    ("Add library ID", create_library_id),
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def get_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _set_version(connection: Connection, version: int) -> None:
+    connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def pending_migrations(engine: Engine) -> list[tuple[int, str]]:
+    with engine.connect() as connection:
+        version = get_version(connection)
+
+    return [
+        (number, description)
+        for number, (description, _) in enumerate(MIGRATIONS, start=1)
+        if number > version
+    ]
+
+
+def migrate(engine: Engine) -> list[tuple[int, str]]:
+    """
+    Brings the schema of the database up to date and returns the migrations
+    that were applied. When the database is already at the latest version this
+    is a single PRAGMA read.
+    """
+
+    with engine.begin() as connection:
+        version = get_version(connection)
+        if version >= LATEST_VERSION:
+            return []
+
+        has_tables = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1"
+        ).first()
+
+        # A new library gets the current schema straight from the models.
+        if has_tables is None:
+            # Only takes effect before the first table is created. Lets
+            # `db maintain` give free pages back without a full VACUUM.
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            SQLModel.metadata.create_all(connection)
+            create_search_indexes(connection)
+            create_generation_counter(connection)
+            create_library_id(connection)
+            _set_version(connection, LATEST_VERSION)
+            return [(LATEST_VERSION, "Create schema")]
+
+        applied = []
+        for number, (description, migration) in enumerate(MIGRATIONS, start=1):
+            if number <= version:
+                continue
+
+            migration(connection)
+            _set_version(connection, number)
+            applied.append((number, description))
+
+        return applied
@@ -1,9 +1,22 @@
+import unicodedata
 from enum import Enum
 from typing import Optional
 
+from sqlalchemy import column, event, table
 from sqlmodel import Field, Relationship, SQLModel
 
 
+def normalize_key(text: str) -> str:
+    """
+    Lookup key of a name or title: accents stripped, casefolded and with
+    whitespace collapsed, so variants of the same text get the same key.
+    """
+
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
 class BookStatus(str, Enum):
     wanted = "wanted"
     pending = "pending"
@@ -22,14 +35,16 @@ class BookAuthorLink(SQLModel, table=True):
         default=None,
         foreign_key="author.id",
         primary_key=True,
+        index=True,
     )
 
 
 class Book(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(index=True, nullable=False)
-    status: BookStatus = BookStatus.pending
-    fav: bool = False
+    title_key: Optional[str] = Field(default=None, index=True, unique=True)
+    status: BookStatus = Field(default=BookStatus.pending, index=True)
+    fav: bool = Field(default=False, index=True)
 
     authors: list["Author"] = Relationship(
         back_populates="books",
@@ -45,7 +60,8 @@ class Book(SQLModel, table=True):
 
 class Author(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str = Field(nullable=False)
+    name: str = Field(index=True, nullable=False)
+    name_key: Optional[str] = Field(default=None, index=True, unique=True)
 
     books: list["Book"] = Relationship(
         back_populates="authors",
@@ -64,6 +80,7 @@ class Quote(SQLModel, table=True):
     book_id: Optional[int] = Field(
         default=None,
         foreign_key="book.id",
+        index=True,
     )
     book: Optional[Book] = Relationship(
         back_populates="quotes",
@@ -71,3 +88,40 @@ class Quote(SQLModel, table=True):
 
     def __str__(self) -> str:
         return f"'{self.quote}'"
+
+
+@event.listens_for(Book, "before_insert")
+@event.listens_for(Book, "before_update")
+def set_title_key(mapper, connection, book: Book) -> None:
+    book.title_key = normalize_key(book.title)
+
+
+@event.listens_for(Author, "before_insert")
+@event.listens_for(Author, "before_update")
+def set_name_key(mapper, connection, author: Author) -> None:
+    author.name_key = normalize_key(author.name)
+
+
+# Word index over Quote.quote used for full-text searches.
+quote_search = table(
+    "quote_fts",
+    column("rowid"),
+    column("quote_fts"),
+    column("rank"),
+)
+
+# Trigram index over Book.title used for substring searches.
+book_title_search = table(
+    "book_title_fts",
+    column("rowid"),
+    column("book_title_fts"),
+    column("rank"),
+)
+
+# Trigram index over Author.name used for fuzzy searches.
+author_name_search = table(
+    "author_name_fts",
+    column("rowid"),
+    column("author_name_fts"),
+    column("rank"),
+)
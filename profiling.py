@@ -0,0 +1,267 @@
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import timing
+
+_enabled = False
+_output: Path | None = None
+_profiler = None
+
+# Time is charged to the phase on top of the stack, so a statement run while
+# rendering counts as query time and not as rendering time.
+_phases: dict[str, float] = defaultdict(float)
+_stack: list[str] = []
+_switched_at = 0.0
+
+
+@dataclass
+class Statement:
+    sql: str
+    shape: str
+    calls: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+
+
+_statements: dict[tuple[str, str], Statement] = {}
+
+
+def enable(output: Path | None = None) -> None:
+    """
+    Starts profiling the command being run. The time spent before this call is
+    reported as startup. When `output` is set the command also runs under
+    cProfile and the stats are dumped there.
+    """
+
+    global _enabled, _output, _profiler, _switched_at
+
+    _enabled = True
+    _output = output
+    _phases["startup"] = timing.elapsed()
+    _switched_at = time.perf_counter()
+    _stack.append("command")
+
+    if output is not None:
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _switch() -> None:
+    global _switched_at
+
+    now = time.perf_counter()
+    if _stack:
+        _phases[_stack[-1]] += now - _switched_at
+
+    _switched_at = now
+
+
+def _push(name: str) -> None:
+    _switch()
+    _stack.append(name)
+
+
+def _pop() -> None:
+    _switch()
+    _stack.pop()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    if not _enabled:
+        yield
+        return
+
+    _push(name)
+    try:
+        yield
+    finally:
+        _pop()
+
+
+def rows(results: Iterable, name: str = "hydration") -> Iterable:
+    """
+    Charges the time spent producing each row of `results` to `name`. Rows
+    are built by the ORM as they are iterated, so this is where hydration
+    happens for streamed results.
+    """
+
+    if not _enabled:
+        return results
+
+    return _timed_rows(iter(results), name)
+
+
+def _timed_rows(results: Iterator, name: str) -> Iterator:
+    while True:
+        _push(name)
+        try:
+            row = next(results)
+        except StopIteration:
+            return
+        finally:
+            _pop()
+
+        yield row
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    SQLite does most of the work of a query while its rows are fetched, so
+    fetches are timed and counted against the statement that produced them.
+    """
+
+    statement: Statement | None = None
+
+    def _fetch(self, fetch, *args):
+        _push("query")
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self.statement is not None:
+                self.statement.seconds += time.perf_counter() - start
+            _pop()
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is not None and self.statement is not None:
+            self.statement.rows += 1
+
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(super().fetchmany, *args)
+        if self.statement is not None:
+            self.statement.rows += len(rows)
+
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        if self.statement is not None:
+            self.statement.rows += len(rows)
+
+        return rows
+
+
+class ProfilingConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+
+def _shape(parameters, executemany: bool) -> str:
+    if executemany:
+        width = len(parameters[0]) if parameters else 0
+        return f"{len(parameters)} x {width}"
+
+    return f"{len(parameters or ())}"
+
+
+def instrument(engine) -> None:
+    """
+    Hooks the engine events to time every statement it runs and count the
+    rows it returns or changes.
+    """
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "do_connect")
+    def do_connect(dialect, conn_rec, cargs, cparams):
+        cparams["factory"] = ProfilingConnection
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        sql = " ".join(statement.split())
+        shape = _shape(parameters, executemany)
+        record = _statements.setdefault((sql, shape), Statement(sql, shape))
+        record.calls += 1
+
+        if isinstance(cursor, ProfilingCursor):
+            cursor.statement = record
+
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+        _push("query")
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        _pop()
+        elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+
+        record = getattr(cursor, "statement", None)
+        if record is None:
+            return
+
+        record.seconds += elapsed
+        if cursor.rowcount > 0:
+            record.rows += cursor.rowcount
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.cursor is not None and context.connection is not None:
+            _pop()
+            context.connection.info["profile_start"].pop()
+
+
+def report(top: int = 15) -> None:
+    """
+    Prints how long each phase of the command took and the statements that
+    took the longest to stderr.
+    """
+
+    from rich.console import Console
+    from rich.table import Table
+
+    while _stack:
+        _pop()
+
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_output)
+
+    console = Console(stderr=True)
+    total = sum(_phases.values())
+
+    phases = Table(title="Phases")
+    phases.add_column("Phase")
+    phases.add_column("ms", justify="right")
+    phases.add_column("%", justify="right")
+    for name, seconds in _phases.items():
+        share = seconds / total * 100 if total else 0
+        phases.add_row(name, f"{seconds * 1000:.1f}", f"{share:.1f}")
+
+    phases.add_row("total", f"{total * 1000:.1f}", "100.0", style="bold")
+    console.print(phases)
+
+    statements = sorted(_statements.values(), key=lambda s: s.seconds, reverse=True)
+    table = Table(title=f"Statements ({len(statements)})")
+    table.add_column("SQL", overflow="fold")
+    table.add_column("Params", justify="right")
+    table.add_column("Calls", justify="right")
+    table.add_column("Rows", justify="right")
+    table.add_column("ms", justify="right")
+    for statement in statements[:top]:
+        table.add_row(
+            statement.sql,
+            statement.shape,
+            f"{statement.calls}",
+            f"{statement.rows}",
+            f"{statement.seconds * 1000:.1f}",
+        )
+
+    console.print(table)
+
+    if _output is not None:
+        print(f"cProfile stats written to {_output}", file=sys.stderr)
@@ -2,3 +2,5 @@ from .book_repository import BookRepository
 from .author_repository import AuthorRepository
 from .quote_repository import QuoteRepository
 from .enums import BookOrder, QuoteOrder
+from .stats_repository import StatsRepository
+from .cache import ResultCache
@@ -1,6 +1,6 @@
-from sqlmodel import Session, select
+from sqlmodel import Session, insert, select
 
-from models import Author
+from models import Author, author_name_search, normalize_key
 
 from .base_repository import BaseRepository
 
@@ -21,9 +21,53 @@ class AuthorRepository(BaseRepository):
             original_author.name = new_name
 
     def get_by_name(self, session: Session, name: str) -> Author | None:
-        stmt = select(self.model_type).where(self.model_type.name == name)
+        """
+        Finds the author by the normalized key of `name`, so differences in
+        case, accents or spacing don't matter.
+        """
+
+        stmt = select(self.model_type).where(
+            self.model_type.name_key == normalize_key(name)
+        )
         return session.exec(stmt).first()
 
+    def similar(
+        self,
+        session: Session,
+        name: str,
+        limit: int = 5,
+    ) -> list[tuple[Author, float]]:
+        """
+        Authors with names similar to `name`, most similar first, to suggest
+        when there's no exact match.
+        """
+
+        return self._similar(session, author_name_search, "name", name, limit)
+
+    def ids_by_key(self, session: Session) -> dict[str, int]:
+        stmt = select(self.model_type.name_key, self.model_type.id)
+        return {key: id for key, id in session.exec(stmt)}
+
+    def bulk_add(self, session: Session, names: list[str]) -> dict[str, int]:
+        """
+        Inserts all the authors in a single executemany and returns the IDs
+        assigned to them by normalized key. Names must have different keys.
+        """
+
+        if not names:
+            return {}
+
+        keys = [normalize_key(name) for name in names]
+        session.execute(
+            insert(self.model_type),
+            [{"name": name, "name_key": key} for name, key in zip(names, keys)],
+        )
+
+        stmt = select(self.model_type.name_key, self.model_type.id).where(
+            self.model_type.name_key.in_(keys)
+        )
+        return {key: id for key, id in session.exec(stmt)}
+
     def list(self, session: Session) -> list[Author]:
         stmt = select(self.model_type)
         results = session.exec(stmt)
@@ -1,6 +1,18 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 
-from sqlmodel import Session, SQLModel, select
+from sqlalchemy import column, table
+from sqlmodel import Session, SQLModel, delete, insert, or_, select, text
+
+from .search import SIMILARITY_THRESHOLD, fuzzy_match_query, trigram_similarity
+
+# Rows scored for similarity in a fuzzy search, the ones sharing the most
+# trigrams with what is searched for.
+FUZZY_CANDIDATES = 200
+
+# Temporary table holding the IDs picked by a filter, so statements that
+# change the rows the filter joins on still act on the same set.
+selected_ids = table("selected_id", column("id"))
 
 
 class BaseRepository(ABC):
@@ -23,6 +35,73 @@ class BaseRepository(ABC):
         item = self.get_by_id(session, id)
         session.delete(item)
 
+    def _id_ranges(self, stmt, ids: list[tuple[int, int]] | None):
+        if not ids:
+            return stmt
+
+        return stmt.where(
+            or_(*[self.model_type.id.between(low, high) for low, high in ids])
+        )
+
+    def _select_ids(self, session: Session, stmt) -> int:
+        """
+        Stores the IDs returned by `stmt` in the `selected_id` temporary table
+        and returns how many there are.
+        """
+
+        session.execute(
+            text("CREATE TEMP TABLE IF NOT EXISTS selected_id (id INTEGER PRIMARY KEY)")
+        )
+        session.execute(delete(selected_ids))
+        result = session.execute(insert(selected_ids).from_select(["id"], stmt))
+        return result.rowcount
+
+    def _similar(
+        self,
+        session: Session,
+        search,
+        field: str,
+        value: str,
+        limit: int,
+    ) -> list[tuple[SQLModel, float]]:
+        """
+        Finds the rows whose `field` is most similar to `value`, best first,
+        along with their similarity. The trigram index `search` over the field
+        narrows them down to a few candidates, so typos don't need a scan.
+        """
+
+        match_query = fuzzy_match_query(value)
+        if match_query is None:
+            return []
+
+        stmt = (
+            select(self.model_type)
+            .join(search, search.c.rowid == self.model_type.id)
+            .where(search.c[search.name].op("MATCH")(match_query))
+            .order_by(search.c.rank)
+            .limit(FUZZY_CANDIDATES)
+        )
+        scored = [
+            (row, trigram_similarity(value, getattr(row, field)))
+            for row in session.exec(stmt)
+        ]
+        scored = [
+            (row, score) for row, score in scored if score >= SIMILARITY_THRESHOLD
+        ]
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:limit]
+
+    def _rows(
+        self,
+        session: Session,
+        stmt,
+        chunk_size: int | None = None,
+    ) -> list | Iterator:
+        if chunk_size is not None:
+            return iter(session.exec(stmt.execution_options(yield_per=chunk_size)))
+
+        return session.exec(stmt).all()
+
     @abstractmethod
     def list(self, session: Session) -> list[SQLModel]:
         pass
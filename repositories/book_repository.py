@@ -1,11 +1,35 @@
+from collections.abc import Iterator
 from typing import Optional
 
-from sqlmodel import Session, or_, select, desc
+from sqlalchemy.orm import selectinload
+from sqlmodel import (
+    Session,
+    delete,
+    desc,
+    distinct,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
 
-from models import Author, Book, BookAuthorLink, BookStatus
+from models import (
+    Author,
+    Book,
+    BookAuthorLink,
+    BookStatus,
+    Quote,
+    book_title_search,
+    normalize_key,
+)
 
-from .base_repository import BaseRepository
+from .author_repository import AuthorRepository
+from .base_repository import FUZZY_CANDIDATES, BaseRepository, selected_ids
+from .cache import ResultCache, cache_key
 from .enums import BookOrder
+from .pagination import decode_cursor, encode_cursor, keyset_condition
+from .search import SIMILARITY_THRESHOLD, trigram_match_query, trigram_similarity
 
 
 class BookRepository(BaseRepository):
@@ -37,26 +61,280 @@ class BookRepository(BaseRepository):
             original_book.fav = new_fav
 
     def get_by_title(self, session: Session, title: str) -> Book | None:
-        stmt = select(self.model_type).where(self.model_type.title == title)
+        """
+        Finds the book by the normalized key of `title`, so differences in
+        case, accents or spacing don't matter.
+        """
+
+        stmt = select(self.model_type).where(
+            self.model_type.title_key == normalize_key(title)
+        )
         return session.exec(stmt).first()
 
-    def list(
+    def similar(
+        self,
+        session: Session,
+        title: str,
+        limit: int = 5,
+    ) -> list[tuple[Book, float]]:
+        """
+        Books with titles similar to `title`, most similar first, to suggest
+        when there's no exact match.
+        """
+
+        return self._similar(session, book_title_search, "title", title, limit)
+
+    def find_similar(
+        self,
+        session: Session,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        limit: int = 10,
+    ) -> list[dict]:
+        """
+        Finds books by a title, an author name or both, tolerating typos.
+        Books are ranked by how similar their title and closest author are to
+        the ones given, and come as rows with their `Book`, each `Author` and
+        the `score` of the book like `list` returns them.
+        """
+
+        book_ids = {}
+        if title is not None:
+            for book, _ in self.similar(session, title, FUZZY_CANDIDATES):
+                book_ids[book.id] = None
+
+        if author is not None:
+            # Books of the most similar authors first, so the ones by the author
+            # that was typed are never left out by those of lookalike names.
+            authors = AuthorRepository().similar(session, author, FUZZY_CANDIDATES)
+            remaining = FUZZY_CANDIDATES
+            for found, _ in authors:
+                stmt = (
+                    select(BookAuthorLink.book_id)
+                    .where(BookAuthorLink.author_id == found.id)
+                    .order_by(BookAuthorLink.book_id)
+                    .limit(remaining)
+                )
+                ids = session.exec(stmt).all()
+                book_ids.update(dict.fromkeys(ids))
+                remaining -= len(ids)
+                if remaining <= 0:
+                    break
+
+        stmt = (
+            select(self.model_type)
+            .where(self.model_type.id.in_(list(book_ids)))
+            .options(selectinload(self.model_type.authors))
+        )
+        books = session.exec(stmt).all()
+
+        scored = []
+        for book in books:
+            scores = []
+            if title is not None:
+                scores.append(trigram_similarity(title, book.title))
+            if author is not None:
+                scores.append(
+                    max(trigram_similarity(author, a.name) for a in book.authors)
+                )
+
+            score = sum(scores) / len(scores) if scores else 0.0
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((score, book))
+
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [
+            {"Book": book, "Author": book_author, "score": score}
+            for score, book in scored[:limit]
+            for book_author in book.authors
+        ]
+
+    def ids_by_key(self, session: Session) -> dict[str, int]:
+        stmt = select(self.model_type.title_key, self.model_type.id)
+        return {key: id for key, id in session.exec(stmt)}
+
+    def bulk_add(self, session: Session, books: list[dict]) -> dict[str, int]:
+        """
+        Inserts all the books in a single executemany and returns the IDs
+        assigned to them by the normalized key of their title. Titles must
+        have different keys.
+        """
+
+        if not books:
+            return {}
+
+        books = [{**book, "title_key": normalize_key(book["title"])} for book in books]
+        session.execute(insert(self.model_type), books)
+
+        keys = [book["title_key"] for book in books]
+        stmt = select(self.model_type.title_key, self.model_type.id).where(
+            self.model_type.title_key.in_(keys)
+        )
+        return {key: id for key, id in session.exec(stmt)}
+
+    def bulk_link_authors(
+        self,
+        session: Session,
+        links: list[tuple[int, int]],
+    ) -> None:
+        if not links:
+            return
+
+        session.execute(
+            insert(BookAuthorLink),
+            [
+                {"book_id": book_id, "author_id": author_id}
+                for book_id, author_id in links
+            ],
+        )
+
+    def count_export_rows(self, session: Session) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(BookAuthorLink)
+            .join(self.model_type, self.model_type.id == BookAuthorLink.book_id)
+            .join(Author, Author.id == BookAuthorLink.author_id)
+        )
+        return session.exec(stmt).one()
+
+    def export_rows(
+        self,
+        session: Session,
+        chunk_size: int = 1000,
+    ) -> Iterator[tuple[int, str, str, BookStatus, bool]]:
+        """
+        Streams (id, title, author, status, fav) for every book and author pair
+        ordered by ID, fetching `chunk_size` rows at a time instead of loading
+        whole ORM objects.
+        """
+
+        stmt = (
+            select(
+                self.model_type.id,
+                self.model_type.title,
+                Author.name,
+                self.model_type.status,
+                self.model_type.fav,
+            )
+            .join(BookAuthorLink, self.model_type.id == BookAuthorLink.book_id)
+            .join(Author, Author.id == BookAuthorLink.author_id)
+            .order_by(self.model_type.id, Author.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        yield from session.exec(stmt)
+
+    def count(
         self,
         session: Session,
         words: Optional[list[str]] = None,
         author_id: Optional[int] = None,
         status: Optional[BookStatus] = None,
         fav: Optional[bool] = None,
-        order_by: Optional[BookOrder] = BookOrder.title,
-        reverse_order: bool = False,
-        limit: Optional[int] = None,
-    ) -> list[Book] | None:
-        stmt = select(self.model_type, Author)
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Counts the books `list` would return for the same filters. Books with
+        several authors are only counted once. `ids` limits the count to
+        books with IDs in any of the inclusive (low, high) ranges.
+        """
+
+        stmt = select(func.count(distinct(self.model_type.id)))
+        stmt = self._filter(stmt, words, author_id, status, fav)
+        stmt = self._id_ranges(stmt, ids)
+        return session.exec(stmt).one()
 
+    def update_matching(
+        self,
+        session: Session,
+        changes: dict,
+        words: Optional[list[str]] = None,
+        author_id: Optional[int] = None,
+        status: Optional[BookStatus] = None,
+        fav: Optional[bool] = None,
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Applies `changes`, new values for title, status or fav, to every book
+        `count` would count for the same filters in a single UPDATE and
+        returns how many books were updated.
+        """
+
+        unknown = set(changes) - {"title", "status", "fav"}
+        if unknown:
+            raise ValueError(f"books can't be updated by {', '.join(sorted(unknown))}")
+
+        if "title" in changes:
+            changes = {**changes, "title_key": normalize_key(changes["title"])}
+
+        stmt = select(self.model_type.id)
+        stmt = self._filter(stmt, words, author_id, status, fav)
+        stmt = self._id_ranges(stmt, ids)
+
+        result = session.execute(
+            update(self.model_type)
+            .where(self.model_type.id.in_(stmt))
+            .values(**changes)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def delete_matching(
+        self,
+        session: Session,
+        words: Optional[list[str]] = None,
+        author_id: Optional[int] = None,
+        status: Optional[BookStatus] = None,
+        fav: Optional[bool] = None,
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Deletes the books `count` would count for the same filters, along with
+        their quotes and author links, and returns how many books were
+        deleted. Each table is cleared with a single statement.
+        """
+
+        stmt = select(self.model_type.id).distinct()
+        stmt = self._filter(stmt, words, author_id, status, fav)
+        stmt = self._id_ranges(stmt, ids)
+        self._select_ids(session, stmt)
+
+        selected = select(selected_ids.c.id)
+        session.execute(
+            delete(Quote)
+            .where(Quote.book_id.in_(selected))
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            delete(BookAuthorLink)
+            .where(BookAuthorLink.book_id.in_(selected))
+            .execution_options(synchronize_session=False)
+        )
+        result = session.execute(
+            delete(self.model_type)
+            .where(self.model_type.id.in_(selected))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def _filter(
+        self,
+        stmt,
+        words: Optional[list[str]],
+        author_id: Optional[int],
+        status: Optional[BookStatus],
+        fav: Optional[bool],
+    ):
         if words is not None:
+            match_query, like_words = trigram_match_query(words)
             title_conditions = [
-                self.model_type.title.ilike(f"%{word}%") for word in words
+                self.model_type.title.ilike(f"%{word}%") for word in like_words
             ]
+            if match_query is not None:
+                matching_ids = select(book_title_search.c.rowid).where(
+                    book_title_search.c.book_title_fts.op("MATCH")(match_query)
+                )
+                title_conditions.append(self.model_type.id.in_(matching_ids))
+
             stmt = stmt.where(or_(*title_conditions))
 
         if author_id is not None:
@@ -68,24 +346,99 @@ class BookRepository(BaseRepository):
         if fav is not None:
             stmt = stmt.where(self.model_type.fav == fav)
 
-        stmt = stmt.join(BookAuthorLink, self.model_type.id == BookAuthorLink.book_id)
+        stmt = stmt.join_from(
+            self.model_type,
+            BookAuthorLink,
+            self.model_type.id == BookAuthorLink.book_id,
+        )
         stmt = stmt.join(Author, Author.id == BookAuthorLink.author_id)
 
-        order_column = self.model_type.title
-        if order_by == BookOrder.author:
-            order_column = Author.name
-        elif order_by == BookOrder.id:
-            order_column = self.model_type.id
+        return stmt
+
+    def list(
+        self,
+        session: Session,
+        words: Optional[list[str]] = None,
+        author_id: Optional[int] = None,
+        status: Optional[BookStatus] = None,
+        fav: Optional[bool] = None,
+        order_by: Optional[BookOrder] = BookOrder.title,
+        reverse_order: bool = False,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+    ) -> list[Book] | Iterator[Book]:
+        """
+        Lists books along with each of their authors. `after` is a cursor
+        returned by `cursor` for the last row of the previous page; the next
+        page starts right after it in the same order. When `chunk_size` is
+        given the rows are streamed that many at a time instead of being
+        loaded at once. Results are read from and saved to `cache` if given.
+        """
+
+        stmt = select(self.model_type, Author)
+        stmt = self._filter(stmt, words, author_id, status, fav)
+
+        order_by = order_by or BookOrder.title
+        keys = self._order_keys(order_by)
+        if after is not None:
+            values = decode_cursor(after, order_by.value, len(keys))
+            stmt = stmt.where(keyset_condition(keys, values, reverse_order))
 
         stmt = (
-            stmt.order_by(desc(order_column))
+            stmt.order_by(*[desc(key) for key in keys])
             if reverse_order
-            else stmt.order_by(order_column)
+            else stmt.order_by(*keys)
         )
 
         if limit is not None:
             stmt = stmt.limit(limit)
 
-        results = session.exec(stmt)
-        books = results.all()
-        return books
+        if cache is not None:
+            key = cache_key(
+                "books",
+                words=words,
+                author_id=author_id,
+                status=status,
+                fav=fav,
+                order_by=order_by,
+                reverse_order=reverse_order,
+                limit=limit,
+                after=after,
+            )
+            return cache.results(
+                session,
+                key,
+                lambda: self._rows(session, stmt, chunk_size),
+                stream=chunk_size is not None,
+            )
+
+        return self._rows(session, stmt, chunk_size)
+
+    def cursor(self, result, order_by: Optional[BookOrder] = BookOrder.title) -> str:
+        """
+        Returns the cursor to pass as `after` to get the rows following
+        `result`, one of the rows returned by `list`.
+        """
+
+        order_by = order_by or BookOrder.title
+        book, author = result["Book"], result["Author"]
+
+        values = [book.title, book.id, author.id]
+        if order_by == BookOrder.author:
+            values[0] = author.name
+        elif order_by == BookOrder.id:
+            values = values[1:]
+
+        return encode_cursor(order_by.value, values)
+
+    def _order_keys(self, order_by: BookOrder) -> list:
+        # Book and author IDs break ties so every row has a unique position.
+        keys = [self.model_type.title, self.model_type.id, Author.id]
+        if order_by == BookOrder.author:
+            keys[0] = Author.name
+        elif order_by == BookOrder.id:
+            keys = keys[1:]
+
+        return keys
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from enum import Enum
+from pathlib import Path
+
+from sqlmodel import Session, SQLModel, text
+
+from models import Author, Book, Quote
+
+MODELS: dict[str, type[SQLModel]] = {
+    "Author": Author,
+    "Book": Book,
+    "Quote": Quote,
+}
+
+
+def data_generation(session: Session) -> int:
+    return session.exec(text("SELECT value FROM data_generation")).scalar()
+
+
+def library_id(session: Session) -> str:
+    return session.exec(text("SELECT uuid FROM library")).scalar()
+
+
+def cache_key(name: str, **filters) -> str:
+    """
+    Key of the results of `name` for the received filters. Words are matched
+    case-insensitively and in any order, so they are normalized to the same
+    key.
+    """
+
+    normalized = {}
+    for field, value in filters.items():
+        if field == "words" and value is not None:
+            value = sorted({word.strip().lower() for word in value})
+        elif isinstance(value, Enum):
+            value = value.value
+
+        normalized[field] = value
+
+    data = json.dumps([name, normalized], sort_keys=True)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def _dump(rows: list) -> bytes:
+    data = [
+        [
+            [key, type(value).__name__, value.dict()]
+            if isinstance(value, SQLModel)
+            else [key, None, value]
+            for key, value in row._mapping.items()
+        ]
+        for row in rows
+    ]
+    return zlib.compress(json.dumps(data).encode())
+
+
+def _load(data: bytes) -> list[dict]:
+    return [
+        {
+            key: MODELS[model](**value) if model is not None else value
+            for key, model, value in row
+        }
+        for row in json.loads(zlib.decompress(data))
+    ]
+
+
+class ResultCache:
+    """
+    Least recently used cache of list results kept in a SQLite file. Entries
+    are tagged with the data generation of the library they were read from and
+    are only served while it hasn't changed. Results that would take more than
+    a quarter of `max_bytes` aren't cached.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._connection = None
+        self._library = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, isolation_level=None)
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entry (
+                    key TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    used_at REAL NOT NULL
+                )
+                """
+            )
+
+        return self._connection
+
+    def get(self, key: str, generation: int) -> list[dict] | None:
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT data FROM entry WHERE key = ? AND generation = ?",
+                (key, generation),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE entry SET used_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        except sqlite3.Error:
+            return None
+
+        return _load(row[0])
+
+    def put(self, key: str, generation: int, rows: list) -> None:
+        data = _dump(rows)
+        if len(data) > self.max_bytes // 4:
+            return
+
+        try:
+            connection = self._connect()
+            with connection:
+                # The generation only goes up, so older entries can't be hit.
+                connection.execute("BEGIN")
+                connection.execute(
+                    "DELETE FROM entry WHERE generation != ?", (generation,)
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?)",
+                    (key, generation, data, len(data), time.time()),
+                )
+                connection.execute(
+                    """
+                    DELETE FROM entry WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (
+                                ORDER BY used_at DESC, key
+                            ) AS total
+                            FROM entry
+                        )
+                        WHERE total > ?
+                    )
+                    """,
+                    (self.max_bytes,),
+                )
+        except sqlite3.Error:
+            pass
+
+    def use_library(self, library: str) -> bool:
+        """
+        Drops every entry when they were cached from another library, like
+        one that has been recreated or restored since. Generations are only
+        comparable within the same library. Returns whether the cache can be
+        used for `library`.
+        """
+
+        if library == self._library:
+            return True
+
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS library (uuid TEXT NOT NULL)"
+                )
+                row = connection.execute("SELECT uuid FROM library").fetchone()
+                if row is None or row[0] != library:
+                    connection.execute("DELETE FROM entry")
+                    connection.execute("DELETE FROM library")
+                    connection.execute("INSERT INTO library VALUES (?)", (library,))
+        except sqlite3.Error:
+            return False
+
+        self._library = library
+        return True
+
+    def clear(self) -> None:
+        try:
+            self._connect().execute("DELETE FROM entry")
+        except sqlite3.Error:
+            pass
+
+    def results(
+        self,
+        session: Session,
+        key: str,
+        query: Callable[[], Iterable],
+        stream: bool = False,
+    ) -> list | Iterator:
+        """
+        Returns the cached results for `key` or runs `query` and caches what
+        it returns. Streamed results are cached once they have been consumed
+        to the end, as long as they stay under the size limit.
+        """
+
+        if not self.use_library(library_id(session)):
+            rows = query()
+            return rows if stream else list(rows)
+
+        generation = data_generation(session)
+        cached = self.get(key, generation)
+        if cached is not None:
+            return iter(cached) if stream else cached
+
+        if not stream:
+            rows = list(query())
+            self.put(key, generation, rows)
+            return rows
+
+        return self._stream(key, generation, query())
+
+    def _stream(self, key: str, generation: int, rows: Iterable) -> Iterator:
+        # Stop keeping rows once there are clearly too many to fit in an entry.
+        kept = []
+        limit = self.max_bytes // 512
+        for row in rows:
+            if kept is not None:
+                kept.append(row)
+                if len(kept) > limit:
+                    kept = None
+
+            yield row
+
+        if kept is not None:
+            self.put(key, generation, kept)
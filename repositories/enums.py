@@ -12,3 +12,4 @@ class QuoteOrder(str, Enum):
     quote = "quote"
     book = "book"
     author = "author"
+    rank = "rank"
@@ -0,0 +1,45 @@
+import base64
+import json
+from typing import Any
+
+from sqlalchemy import and_, tuple_
+
+
+def encode_cursor(order: str, values: list[Any]) -> str:
+    data = json.dumps([order, *values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str, size: int) -> list[Any]:
+    """
+    Returns the key values stored in a cursor built by `encode_cursor`.
+    Raises a ValueError if the cursor is malformed or was built for a
+    different order.
+    """
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError) as e:
+        raise ValueError("the cursor is not valid") from e
+
+    if not isinstance(data, list) or len(data) != size + 1:
+        raise ValueError("the cursor is not valid")
+
+    if data[0] != order:
+        raise ValueError(f"the cursor was created for results ordered by {data[0]}")
+
+    return data[1:]
+
+
+def keyset_condition(keys: list, values: list[Any], reverse: bool = False):
+    """
+    Condition selecting the rows that come after `values` when ordering by
+    `keys`. The leading column is also bound on its own so an index on it can
+    be used to seek to the start of the page.
+    """
+
+    if reverse:
+        return and_(keys[0] <= values[0], tuple_(*keys) < tuple_(*values))
+
+    return and_(keys[0] >= values[0], tuple_(*keys) > tuple_(*values))
@@ -1,11 +1,16 @@
+import random
+from collections.abc import Iterator
 from typing import Optional
 
-from sqlmodel import Session, or_, select, desc
+from sqlmodel import Session, delete, desc, distinct, func, insert, select, update
 
-from models import Author, Book, BookAuthorLink, Quote
+from models import Author, Book, BookAuthorLink, Quote, quote_search
 
 from .base_repository import BaseRepository
+from .cache import ResultCache, cache_key
 from .enums import QuoteOrder
+from .pagination import decode_cursor, encode_cursor, keyset_condition
+from .search import fts_match_query
 
 
 class QuoteRepository(BaseRepository):
@@ -16,9 +21,19 @@ class QuoteRepository(BaseRepository):
         stmt = select(self.model_type).where(self.model_type.quote == quote)
         return session.exec(stmt).first()
 
+    def texts(self, session: Session, chunk_size: int = 10_000) -> Iterator[str]:
+        stmt = select(self.model_type.quote).execution_options(yield_per=chunk_size)
+        yield from session.exec(stmt)
+
     def add(self, session: Session, quote: Quote) -> None:
         session.add(quote)
 
+    def bulk_add(self, session: Session, quotes: list[dict]) -> None:
+        if not quotes:
+            return
+
+        session.execute(insert(self.model_type), quotes)
+
     def update(
         self,
         session: Session,
@@ -41,36 +56,272 @@ class QuoteRepository(BaseRepository):
         if new_fav is not None:
             original_quote.fav = new_fav
 
-    def list(
+    def count_export_rows(self, session: Session) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(self.model_type)
+            .join(Book, Book.id == self.model_type.book_id)
+            .join(BookAuthorLink, Book.id == BookAuthorLink.book_id)
+            .join(Author, Author.id == BookAuthorLink.author_id)
+        )
+        return session.exec(stmt).one()
+
+    def export_rows(
+        self,
+        session: Session,
+        chunk_size: int = 1000,
+    ) -> Iterator[tuple[int, str, str, str, bool]]:
+        """
+        Streams (id, quote, book, author, fav) for every quote and author pair
+        ordered by ID, fetching `chunk_size` rows at a time instead of loading
+        whole ORM objects.
+        """
+
+        stmt = (
+            select(
+                self.model_type.id,
+                self.model_type.quote,
+                Book.title,
+                Author.name,
+                self.model_type.fav,
+            )
+            .join(Book, Book.id == self.model_type.book_id)
+            .join(BookAuthorLink, Book.id == BookAuthorLink.book_id)
+            .join(Author, Author.id == BookAuthorLink.author_id)
+            .order_by(self.model_type.id, Author.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        yield from session.exec(stmt)
+
+    def count(
         self,
         session: Session,
         words: Optional[list[str]] = None,
         book_id: Optional[int] = None,
         author_id: Optional[int] = None,
         fav: Optional[bool] = None,
-        order_by: Optional[QuoteOrder] = QuoteOrder.quote,
-        reverse_order: Optional[bool] = False,
-        limit: Optional[int] = None,
-    ) -> list[Quote]:
-        stmt = select(
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Counts the quotes `list` would return for the same filters. Quotes from
+        books with several authors are only counted once. `ids` limits the
+        count to quotes with IDs in any of the inclusive (low, high) ranges.
+        """
+
+        match_query = fts_match_query(words) if words is not None else None
+
+        stmt = select(func.count(distinct(self.model_type.id)))
+        stmt = self._filter(stmt, match_query, book_id, author_id, fav)
+        stmt = self._id_ranges(stmt, ids)
+        return session.exec(stmt).one()
+
+    def update_matching(
+        self,
+        session: Session,
+        changes: dict,
+        words: Optional[list[str]] = None,
+        book_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        fav: Optional[bool] = None,
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Applies `changes`, new values for quote, fav or book_id, to every quote
+        `count` would count for the same filters in a single UPDATE and
+        returns how many quotes were updated.
+        """
+
+        unknown = set(changes) - {"quote", "fav", "book_id"}
+        if unknown:
+            raise ValueError(f"quotes can't be updated by {', '.join(sorted(unknown))}")
+
+        match_query = fts_match_query(words) if words is not None else None
+
+        stmt = select(self.model_type.id)
+        stmt = self._filter(stmt, match_query, book_id, author_id, fav)
+        stmt = self._id_ranges(stmt, ids)
+
+        result = session.execute(
+            update(self.model_type)
+            .where(self.model_type.id.in_(stmt))
+            .values(**changes)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def delete_matching(
+        self,
+        session: Session,
+        words: Optional[list[str]] = None,
+        book_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        fav: Optional[bool] = None,
+        ids: Optional[list[tuple[int, int]]] = None,
+    ) -> int:
+        """
+        Deletes the quotes `count` would count for the same filters in a
+        single statement and returns how many were deleted.
+        """
+
+        match_query = fts_match_query(words) if words is not None else None
+
+        stmt = select(self.model_type.id)
+        stmt = self._filter(stmt, match_query, book_id, author_id, fav)
+        stmt = self._id_ranges(stmt, ids)
+
+        result = session.execute(
+            delete(self.model_type)
+            .where(self.model_type.id.in_(stmt))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def sample(
+        self,
+        session: Session,
+        n: int = 1,
+        book_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        fav: Optional[bool] = None,
+        fav_weight: float = 1.0,
+        rng: Optional[random.Random] = None,
+    ) -> list:
+        """
+        Picks up to `n` distinct quotes at random, along with their book and
+        one of their authors, without reading the whole table. Favourites are
+        `fav_weight` times as likely to be picked as other quotes.
+        """
+
+        rng = rng if rng is not None else random.Random()
+        # SQLite only reads a single row for MIN or MAX of the primary key when
+        # each has a query of its own.
+        low = session.exec(select(func.min(self.model_type.id))).one()
+        high = session.exec(select(func.max(self.model_type.id))).one()
+        if low is None:
+            return []
+
+        stmt = select(self.model_type.id, self.model_type.fav)
+        stmt = self._filter(stmt, None, book_id, author_id, fav)
+
+        picked = self._probe_ids(session, stmt, n, low, high, fav_weight, rng)
+        if len(picked) < n:
+            picked += self._seek_ids(
+                session, stmt, n - len(picked), picked, low, high, rng
+            )
+
+        if not picked:
+            return []
+
+        rows = session.exec(
+            self._filter(
+                select(self.model_type, Book, Author), None, book_id, author_id, fav
+            )
+            .where(self.model_type.id.in_(picked))
+            .order_by(Author.id)
+        ).all()
+
+        by_id = {}
+        for row in rows:
+            by_id.setdefault(row["Quote"].id, row)
+
+        return [by_id[id] for id in picked]
+
+    def _probe_ids(
+        self,
+        session: Session,
+        stmt,
+        n: int,
+        low: int,
+        high: int,
+        fav_weight: float,
+        rng: random.Random,
+        rounds: int = 8,
+    ) -> list[int]:
+        # Random IDs are looked up by primary key a batch at a time, so every
+        # existing quote is equally likely to be hit however the IDs are
+        # spread. Other quotes are rejected as often as needed to favour
+        # favourites by `fav_weight`.
+        picked = {}
+        for _ in range(rounds):
+            missing = n - len(picked)
+            if missing <= 0:
+                break
+
+            probes = {rng.randint(low, high) for _ in range(2 * missing + 8)}
+            for id, is_fav in session.exec(
+                stmt.where(self.model_type.id.in_(probes)).distinct()
+            ):
+                if len(picked) == n or id in picked:
+                    continue
+                if not is_fav and fav_weight > 1 and rng.random() * fav_weight > 1:
+                    continue
+
+                picked[id] = None
+
+        ids = list(picked)
+        rng.shuffle(ids)
+        return ids
+
+    def _seek_ids(
+        self,
+        session: Session,
+        stmt,
+        n: int,
+        picked: list[int],
+        low: int,
+        high: int,
+        rng: random.Random,
+    ) -> list[int]:
+        # When probes keep missing, because the IDs are sparse or the filters
+        # match few quotes, each random ID is rounded up to the next matching
+        # one instead, wrapping around to the lowest.
+        exclude = set(picked)
+        ids = []
+        for _ in range(n):
+            start = rng.randint(low, high)
+            candidates = stmt.where(self.model_type.id.not_in(exclude))
+            id = None
+            for condition in [
+                self.model_type.id >= start,
+                self.model_type.id < start,
+            ]:
+                row = session.exec(
+                    candidates.where(condition).order_by(self.model_type.id).limit(1)
+                ).first()
+                if row is not None:
+                    id = row[0]
+                    break
+
+            if id is None:
+                break
+
+            exclude.add(id)
+            ids.append(id)
+
+        return ids
+
+    def _filter(
+        self,
+        stmt,
+        match_query: Optional[str],
+        book_id: Optional[int],
+        author_id: Optional[int],
+        fav: Optional[bool],
+    ):
+        stmt = stmt.join_from(
             self.model_type,
             Book,
-            Author,
-        ).where(self.model_type.book_id == Book.id)
-
-        stmt = stmt.join(
-            BookAuthorLink, self.model_type.book_id == BookAuthorLink.book_id
+            self.model_type.book_id == Book.id,
         )
+        stmt = stmt.join(BookAuthorLink, Book.id == BookAuthorLink.book_id)
         stmt = stmt.join(Author, Author.id == BookAuthorLink.author_id)
 
-        if words is not None:
-            quote_conditions = [
-                self.model_type.quote.ilike(f"%{word}%") for word in words
-            ]
-            stmt = stmt.where(or_(*quote_conditions))
+        if match_query is not None:
+            stmt = stmt.join(quote_search, quote_search.c.rowid == self.model_type.id)
+            stmt = stmt.where(quote_search.c.quote_fts.op("MATCH")(match_query))
 
         if book_id is not None:
-            stmt = stmt.where(self.model_type.id == book_id)
+            stmt = stmt.where(self.model_type.book_id == book_id)
 
         if author_id is not None:
             stmt = stmt.where(Author.id == author_id)
@@ -78,22 +329,113 @@ class QuoteRepository(BaseRepository):
         if fav is not None:
             stmt = stmt.where(self.model_type.fav == fav)
 
-        order_column = self.model_type.quote
-        if order_by == QuoteOrder.author:
-            order_column = Author.name
-        elif order_by == QuoteOrder.book:
-            order_column = Book.title
-        elif order_by == QuoteOrder.id:
-            order_column = self.model_type.id
+        return stmt
+
+    def list(
+        self,
+        session: Session,
+        words: Optional[list[str]] = None,
+        book_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        fav: Optional[bool] = None,
+        order_by: Optional[QuoteOrder] = None,
+        reverse_order: Optional[bool] = False,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+    ) -> list[Quote] | Iterator[Quote]:
+        """
+        Lists quotes along with their book and each of its authors. Searches by
+        words are ordered by relevance unless `order_by` says otherwise, and
+        their rows also carry the `rank` of the match. `after` is a cursor
+        returned by `cursor` for the last row of the previous page; the next
+        page starts right after it in the same order. When `chunk_size` is
+        given the rows are streamed that many at a time instead of being
+        loaded at once. Results are read from and saved to `cache` if given.
+        """
+
+        match_query = fts_match_query(words) if words is not None else None
+
+        stmt = select(self.model_type, Book, Author)
+        stmt = self._filter(stmt, match_query, book_id, author_id, fav)
+
+        if order_by is None:
+            order_by = QuoteOrder.rank if match_query is not None else QuoteOrder.quote
+        elif order_by == QuoteOrder.rank and match_query is None:
+            order_by = QuoteOrder.quote
+
+        if order_by == QuoteOrder.rank:
+            stmt = stmt.add_columns(quote_search.c.rank)
+
+        keys = self._order_keys(order_by)
+        if after is not None:
+            values = decode_cursor(after, order_by.value, len(keys))
+            stmt = stmt.where(keyset_condition(keys, values, reverse_order))
 
         stmt = (
-            stmt.order_by(desc(order_column))
+            stmt.order_by(*[desc(key) for key in keys])
             if reverse_order
-            else stmt.order_by(order_column)
+            else stmt.order_by(*keys)
         )
 
         if limit is not None:
             stmt = stmt.limit(limit)
 
-        result = session.exec(stmt)
-        return result.all()
+        if cache is not None:
+            key = cache_key(
+                "quotes",
+                words=words,
+                book_id=book_id,
+                author_id=author_id,
+                fav=fav,
+                order_by=order_by,
+                reverse_order=reverse_order,
+                limit=limit,
+                after=after,
+            )
+            return cache.results(
+                session,
+                key,
+                lambda: self._rows(session, stmt, chunk_size),
+                stream=chunk_size is not None,
+            )
+
+        return self._rows(session, stmt, chunk_size)
+
+    def cursor(self, result, order_by: Optional[QuoteOrder] = None) -> str:
+        """
+        Returns the cursor to pass as `after` to get the rows following
+        `result`, one of the rows returned by `list` with the same `order_by`.
+        """
+
+        if order_by is None or order_by == QuoteOrder.rank:
+            order_by = QuoteOrder.rank if "rank" in result.keys() else QuoteOrder.quote
+
+        quote, book, author = result["Quote"], result["Book"], result["Author"]
+
+        values = [quote.quote, quote.id, author.id]
+        if order_by == QuoteOrder.rank:
+            values[0] = result["rank"]
+        elif order_by == QuoteOrder.author:
+            values[0] = author.name
+        elif order_by == QuoteOrder.book:
+            values[0] = book.title
+        elif order_by == QuoteOrder.id:
+            values = values[1:]
+
+        return encode_cursor(order_by.value, values)
+
+    def _order_keys(self, order_by: QuoteOrder) -> list:
+        # Quote and author IDs break ties so every row has a unique position.
+        keys = [self.model_type.quote, self.model_type.id, Author.id]
+        if order_by == QuoteOrder.rank:
+            keys[0] = quote_search.c.rank
+        elif order_by == QuoteOrder.author:
+            keys[0] = Author.name
+        elif order_by == QuoteOrder.book:
+            keys[0] = Book.title
+        elif order_by == QuoteOrder.id:
+            keys = keys[1:]
+
+        return keys
@@ -0,0 +1,93 @@
+from models import normalize_key
+
+# Lowest trigram similarity for a name or title to count as a fuzzy match.
+SIMILARITY_THRESHOLD = 0.3
+
+
+def fts_match_query(words: list[str]) -> str | None:
+    """
+    Builds an FTS5 MATCH expression that matches any of the received words.
+
+    A word ending in `*` becomes a prefix query and a word with spaces in it
+    becomes a phrase query. Everything else is quoted so FTS5 operators typed by
+    the user are searched for literally instead of being interpreted.
+    """
+
+    terms = []
+    for word in words:
+        word = word.strip().strip('"')
+        prefix = word.endswith("*")
+        word = word.rstrip("*").strip()
+        if not word:
+            continue
+
+        term = '"' + word.replace('"', '""') + '"'
+        terms.append(f"{term}*" if prefix else term)
+
+    if not terms:
+        return None
+
+    return " OR ".join(terms)
+
+
+def trigram_match_query(words: list[str]) -> tuple[str | None, list[str]]:
+    """
+    Splits words into an FTS5 trigram MATCH expression that finds titles
+    containing any of them and the words the index can't serve. Words shorter
+    than a trigram or with LIKE wildcards in them have to be matched with LIKE
+    to keep the same results.
+    """
+
+    terms = []
+    like_words = []
+    for word in words:
+        if len(word) < 3 or "%" in word or "_" in word:
+            like_words.append(word)
+            continue
+
+        terms.append('"' + word.replace('"', '""') + '"')
+
+    match_query = " OR ".join(terms) if terms else None
+    return match_query, like_words
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Trigrams of every word of the normalized `text`, padded like pg_trgm does
+    so the start and end of words weigh more than their middle.
+    """
+
+    grams = set()
+    for word in normalize_key(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+
+    return grams
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """
+    Share of the trigrams of `a` and `b` they have in common, from 0 for
+    nothing in common to 1 for the same text once normalized.
+    """
+
+    a_grams, b_grams = trigrams(a), trigrams(b)
+    if not a_grams or not b_grams:
+        return 0.0
+
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+def fuzzy_match_query(text: str) -> str | None:
+    """
+    Builds an FTS5 trigram MATCH expression that finds everything sharing at
+    least one trigram with `text`, the candidates for a fuzzy match. Typos
+    only break the few trigrams around them.
+    """
+
+    key = normalize_key(text)
+    grams = {key[i : i + 3] for i in range(len(key) - 2)}
+    if not grams:
+        return None
+
+    return " OR ".join('"' + gram.replace('"', '""') + '"' for gram in sorted(grams))
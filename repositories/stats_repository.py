@@ -0,0 +1,79 @@
+from sqlalchemy import Integer
+from sqlmodel import Session, func, select
+
+from models import Author, Book, BookAuthorLink, BookStatus, Quote
+
+
+class StatsRepository:
+    def summary(self, session: Session) -> dict:
+        """
+        Aggregates the library in two grouped passes: one over the books by
+        status and one over the quote and link indexes.
+        """
+
+        stats = {
+            "books": 0,
+            "fav_books": 0,
+            "by_status": {status: 0 for status in BookStatus},
+        }
+
+        stmt = select(
+            Book.status, func.count(), func.sum(Book.fav, type_=Integer)
+        ).group_by(Book.status)
+        for status, books, favs in session.exec(stmt):
+            stats["books"] += books
+            stats["fav_books"] += favs
+            stats["by_status"][BookStatus(status)] = books
+
+        quotes_per_book = (
+            select(
+                Quote.book_id,
+                func.count().label("quotes"),
+                func.sum(Quote.fav, type_=Integer).label("favs"),
+            )
+            .group_by(Quote.book_id)
+            .cte("quotes_per_book")
+        )
+        books_per_author = (
+            select(BookAuthorLink.author_id, func.count().label("books"))
+            .group_by(BookAuthorLink.author_id)
+            .cte("books_per_author")
+        )
+
+        aggregates = [
+            func.sum(quotes_per_book.c.quotes),
+            func.sum(quotes_per_book.c.favs),
+            func.count(quotes_per_book.c.book_id),
+            func.max(quotes_per_book.c.quotes),
+            func.sum(books_per_author.c.books),
+            func.count(books_per_author.c.author_id),
+            func.max(books_per_author.c.books),
+        ]
+        stmt = select(
+            *[
+                select(func.coalesce(aggregate, 0)).scalar_subquery()
+                for aggregate in aggregates
+            ],
+            select(func.count(Author.id)).scalar_subquery(),
+        )
+        (
+            stats["quotes"],
+            stats["fav_quotes"],
+            stats["books_with_quotes"],
+            stats["max_quotes_per_book"],
+            links,
+            stats["authors_with_books"],
+            stats["max_books_per_author"],
+            stats["authors"],
+        ) = session.exec(stmt).one()
+
+        stats["quotes_per_book"] = (
+            stats["quotes"] / stats["books_with_quotes"]
+            if stats["books_with_quotes"]
+            else 0.0
+        )
+        stats["books_per_author"] = (
+            links / stats["authors_with_books"] if stats["authors_with_books"] else 0.0
+        )
+
+        return stats
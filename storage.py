@@ -0,0 +1,99 @@
+import sqlite3
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """
+    How SQLite stores the library, trading durability for speed. Sizes are in
+    KiB, except for `busy_timeout`, in milliseconds.
+    """
+
+    journal_mode: str
+    synchronous: str
+    cache_size: int
+    mmap_size: int
+    temp_store: str
+    busy_timeout: int = 5000
+
+    def pragmas(self) -> list[str]:
+        """
+        Pragmas that only last as long as the connection they are run on.
+        """
+
+        return [
+            f"PRAGMA busy_timeout = {self.busy_timeout}",
+            f"PRAGMA synchronous = {self.synchronous}",
+            # Negative sizes are in KiB instead of pages.
+            f"PRAGMA cache_size = -{self.cache_size}",
+            f"PRAGMA mmap_size = {self.mmap_size * 1024}",
+            f"PRAGMA temp_store = {self.temp_store}",
+        ]
+
+
+PROFILES = {
+    # SQLite's own defaults: every commit reaches the disk before returning.
+    "safe": StorageProfile(
+        journal_mode="DELETE",
+        synchronous="FULL",
+        cache_size=2 * 1024,
+        mmap_size=0,
+        temp_store="DEFAULT",
+    ),
+    # A power loss can lose the last commits, but never corrupts the library.
+    "balanced": StorageProfile(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=16 * 1024,
+        mmap_size=64 * 1024,
+        temp_store="MEMORY",
+    ),
+    # For imports. A power loss in the middle can corrupt the library.
+    "bulk": StorageProfile(
+        journal_mode="WAL",
+        synchronous="OFF",
+        cache_size=64 * 1024,
+        mmap_size=256 * 1024,
+        temp_store="MEMORY",
+    ),
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def configure(engine, current: Callable[[], StorageProfile]) -> None:
+    """
+    Applies the profile returned by `current` to every connection of the
+    engine when it is checked out, so switching profiles takes effect on the
+    next transaction.
+    """
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def set_journal_mode(dbapi_connection, connection_record):
+        profile = current()
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {profile.busy_timeout}")
+        try:
+            cursor.execute(f"PRAGMA journal_mode = {profile.journal_mode}")
+        except sqlite3.OperationalError:
+            # Other processes still have the library open in another mode.
+            # It is changed by the first connection made once they are gone.
+            pass
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "checkout")
+    def set_pragmas(dbapi_connection, connection_record, connection_proxy):
+        profile = current()
+        if connection_record.info.get("storage_profile") == profile:
+            return
+
+        cursor = dbapi_connection.cursor()
+        for pragma in profile.pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+        connection_record.info["storage_profile"] = profile
@@ -0,0 +1,191 @@
+import dataclasses
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine
+
+import api
+from commands.utils import TrackedRows
+from migrations import migrate
+from models import BookStatus
+
+from .utils import add_author, add_book, add_quote
+
+
+@pytest.fixture
+def server(tmp_path):
+    db_path = tmp_path / "clibr.db"
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        poolclass=QueuePool,
+        connect_args={"check_same_thread": False},
+    )
+    migrate(engine)
+
+    with Session(engine) as session:
+        frank = add_author(session, "Frank Herbert")
+        jane = add_author(session, "Jane Austen")
+        dune = add_book(session, "Dune", frank, BookStatus.reading, fav=True)
+        add_book(session, "Children of Dune", frank)
+        add_book(session, "Emma", jane, BookStatus.finished)
+        add_quote(session, dune, "Fear is the mind-killer.")
+        session.commit()
+
+    server = api.Server(0, engine, db_path, tmp_path / "cache.db", 1024 * 1024)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    engine.dispose()
+
+
+def get(server: api.Server, path: str, etag: str | None = None):
+    request = urllib.request.Request(server.url + path)
+    if etag is not None:
+        request.add_header("If-None-Match", etag)
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            return response.status, response.headers, json.loads(body)
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, e.headers, json.loads(body) if body else None
+
+
+def test_lists_books_and_quotes_with_filters(server):
+    status, _, body = get(server, "/books?author=frank+herbert&order_by=id")
+    assert status == 200
+    assert [book["title"] for book in body["books"]] == ["Dune", "Children of Dune"]
+    assert body["books"][0] == {
+        "id": 1,
+        "title": "Dune",
+        "author": "Frank Herbert",
+        "status": "reading",
+        "fav": True,
+    }
+    assert body["next"] is None
+
+    status, _, body = get(server, "/books?status=finished")
+    assert [book["title"] for book in body["books"]] == ["Emma"]
+
+    status, _, body = get(server, "/quotes?book=dune&words=fear")
+    assert status == 200
+    assert [quote["quote"] for quote in body["quotes"]] == ["Fear is the mind-killer."]
+
+
+def test_pages_follow_the_cursor(server):
+    _, _, first = get(server, "/books?limit=2")
+    assert len(first["books"]) == 2
+    assert first["next"] is not None
+
+    _, _, second = get(server, f"/books?limit=2&after={first['next']}")
+    titles = [book["title"] for book in first["books"] + second["books"]]
+    assert titles == ["Children of Dune", "Dune", "Emma"]
+    assert second["next"] is None
+
+
+def test_unchanged_data_is_not_modified(server):
+    status, headers, _ = get(server, "/books")
+    etag = headers["ETag"]
+    assert status == 200
+
+    status, headers, body = get(server, "/books", etag=etag)
+    assert status == 304
+    assert headers["ETag"] == etag
+    assert body is None
+
+    with Session(server.engine) as session:
+        add_book(session, "Persuasion", add_author(session, "Jane Austen 2"))
+        session.commit()
+
+    assert server.version.cached() is None
+    status, headers, body = get(server, "/books", etag=etag)
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert len(body["books"]) == 4
+
+
+def test_invalid_requests(server):
+    status, _, body = get(server, "/books?colour=red")
+    assert status == 400
+    assert "colour" in body["error"]
+
+    status, _, body = get(server, "/books?status=lost")
+    assert status == 400
+
+    status, _, body = get(server, "/books?after=nonsense")
+    assert status == 400
+
+    status, _, body = get(server, "/books?author=Frank+Herbrt")
+    assert status == 404
+    assert "Frank Herbert" in body["error"]
+
+    status, _, body = get(server, "/authors")
+    assert status == 404
+
+
+def test_recreated_library_gets_new_etags(server, tmp_path):
+    _, headers, _ = get(server, "/books")
+    etag = headers["ETag"]
+
+    # The same changes on a new database reach the same data generation,
+    # while the server still has connections to the one it replaced.
+    (tmp_path / "clibr.db").unlink()
+    engine = create_engine(f"sqlite:///{tmp_path / 'clibr.db'}")
+    migrate(engine)
+    with Session(engine) as session:
+        austen = add_author(session, "Jane Austen")
+        bronte = add_author(session, "Charlotte Bronte")
+        persuasion = add_book(session, "Persuasion", austen, BookStatus.reading)
+        add_book(session, "Emma", austen)
+        add_book(session, "Jane Eyre", bronte, BookStatus.finished)
+        add_quote(session, persuasion, "Know your own happiness.")
+        session.commit()
+    engine.dispose()
+
+    status, headers, body = get(server, "/books", etag=etag)
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert headers["ETag"].endswith(etag.split("-")[-1])
+    assert [book["title"] for book in body["books"]] == [
+        "Emma",
+        "Jane Eyre",
+        "Persuasion",
+    ]
+
+
+def test_failures_while_streaming_close_the_connection(server, monkeypatch):
+    def failing_rows(rows):
+        yield from rows
+        raise OperationalError("SELECT", (), Exception("disk I/O error"))
+
+    def list_books(session, params, cache):
+        listing = api.list_books(session, params, cache)
+        return dataclasses.replace(
+            listing, rows=TrackedRows(failing_rows(listing.rows))
+        )
+
+    monkeypatch.setitem(api.ENDPOINTS, "/books", ("books", list_books))
+
+    host, port = server.server_address[:2]
+    with socket.create_connection((host, port), timeout=10) as connection:
+        connection.sendall(b"GET /books HTTP/1.1\r\nHost: clibr\r\n\r\n")
+        response = b""
+        while chunk := connection.recv(1 << 16):
+            response += chunk
+
+    assert response.startswith(b"HTTP/1.1 200")
+    assert response.count(b"HTTP/1.1") == 1
+    assert b"something went wrong" not in response
+    assert not response.endswith(b"0\r\n\r\n")
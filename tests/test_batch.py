@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import batch
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_parse_line():
+    assert batch.parse_line('quotes add -q "A quote" -t Dune') == [
+        "quotes",
+        "add",
+        "-q",
+        "A quote",
+        "-t",
+        "Dune",
+    ]
+    assert batch.parse_line('clibr books list -a "Jane Austen"') == [
+        "books",
+        "list",
+        "-a",
+        "Jane Austen",
+    ]
+    assert batch.parse_line('["books", "add", "-t", "It\'s", "-a", "X"]') == [
+        "books",
+        "add",
+        "-t",
+        "It's",
+        "-a",
+        "X",
+    ]
+    assert batch.parse_line("   ") is None
+    assert batch.parse_line("# a comment") is None
+
+    with pytest.raises(ValueError):
+        batch.parse_line('books add -t "Dune')
+
+    with pytest.raises(ValueError):
+        batch.parse_line('["books", 1]')
+
+
+def test_failed_commands_are_rolled_back_alone(tmp_path):
+    commands = tmp_path / "commands.txt"
+    commands.write_text(
+        "\n".join(
+            [
+                'books add -t Dune -a "Frank Herbert"',
+                '["quotes", "add", "-q", "Fear is the mind-killer.", "-t", "Dune"]',
+                'quotes add -q "Lost" -t "Not a book"',
+                'quotes add -q "Needs a title"',
+                "db maintain",
+                'books add -t Emma -a "Jane Austen"',
+                "books list --format csv",
+            ]
+        )
+    )
+    report = tmp_path / "report.jsonl"
+
+    process = subprocess.run(
+        [
+            sys.executable,
+            str(ROOT / "main.py"),
+            "batch",
+            "--path",
+            str(commands),
+            "--batch-size",
+            "3",
+            "--report",
+            str(report),
+        ],
+        cwd=ROOT,
+        env=os.environ | {"XDG_CONFIG_HOME": str(tmp_path), "CLIBR_NO_DAEMON": "1"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert process.returncode == 1
+    assert "4 of 7 commands succeeded" in process.stderr
+    assert "1,Dune,Frank Herbert,pending,No" in process.stdout
+    assert "Emma,Jane Austen" in process.stdout
+
+    results = [json.loads(line) for line in report.read_text().splitlines()]
+    assert [result["ok"] for result in results] == [
+        True,
+        True,
+        False,
+        False,
+        False,
+        True,
+        True,
+    ]
+    assert "Not a book" in results[2]["error"]
+
+    db = sqlite3.connect(tmp_path / "clibr" / "clibr.db")
+    books = db.execute("SELECT COUNT(*) FROM book").fetchone()[0]
+    quotes = db.execute("SELECT quote FROM quote").fetchall()
+    db.close()
+
+    assert books == 2
+    assert quotes == [("Fear is the mind-killer.",)]
+
+
+def test_unopenable_report_is_reported(tmp_path):
+    process = subprocess.run(
+        [
+            sys.executable,
+            str(ROOT / "main.py"),
+            "batch",
+            "--report",
+            str(tmp_path / "missing" / "report.jsonl"),
+        ],
+        cwd=ROOT,
+        env=os.environ | {"XDG_CONFIG_HOME": str(tmp_path), "CLIBR_NO_DAEMON": "1"},
+        input="books list\n",
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert process.returncode == 1
+    assert "couldn't be opened" in process.stderr
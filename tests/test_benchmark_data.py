@@ -0,0 +1,42 @@
+from sqlmodel import Session, func, select
+
+from benchmarks.data import LibrarySize, author_names, generate_library
+from models import Author, Book, BookAuthorLink, Quote
+
+from .utils import session
+
+
+def test_author_names_are_unique():
+    names = list(author_names(2000))
+    assert len(set(names)) == 2000
+
+
+def test_generate_library(session: Session):
+    size = LibrarySize(authors=20, books=200, quotes=300, multi_author_ratio=0.5)
+    generate_library(session, size, seed=1, batch_size=64)
+
+    assert session.exec(select(func.count()).select_from(Author)).one() == 20
+    assert session.exec(select(func.count()).select_from(Book)).one() == 200
+    assert session.exec(select(func.count()).select_from(Quote)).one() == 300
+
+    authors_per_book = session.exec(
+        select(func.count())
+        .select_from(BookAuthorLink)
+        .group_by(BookAuthorLink.book_id)
+    ).all()
+    assert len(authors_per_book) == 200
+    assert max(authors_per_book) > 1
+
+
+def test_generate_library_is_deterministic(session: Session):
+    size = LibrarySize(authors=5, books=10, quotes=10)
+    generate_library(session, size, seed=7)
+    first = session.exec(select(Book.title).order_by(Book.id)).all()
+
+    for table in [Quote, BookAuthorLink, Book, Author]:
+        session.query(table).delete()
+    session.commit()
+
+    generate_library(session, size, seed=7)
+    second = session.exec(select(Book.title).order_by(Book.id)).all()
+    assert first == second
@@ -1,9 +1,11 @@
+import pytest
 from sqlmodel import Session, select
 
-from models import Book, BookStatus
-from repositories import BookRepository
+from models import Book, BookAuthorLink, BookStatus, Quote
+from repositories import AuthorRepository, BookOrder, BookRepository
+from repositories.base_repository import FUZZY_CANDIDATES
 
-from .utils import add_author, add_book, session
+from .utils import add_author, add_book, add_quote, session
 
 
 def test_book_repository_add(session: Session):
@@ -45,6 +47,9 @@ def test_book_repository_get_by_title(session: Session):
     unknown_book = book_repo.get_by_title(session, "The Final Empire")
     assert unknown_book is None
 
+    assert book_repo.get_by_title(session, "  ÉLANTRIS ").id == book.id
+    assert book.title_key == "elantris"
+
 
 def test_book_repository_list(session: Session):
     book_repo = BookRepository()
@@ -123,3 +128,249 @@ def test_book_repository_list_by_fav(session: Session):
 
     results = book_repo.list(session, fav=True)
     assert len(results) == 1
+
+
+def test_book_repository_list_by_words(session: Session):
+    book_repo = BookRepository()
+    author = add_author(session, "Brandon Sanderson")
+    titles = ["The Sunlit Man", "Elantris", "The Final Empire", "Warbreaker"]
+    for title in titles:
+        add_book(session, title, author)
+
+    session.commit()
+
+    results = book_repo.list(session, words=["MPIR"])
+    assert len(results) == 1
+    assert results[0]["Book"].title == "The Final Empire"
+
+    results = book_repo.list(session, words=["sunlit", "breaker"])
+    assert len(results) == 2
+
+    results = book_repo.list(session, words=["an"])
+    assert len(results) == 2
+
+    results = book_repo.list(session, words=["The_F%"])
+    assert len(results) == 1
+
+    book_repo.update(session, results[0]["Book"].id, new_title="Mistborn")
+    session.commit()
+    assert len(book_repo.list(session, words=["empire"])) == 0
+    assert len(book_repo.list(session, words=["stbor"])) == 1
+
+
+def test_book_repository_export_rows(session: Session):
+    book_repo = BookRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    add_book(session, "Elantris", author_brandon, fav=True)
+    book = add_book(session, "A Memory of Light", author_jordan)
+    book.authors.append(author_brandon)
+    session.commit()
+
+    assert book_repo.count_export_rows(session) == 3
+
+    rows = list(book_repo.export_rows(session, chunk_size=1))
+    assert [tuple(row) for row in rows] == [
+        (1, "Elantris", "Brandon Sanderson", BookStatus.pending, True),
+        (2, "A Memory of Light", "Brandon Sanderson", BookStatus.pending, False),
+        (2, "A Memory of Light", "Robert Jordan", BookStatus.pending, False),
+    ]
+
+
+def test_book_repository_list_pages(session: Session):
+    book_repo = BookRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    titles = ["The Sunlit Man", "Elantris", "The Final Empire", "Warbreaker"]
+    for title in titles:
+        add_book(session, title, author_brandon)
+
+    book = add_book(session, "The Eye of the World", author_jordan)
+    book.authors.append(author_brandon)
+    session.commit()
+
+    for order_by in BookOrder:
+        for reverse_order in [False, True]:
+            expected = book_repo.list(
+                session, order_by=order_by, reverse_order=reverse_order
+            )
+
+            pages = []
+            after = None
+            while True:
+                page = book_repo.list(
+                    session,
+                    order_by=order_by,
+                    reverse_order=reverse_order,
+                    limit=2,
+                    after=after,
+                )
+                if not page:
+                    break
+
+                pages.extend(page)
+                after = book_repo.cursor(page[-1], order_by)
+
+            assert [tuple(row) for row in pages] == [tuple(row) for row in expected]
+
+
+def test_book_repository_list_invalid_cursor(session: Session):
+    book_repo = BookRepository()
+    author = add_author(session, "Brandon Sanderson")
+    add_book(session, "Elantris", author)
+    session.commit()
+
+    result = book_repo.list(session)[0]
+    cursor = book_repo.cursor(result, BookOrder.title)
+
+    with pytest.raises(ValueError):
+        book_repo.list(session, order_by=BookOrder.author, after=cursor)
+
+    with pytest.raises(ValueError):
+        book_repo.list(session, after="not a cursor")
+
+
+def test_book_repository_count(session: Session):
+    book_repo = BookRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    add_book(session, "Elantris", author_brandon, fav=True)
+    add_book(session, "The Eye of the World", author_jordan)
+    book = add_book(session, "A Memory of Light", author_jordan)
+    book.authors.append(author_brandon)
+    session.commit()
+
+    assert len(book_repo.list(session)) == 4
+    assert book_repo.count(session) == 3
+    assert book_repo.count(session, author_id=author_brandon.id) == 2
+    assert book_repo.count(session, words=["of"]) == 2
+    assert book_repo.count(session, fav=True) == 1
+    assert book_repo.count(session, status=BookStatus.finished) == 0
+
+
+def test_book_repository_list_in_chunks(session: Session):
+    book_repo = BookRepository()
+    author = add_author(session, "Brandon Sanderson")
+    titles = ["The Sunlit Man", "Elantris", "The Final Empire", "Warbreaker"]
+    for title in titles:
+        add_book(session, title, author)
+
+    session.commit()
+
+    results = book_repo.list(session, chunk_size=3)
+    assert not isinstance(results, list)
+    assert [row["Book"].title for row in results] == sorted(titles)
+
+
+def test_book_repository_delete_matching(session: Session):
+    book_repo = BookRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    elantris = add_book(session, "Elantris", author_brandon, status=BookStatus.finished)
+    warbreaker = add_book(session, "Warbreaker", author_brandon)
+    shared_book = add_book(session, "A Memory of Light", author_jordan)
+    shared_book.authors.append(author_brandon)
+    add_quote(session, shared_book, "Death is lighter than a feather.")
+    add_quote(session, elantris, "Hope of Elantris.")
+    session.commit()
+
+    assert book_repo.count(session, author_id=author_brandon.id) == 3
+    assert book_repo.delete_matching(session, author_id=author_jordan.id) == 1
+    assert book_repo.delete_matching(session, status=BookStatus.finished) == 1
+    session.commit()
+
+    assert session.exec(select(Book.id)).all() == [warbreaker.id]
+    assert session.exec(select(Quote)).all() == []
+    assert session.exec(select(BookAuthorLink.book_id)).all() == [warbreaker.id]
+
+    assert book_repo.delete_matching(session, ids=[(1, 100)]) == 1
+
+
+def test_book_repository_update_matching(session: Session):
+    book_repo = BookRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    add_book(session, "Elantris", author_brandon)
+    add_book(session, "Warbreaker", author_brandon, status=BookStatus.finished)
+    shared_book = add_book(session, "A Memory of Light", author_jordan)
+    shared_book.authors.append(author_brandon)
+    session.commit()
+
+    updated = book_repo.update_matching(
+        session,
+        {"status": BookStatus.wanted},
+        status=BookStatus.pending,
+    )
+    assert updated == 2
+
+    updated = book_repo.update_matching(
+        session,
+        {"fav": True},
+        author_id=author_jordan.id,
+    )
+    assert updated == 1
+
+    updated = book_repo.update_matching(
+        session,
+        {"title": "A  Memory of LIGHT"},
+        ids=[(shared_book.id, shared_book.id)],
+    )
+    assert updated == 1
+    session.commit()
+
+    assert book_repo.count(session, status=BookStatus.wanted) == 2
+    assert book_repo.count(session, fav=True) == 1
+    assert book_repo.get_by_title(session, "a memory of light").id == shared_book.id
+
+    with pytest.raises(ValueError):
+        book_repo.update_matching(session, {"id": 1})
+
+
+def test_book_repository_find_similar(session: Session):
+    book_repo = BookRepository()
+    sanderson = add_author(session, "Brandon Sanderson")
+    jordan = add_author(session, "Robert Jordan")
+    add_book(session, "The Way of Kings", sanderson)
+    add_book(session, "Words of Radiance", sanderson)
+    add_book(session, "The Eye of the World", jordan)
+    session.commit()
+
+    similar = book_repo.similar(session, "the way of kngs")
+    assert similar[0][0].title == "The Way of Kings"
+    assert similar[0][1] < 1
+    assert [score for _, score in similar] == sorted(
+        (score for _, score in similar), reverse=True
+    )
+
+    assert AuthorRepository().similar(session, "brandon sandersn")[0][0] == sanderson
+    assert book_repo.similar(session, "zz") == []
+
+    results = book_repo.find_similar(session, author="Robrt Jordn")
+    assert [result["Book"].title for result in results] == ["The Eye of the World"]
+    assert results[0]["Author"] == jordan
+
+    results = book_repo.find_similar(
+        session, title="words radiance", author="sanderson"
+    )
+    assert results[0]["Book"].title == "Words of Radiance"
+    assert results[0]["score"] > results[-1]["score"]
+
+
+def test_book_repository_find_similar_prefers_the_exact_author(session: Session):
+    book_repo = BookRepository()
+    # Lookalike authors with more books than the candidates looked at, added
+    # first so an unordered query would find theirs before the exact ones.
+    for n in range(5):
+        lookalike = add_author(session, f"Yusuf Zhang {n}")
+        for i in range(FUZZY_CANDIDATES // 4):
+            add_book(session, f"Lookalike {n}-{i}", lookalike)
+
+    yusuf = add_author(session, "Yusuf Zhang")
+    for i in range(16):
+        add_book(session, f"Exact {i}", yusuf)
+    session.commit()
+
+    results = book_repo.find_similar(session, author="Yusuf Zhang", limit=16)
+    assert len(results) == 16
+    assert {result["Author"].name for result in results} == {"Yusuf Zhang"}
+    assert all(result["score"] == 1 for result in results)
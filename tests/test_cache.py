@@ -0,0 +1,109 @@
+from sqlmodel import Session, create_engine
+
+from migrations import migrate
+from repositories import BookRepository, QuoteRepository, ResultCache
+from repositories.cache import cache_key, data_generation
+from repositories.enums import BookOrder, QuoteOrder
+
+from .utils import add_author, add_book, add_quote, session
+
+
+def test_cache_key_normalizes_words():
+    assert cache_key("books", words=["Storm", "light"]) == cache_key(
+        "books", words=["LIGHT", "storm"]
+    )
+    assert cache_key("books", words=["storm"]) != cache_key("quotes", words=["storm"])
+
+
+def test_cached_results_are_invalidated_by_changes(session: Session, tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    book_repo = BookRepository()
+
+    author = add_author(session, "Brandon Sanderson")
+    add_book(session, "Elantris", author)
+    session.commit()
+
+    generation = data_generation(session)
+    results = book_repo.list(session, cache=cache)
+    assert [result["Book"].title for result in results] == ["Elantris"]
+
+    key = cache_key(
+        "books",
+        words=None,
+        author_id=None,
+        status=None,
+        fav=None,
+        order_by=BookOrder.title,
+        reverse_order=False,
+        limit=None,
+        after=None,
+    )
+    cached = cache.get(key, generation)
+    assert [result["Book"].title for result in cached] == ["Elantris"]
+    assert [result["Author"].name for result in cached] == ["Brandon Sanderson"]
+
+    add_book(session, "Warbreaker", author)
+    session.commit()
+    assert data_generation(session) > generation
+    assert cache.get(key, data_generation(session)) is None
+
+    results = book_repo.list(session, cache=cache, chunk_size=1)
+    assert [result["Book"].title for result in results] == ["Elantris", "Warbreaker"]
+    assert len(cache.get(key, data_generation(session))) == 2
+
+
+def test_cached_quotes_keep_their_rank(session: Session, tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    quote_repo = QuoteRepository()
+
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Well of Ascension", author)
+    add_quote(session, book, "Sometimes, the prize is not worth the costs.")
+    session.commit()
+
+    first = quote_repo.list(session, words=["prize"], cache=cache)
+    second = quote_repo.list(session, words=["Prize"], cache=cache)
+    assert isinstance(second[0], dict)
+    assert second[0]["rank"] == first[0]["rank"]
+    assert quote_repo.cursor(second[0]) == quote_repo.cursor(first[0])
+    assert quote_repo.cursor(second[0], QuoteOrder.id) == quote_repo.cursor(
+        first[0], QuoteOrder.id
+    )
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db", max_bytes=40)
+    cache.put("a", 1, [])
+    cache.put("b", 1, [])
+    assert cache.get("a", 1) == []
+
+    for key in "cdefghijklmnopqrstuvwxyz":
+        cache.put(key, 1, [])
+
+    sizes = cache._connect().execute("SELECT SUM(size) FROM entry").fetchone()[0]
+    assert sizes <= 40
+    assert cache.get("b", 1) is None
+    assert cache.get("z", 1) == []
+    assert cache.get("z", 2) is None
+
+
+def test_cache_is_dropped_for_a_recreated_library(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    book_repo = BookRepository()
+
+    titles = []
+    for title, author in [("Dune", "Frank Herbert"), ("Emma", "Jane Austen")]:
+        # Same changes on a new database, so both reach the same generation.
+        engine = create_engine(f"sqlite:///{tmp_path / 'clibr.db'}")
+        migrate(engine)
+        with Session(engine) as library:
+            add_book(library, title, add_author(library, author))
+            library.commit()
+
+            results = book_repo.list(library, cache=ResultCache(cache.path))
+            titles.append([result["Book"].title for result in results])
+
+        engine.dispose()
+        (tmp_path / "clibr.db").unlink()
+
+    assert titles == [["Dune"], ["Emma"]]
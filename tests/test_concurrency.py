@@ -0,0 +1,167 @@
+import csv
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+import concurrency
+
+ROOT = Path(__file__).parent.parent
+
+IMPORTERS = 4
+BOOKS_PER_IMPORTER = 300
+QUOTE_IMPORTERS = 2
+QUOTES_PER_IMPORTER = 300
+READERS = 4
+TIMEOUT = 120
+
+
+def clibr(config_home: Path, *args: str) -> subprocess.Popen:
+    # Listing writes more than a pipe holds, so the output goes to a file.
+    fd, log = tempfile.mkstemp(dir=config_home.parent, suffix=".log")
+    with open(fd, "w") as output:
+        process = subprocess.Popen(
+            [sys.executable, str(ROOT / "main.py"), *args],
+            cwd=ROOT,
+            env=os.environ | {"XDG_CONFIG_HOME": str(config_home)},
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+
+    process.log = Path(log)
+    return process
+
+
+def write_csv(path: Path, fields: list[str], rows: list[list]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows(rows)
+
+
+def test_concurrent_imports_and_lists_lose_nothing(tmp_path):
+    """
+    Imports books and quotes from several processes at once, into books and
+    authors they share, while other processes keep listing the library.
+    """
+
+    config_home = tmp_path / "config"
+    assert clibr(config_home, "db", "migrate").wait() == 0
+
+    importers = []
+    for i in range(IMPORTERS):
+        path = tmp_path / f"books{i}.csv"
+        write_csv(
+            path,
+            ["id", "title", "author", "status", "fav"],
+            [
+                [n, f"Book {i}-{n}", f"Author {n % 7}", "pending", "No"]
+                for n in range(BOOKS_PER_IMPORTER)
+            ],
+        )
+        importers.append(
+            clibr(
+                config_home,
+                "books",
+                "import",
+                "--path",
+                str(path),
+                "--batch-size",
+                "10",
+            )
+        )
+
+    for i in range(QUOTE_IMPORTERS):
+        path = tmp_path / f"quotes{i}.csv"
+        # Quotes of the books being imported, so both kinds of import race to
+        # create the same books.
+        write_csv(
+            path,
+            ["id", "book", "quote", "author", "fav"],
+            [
+                [
+                    n,
+                    f"Book {n % IMPORTERS}-{n}",
+                    f"Quote {i}-{n}",
+                    f"Author {n % 7}",
+                    "No",
+                ]
+                for n in range(QUOTES_PER_IMPORTER)
+            ],
+        )
+        importers.append(
+            clibr(
+                config_home,
+                "quotes",
+                "import",
+                "--path",
+                str(path),
+                "--batch-size",
+                "10",
+            )
+        )
+
+    readers = []
+    deadline = time.monotonic() + TIMEOUT
+    while any(importer.poll() is None for importer in importers):
+        assert time.monotonic() < deadline, "the imports didn't finish"
+        running = [reader for reader in readers if reader.poll() is None]
+        for _ in range(READERS - len(running)):
+            command = ["books", "list"] if len(readers) % 2 else ["quotes", "list"]
+            readers.append(
+                clibr(config_home, *command, "--format", "csv", "--no-cache")
+            )
+
+        for reader in running[:1]:
+            reader.wait(timeout=TIMEOUT)
+
+    for process in importers + readers:
+        process.wait(timeout=TIMEOUT)
+        output = process.log.read_text()
+        assert process.returncode == 0, output
+        assert "Oops" not in output, output
+        assert "locked" not in output, output
+
+    assert len(readers) >= READERS
+
+    db = sqlite3.connect(config_home / "clibr" / "clibr.db")
+    books = db.execute("SELECT COUNT(*) FROM book").fetchone()[0]
+    authors = db.execute("SELECT COUNT(*) FROM author").fetchone()[0]
+    unlinked = db.execute(
+        "SELECT COUNT(*) FROM book WHERE id NOT IN "
+        "(SELECT book_id FROM bookauthorlink)"
+    ).fetchone()[0]
+    quotes = db.execute("SELECT COUNT(*) FROM quote").fetchone()[0]
+    db.close()
+
+    assert books == IMPORTERS * BOOKS_PER_IMPORTER
+    assert authors == 7
+    assert unlinked == 0
+    assert quotes == QUOTE_IMPORTERS * QUOTES_PER_IMPORTER
+
+
+def test_retry_backs_off_while_locked():
+    from sqlalchemy.exc import OperationalError
+
+    calls = []
+
+    def locked_twice():
+        calls.append(None)
+        if len(calls) < 3:
+            raise OperationalError("BEGIN", {}, Exception("database is locked"))
+
+        return "done"
+
+    assert concurrency.retry(locked_twice) == "done"
+    assert len(calls) == 3
+
+    def failing():
+        raise OperationalError("SELECT", {}, Exception("no such table: book"))
+
+    with pytest.raises(OperationalError):
+        concurrency.retry(failing)
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+TIMEOUT = 30
+
+
+def clibr(
+    env: dict, *args: str, input: str | None = None
+) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(ROOT / "main.py"), *args],
+        cwd=ROOT,
+        env=env,
+        input=input,
+        capture_output=True,
+        text=True,
+        timeout=TIMEOUT,
+    )
+
+
+def test_commands_are_forwarded_to_the_daemon(tmp_path):
+    # Forwarding is what's tested, whether or not it's turned off around us.
+    env = {k: v for k, v in os.environ.items() if k != "CLIBR_NO_DAEMON"} | {
+        "XDG_CONFIG_HOME": str(tmp_path)
+    }
+    local = env | {"CLIBR_NO_DAEMON": "1"}
+    socket = tmp_path / "clibr" / "daemon.sock"
+    log = tmp_path / "daemon.log"
+
+    with open(log, "w") as output:
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT / "main.py"), "daemon"],
+            cwd=ROOT,
+            env=env,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+
+    try:
+        deadline = time.monotonic() + TIMEOUT
+        while not socket.exists():
+            assert server.poll() is None, log.read_text()
+            assert time.monotonic() < deadline, "the daemon didn't start"
+            time.sleep(0.05)
+
+        added = clibr(env, "books", "add", "-t", "Dune", "-a", "Frank Herbert")
+        assert added.returncode == 0, added.stderr
+        clibr(env, "books", "add", "-t", "Emma", "-a", "Jane Austen")
+
+        forwarded = clibr(env, "books", "list", "--format", "csv")
+        in_process = clibr(local, "books", "list", "--format", "csv")
+        assert forwarded.returncode == 0
+        assert forwarded.stdout == in_process.stdout
+        assert "Dune,Frank Herbert" in forwarded.stdout
+
+        # Errors keep their exit code.
+        assert clibr(env, "books", "nope").returncode == 2
+
+        # Commands that ask for input run in the terminal instead.
+        deleted = clibr(env, "books", "delete", "-a", "Jane Austen", input="y\n")
+        assert deleted.returncode == 0, deleted.stderr
+        assert "Emma" not in clibr(env, "books", "list", "--format", "csv").stdout
+
+        stopped = clibr(env, "daemon", "--stop")
+        assert stopped.returncode == 0, stopped.stderr
+        server.wait(timeout=TIMEOUT)
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+
+    output = log.read_text()
+    assert "books list --format csv -> 0" in output
+    assert "books delete -a Jane Austen -> fallback" in output
+    assert not socket.exists()
+
+    # Without a daemon commands still run in-process.
+    assert "Dune" in clibr(env, "books", "list", "--format", "csv").stdout
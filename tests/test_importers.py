@@ -0,0 +1,150 @@
+from sqlmodel import Session, select
+
+from commands.importers import import_books, import_quotes
+from models import Author, Book, BookAuthorLink, BookStatus, Quote
+from repositories import QuoteRepository
+
+from .utils import add_author, add_book, add_quote, session
+
+
+def test_import_books(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    add_book(session, "Elantris", author)
+    session.commit()
+
+    rows = [
+        {
+            "title": "ELANTRIS",
+            "author": "Brandon Sanderson",
+            "status": "Finished",
+            "fav": "Yes",
+        },
+        {
+            "title": "The Final Empire",
+            "author": "Brandon Sanderson",
+            "status": "Reading",
+            "fav": "Yes",
+        },
+        {
+            "title": "The Eye of the World",
+            "author": "Robert Jordan",
+            "status": "pending",
+            "fav": "No",
+        },
+        {
+            "title": "A Memory of Light",
+            "author": "Robert Jordan",
+            "status": "wanted",
+            "fav": "No",
+        },
+        {
+            "title": "A Memory of Light",
+            "author": "brandon  sanderson",
+            "status": "wanted",
+            "fav": "No",
+        },
+    ]
+    read, added = import_books(session, rows, batch_size=2)
+    assert read == len(rows)
+    assert added == 3
+
+    books = session.exec(select(Book).order_by(Book.id)).all()
+    assert [book.title for book in books] == [
+        "Elantris",
+        "The Final Empire",
+        "The Eye of the World",
+        "A Memory of Light",
+    ]
+    assert books[0].status == BookStatus.pending
+    assert books[1].status == BookStatus.reading
+    assert books[1].fav
+
+    co_authored = books[-1]
+    assert sorted(author.name for author in co_authored.authors) == [
+        "Brandon Sanderson",
+        "Robert Jordan",
+    ]
+    assert len(session.exec(select(BookAuthorLink)).all()) == 5
+    assert len(session.exec(select(Author)).all()) == 2
+
+    read, added = import_books(session, rows)
+    assert added == 0
+
+
+def test_import_quotes(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    add_quote(session, book, "Men rarely see their own actions as unjustified.")
+    session.commit()
+
+    rows = [
+        {
+            "quote": "Men rarely see their own actions as unjustified.",
+            "book": "The Final Empire",
+            "author": "Brandon Sanderson",
+            "fav": "No",
+        },
+        {
+            "quote": "I've always been very confident in my immaturity.",
+            "book": "The Final Empire",
+            "author": "Brandon Sanderson",
+            "fav": "Yes",
+        },
+        {
+            "quote": "Run when you have to, fight when you must, rest when you can.",
+            "book": "The Eye of the World",
+            "author": "Robert Jordan",
+            "fav": "No",
+        },
+        {
+            "quote": "Run when you have to, fight when you must, rest when you can.",
+            "book": "The Eye of the World",
+            "author": "Robert Jordan",
+            "fav": "No",
+        },
+    ]
+    read, added = import_quotes(session, rows, batch_size=3)
+    assert read == len(rows)
+    assert added == 2
+
+    quotes = session.exec(select(Quote).order_by(Quote.id)).all()
+    assert len(quotes) == 3
+    assert quotes[1].fav
+    assert quotes[1].book_id == book.id
+
+    new_book = quotes[2].book
+    assert new_book.title == "The Eye of the World"
+    assert new_book.status == BookStatus.pending
+    assert [author.name for author in new_book.authors] == ["Robert Jordan"]
+
+    read, added = import_quotes(session, rows)
+    assert added == 0
+
+
+def test_import_quotes_loads_existing_quotes_once(session: Session, monkeypatch):
+    book = add_book(session, "The Way of Kings", add_author(session, "Sanderson"))
+    for n in range(10):
+        add_quote(session, book, f"Quote {n}")
+    session.commit()
+
+    loads = []
+    texts = QuoteRepository.texts
+
+    def counted_texts(self, session):
+        loads.append(None)
+        return texts(self, session)
+
+    monkeypatch.setattr(QuoteRepository, "texts", counted_texts)
+
+    # Every batch holds quotes that are already in the library.
+    rows = [
+        {
+            "book": "The Way of Kings",
+            "quote": f"Quote {n}",
+            "author": "Sanderson",
+            "fav": "No",
+        }
+        for n in range(10)
+    ]
+    assert import_quotes(session, rows, batch_size=2) == (10, 0)
+    assert len(loads) == 1
@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import create_engine
+
+import maintenance
+from migrations import migrate
+
+
+def file_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'clibr.db'}")
+    migrate(engine)
+    return engine
+
+
+def test_sweep_orphans(tmp_path):
+    engine = file_engine(tmp_path)
+    with engine.begin() as connection:
+        for statement in [
+            "INSERT INTO author (id, name) VALUES (1, 'Brandon Sanderson')",
+            "INSERT INTO author (id, name) VALUES (2, 'Robert Jordan')",
+            "INSERT INTO author (id, name) VALUES (3, 'Patrick Rothfuss')",
+            "INSERT INTO book (id, title, status, fav) "
+            "VALUES (1, 'Elantris', 'pending', 0)",
+            "INSERT INTO bookauthorlink VALUES (1, 1)",
+            # The book was deleted without its link, quotes or author.
+            "INSERT INTO bookauthorlink VALUES (2, 2)",
+            "INSERT INTO quote (quote, fav, book_id) VALUES ('Kept', 0, 1)",
+            "INSERT INTO quote (quote, fav, book_id) VALUES ('Dangling', 0, 2)",
+            "INSERT INTO quote (quote, fav, book_id) VALUES ('Bookless', 0, NULL)",
+        ]:
+            connection.exec_driver_sql(statement)
+
+    with engine.connect() as connection:
+        assert maintenance.count_orphans(connection) == {
+            "links": 1,
+            "quotes": 2,
+            # Robert Jordan is only orphaned once the dangling link is gone.
+            "authors": 1,
+        }
+
+    expected = {"links": 1, "quotes": 2, "authors": 2}
+    with engine.begin() as connection:
+        assert maintenance.sweep_orphans(connection) == expected
+        assert maintenance.count_orphans(connection) == dict.fromkeys(expected, 0)
+
+        authors = connection.exec_driver_sql("SELECT name FROM author").all()
+        quotes = connection.exec_driver_sql("SELECT quote FROM quote").all()
+
+    assert authors == [("Brandon Sanderson",)]
+    assert quotes == [("Kept",)]
+
+
+def test_incremental_vacuum(tmp_path):
+    engine = file_engine(tmp_path)
+    with engine.begin() as connection:
+        assert maintenance.incremental_vacuum_enabled(connection)
+
+        connection.exec_driver_sql(
+            "CREATE TABLE filler AS "
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+            "WHERE i < 2000) SELECT i, randomblob(512) AS data FROM n"
+        )
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE filler")
+        free = maintenance.storage_report(connection)["free_pages"]
+
+    assert free > 100
+    assert maintenance.incremental_vacuum(engine, step_pages=50, max_steps=1) == 50
+
+    released = maintenance.incremental_vacuum(engine, step_pages=50, max_steps=100)
+    assert released == free - 50
+
+    with engine.connect() as connection:
+        assert maintenance.storage_report(connection)["free_pages"] == 0
+
+
+def test_enable_incremental_vacuum(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'clibr.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE book (id INTEGER PRIMARY KEY)")
+
+    with engine.connect() as connection:
+        assert not maintenance.incremental_vacuum_enabled(connection)
+
+    maintenance.enable_incremental_vacuum(engine)
+
+    with engine.begin() as connection:
+        assert maintenance.incremental_vacuum_enabled(connection)
+        maintenance.analyze(connection)
+
+        report = maintenance.storage_report(connection)
+
+    assert report["pages"] > 0
+    assert "book" in report["tables"]
+
+
+class FailingDbstat:
+    """Connection whose queries of the dbstat table fail with `error`."""
+
+    def __init__(self, connection, error: str):
+        self.connection = connection
+        self.error = error
+
+    def exec_driver_sql(self, statement: str):
+        if "dbstat" in statement:
+            raise OperationalError(statement, (), sqlite3.OperationalError(self.error))
+
+        return self.connection.exec_driver_sql(statement)
+
+
+def test_storage_report_only_ignores_a_missing_dbstat(tmp_path):
+    engine = file_engine(tmp_path)
+    with engine.connect() as connection:
+        report = maintenance.storage_report(
+            FailingDbstat(connection, "no such table: dbstat")
+        )
+        assert report["pages"] > 0
+        assert report["tables"] == {}
+
+        with pytest.raises(OperationalError, match="database is locked"):
+            maintenance.storage_report(FailingDbstat(connection, "database is locked"))
@@ -0,0 +1,134 @@
+from sqlmodel import Session, create_engine
+
+from migrations import LATEST_VERSION, MIGRATIONS, get_version, migrate
+from repositories import QuoteRepository
+
+# Schema of the libraries created before migrations existed.
+UNVERSIONED_SCHEMA = [
+    "CREATE TABLE book (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+    "status VARCHAR(9) NOT NULL, fav BOOLEAN NOT NULL)",
+    "CREATE INDEX ix_book_title ON book (title)",
+    "CREATE TABLE author (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)",
+    "CREATE TABLE bookauthorlink (book_id INTEGER, author_id INTEGER, "
+    "PRIMARY KEY (book_id, author_id))",
+    "CREATE TABLE quote (id INTEGER PRIMARY KEY, quote VARCHAR NOT NULL, "
+    "fav BOOLEAN NOT NULL, book_id INTEGER)",
+    "CREATE INDEX ix_quote_quote ON quote (quote)",
+    "INSERT INTO book VALUES (1, 'The Final Empire', 'pending', 0)",
+    "INSERT INTO author VALUES (1, 'Brandon Sanderson')",
+    "INSERT INTO bookauthorlink VALUES (1, 1)",
+    "INSERT INTO quote VALUES (1, 'Men rarely see their own actions as unjustified.', 0, 1)",
+]
+
+
+def index_names(engine) -> set[str]:
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+        return {name for name, in rows}
+
+
+def test_migrate_new_library():
+    engine = create_engine("sqlite:///:memory:")
+
+    applied = migrate(engine)
+    assert applied == [(LATEST_VERSION, "Create schema")]
+    assert migrate(engine) == []
+
+    with engine.connect() as connection:
+        assert get_version(connection) == LATEST_VERSION
+
+    assert {"ix_author_name", "ix_quote_book_id", "ix_book_status"} <= index_names(
+        engine
+    )
+
+
+def test_migrate_unversioned_library():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        for statement in UNVERSIONED_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+    applied = migrate(engine)
+    assert [number for number, _ in applied] == list(range(1, len(MIGRATIONS) + 1))
+    assert migrate(engine) == []
+    assert {"ix_author_name", "ix_bookauthorlink_author_id", "ix_book_fav"} <= (
+        index_names(engine)
+    )
+
+    with Session(engine) as session:
+        results = QuoteRepository().list(session, words=["unjustified"])
+        assert len(results) == 1
+
+
+def test_migrate_merges_duplicate_keys():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        for statement in UNVERSIONED_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+        for statement in [
+            "INSERT INTO book VALUES (2, 'the  final empire', 'pending', 1)",
+            "INSERT INTO author VALUES (2, 'brandon sanderson')",
+            "INSERT INTO author VALUES (3, 'Robert Jordan')",
+            "INSERT INTO bookauthorlink VALUES (2, 2)",
+            "INSERT INTO bookauthorlink VALUES (2, 3)",
+            "INSERT INTO quote VALUES (2, 'Survive.', 0, 2)",
+        ]:
+            connection.exec_driver_sql(statement)
+
+    migrate(engine)
+
+    with engine.connect() as connection:
+        books = connection.exec_driver_sql("SELECT id, title_key, fav FROM book").all()
+        assert books == [(1, "the final empire", 1)]
+
+        authors = connection.exec_driver_sql(
+            "SELECT id, name_key FROM author ORDER BY id"
+        ).all()
+        assert authors == [(1, "brandon sanderson"), (3, "robert jordan")]
+
+        links = connection.exec_driver_sql(
+            "SELECT book_id, author_id FROM bookauthorlink ORDER BY author_id"
+        ).all()
+        assert links == [(1, 1), (1, 3)]
+
+        quotes = connection.exec_driver_sql("SELECT book_id FROM quote").all()
+        assert quotes == [(1,), (1,)]
+
+    assert {"ix_author_name_key", "ix_book_title_key"} <= index_names(engine)
+
+
+def test_generation_counter():
+    engine = create_engine("sqlite:///:memory:")
+    migrate(engine)
+
+    def generation():
+        with engine.connect() as connection:
+            return connection.exec_driver_sql(
+                "SELECT value FROM data_generation"
+            ).scalar()
+
+    assert generation() == 0
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, status, fav) "
+            "VALUES (1, 'The Final Empire', 'pending', 0)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO author (id, name) VALUES (1, 'Brandon Sanderson')"
+        )
+        connection.exec_driver_sql("INSERT INTO bookauthorlink VALUES (1, 1)")
+        connection.exec_driver_sql(
+            "INSERT INTO quote (quote, fav, book_id) VALUES ('Survive.', 0, 1)"
+        )
+
+    assert generation() == 4
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE book SET fav = 1")
+        connection.exec_driver_sql("DELETE FROM quote")
+
+    assert generation() == 6
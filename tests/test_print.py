@@ -0,0 +1,80 @@
+import io
+import json
+import subprocess
+
+from rich.console import Console
+
+from commands import print as output
+from commands.print import OutputFormat, write_books_output, write_quotes_output
+from models import Author, Book, BookStatus, Quote
+
+
+def test_write_books_output():
+    results = [
+        {
+            "Book": Book(id=1, title='The "Final" Empire', status=BookStatus.reading),
+            "Author": Author(id=1, name="Brandon Sanderson"),
+        },
+        {
+            "Book": Book(id=2, title="Elantris", status="pending", fav=True),
+            "Author": Author(id=1, name="Brandon Sanderson"),
+        },
+    ]
+
+    stream = io.StringIO()
+    write_books_output(results, OutputFormat.csv, stream)
+    assert stream.getvalue().splitlines() == [
+        "id,title,author,status,fav",
+        '1,"The ""Final"" Empire",Brandon Sanderson,reading,No',
+        "2,Elantris,Brandon Sanderson,pending,Yes",
+    ]
+
+    stream = io.StringIO()
+    write_books_output(results, OutputFormat.tsv, stream)
+    assert stream.getvalue().splitlines()[2] == (
+        "2\tElantris\tBrandon Sanderson\tpending\tYes"
+    )
+
+    stream = io.StringIO()
+    write_books_output(results, OutputFormat.jsonl, stream)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[0] == {
+        "id": 1,
+        "title": 'The "Final" Empire',
+        "author": "Brandon Sanderson",
+        "status": "reading",
+        "fav": False,
+    }
+
+
+def test_write_quotes_output():
+    book = Book(id=1, title="Elantris")
+    results = [
+        {
+            "Quote": Quote(id=1, quote="Hope,\nand more hope", book_id=1, fav=True),
+            "Book": book,
+            "Author": Author(id=1, name="Brandon Sanderson"),
+        },
+    ]
+
+    stream = io.StringIO()
+    write_quotes_output(results, OutputFormat.csv, stream)
+    assert stream.getvalue() == (
+        "id,book,quote,author,fav\n"
+        '1,Elantris,"Hope,\nand more hope",Brandon Sanderson,Yes\n'
+    )
+
+    stream = io.StringIO()
+    write_quotes_output(results, OutputFormat.jsonl, stream)
+    assert json.loads(stream.getvalue())["quote"] == "Hope,\nand more hope"
+
+
+def test_empty_pager_turns_paging_off(monkeypatch):
+    def popen(*args, **kwargs):
+        raise AssertionError("no pager should be started")
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    console = Console(file=io.StringIO(), force_terminal=True)
+    for pager in ["", "  "]:
+        monkeypatch.setenv("PAGER", pager)
+        assert output._open_pager(console) is None
@@ -0,0 +1,39 @@
+from sqlmodel import Session, create_engine
+
+import profiling
+from migrations import migrate
+from repositories import BookRepository
+
+from .utils import add_author, add_book
+
+
+def test_instrument_records_statements(monkeypatch):
+    monkeypatch.setattr(profiling, "_statements", {})
+    monkeypatch.setattr(profiling, "_phases", profiling.defaultdict(float))
+    monkeypatch.setattr(profiling, "_stack", ["command"])
+
+    engine = create_engine("sqlite:///:memory:")
+    profiling.instrument(engine)
+    migrate(engine)
+
+    with Session(engine) as session:
+        author = add_author(session, "Ursula K. Le Guin")
+        add_book(session, "The Dispossessed", author)
+        add_book(session, "The Lathe of Heaven", author)
+        session.commit()
+
+        rows = list(
+            profiling.rows(BookRepository().list(session, chunk_size=1), "hydration")
+        )
+        assert len(rows) == 2
+
+    statements = [
+        statement
+        for statement in profiling._statements.values()
+        if statement.sql.startswith("SELECT book.id")
+    ]
+    assert len(statements) == 1
+    assert statements[0].calls == 1
+    assert statements[0].rows == 2
+    assert profiling._phases["query"] > 0
+    assert profiling._stack == ["command"]
@@ -1,7 +1,9 @@
+import random
+
 from sqlmodel import Session, select
 
 from models import Quote
-from repositories import QuoteRepository
+from repositories import QuoteOrder, QuoteRepository
 
 from .utils import add_author, add_book, add_quote, session
 
@@ -159,3 +161,248 @@ def test_quote_repository_list_by_fav(session: Session):
 
     results = quote_repo.list(session, fav=True)
     assert len(results) == 1
+
+
+def test_quote_repository_list_by_words(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    quote_repo = QuoteRepository()
+
+    quotes = [
+        "You should try not to talk so much, friend. You'll sound far less stupid that way",
+        "I've always been very confident in my immaturity.",
+        "Men rarely see their own actions as unjustified.",
+    ]
+    for quote in quotes:
+        add_quote(session, book, quote)
+
+    session.commit()
+
+    results = quote_repo.list(session, words=["immaturity"])
+    assert len(results) == 1
+    assert results[0]["Quote"].quote == quotes[1]
+
+    results = quote_repo.list(session, words=["immatur*", "friend"])
+    assert len(results) == 2
+
+    results = quote_repo.list(session, words=["their own actions"])
+    assert len(results) == 1
+    assert results[0]["Quote"].quote == quotes[2]
+
+    results = quote_repo.list(session, words=["own their actions"])
+    assert len(results) == 0
+
+
+def test_quote_repository_list_by_words_is_kept_in_sync(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "Elantris", author)
+    quote_repo = QuoteRepository()
+
+    quote = add_quote(session, book, "the past need not become our future as well.")
+    session.commit()
+
+    quote_repo.update(
+        session,
+        quote.id,
+        new_text="Remember, the past need not become our future as well.",
+    )
+    session.commit()
+    assert len(quote_repo.list(session, words=["remember"])) == 1
+
+    quote_repo.delete(session, quote.id)
+    session.commit()
+    assert len(quote_repo.list(session, words=["remember"])) == 0
+
+
+def test_quote_repository_export_rows(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    quote_repo = QuoteRepository()
+
+    quotes = [
+        "I've always been very confident in my immaturity.",
+        "Men rarely see their own actions as unjustified.",
+    ]
+    for quote in quotes:
+        add_quote(session, book, quote, fav=quote == quotes[-1])
+
+    session.commit()
+
+    assert quote_repo.count_export_rows(session) == len(quotes)
+
+    rows = list(quote_repo.export_rows(session, chunk_size=1))
+    assert [tuple(row) for row in rows] == [
+        (1, quotes[0], "The Final Empire", "Brandon Sanderson", False),
+        (2, quotes[1], "The Final Empire", "Brandon Sanderson", True),
+    ]
+
+
+def test_quote_repository_list_pages(session: Session):
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    other_book = add_book(session, "Elantris", author)
+    quote_repo = QuoteRepository()
+
+    quotes = [
+        "You should try not to talk so much, friend. You'll sound far less stupid that way",
+        "I've always been very confident in my immaturity.",
+        "Men rarely see their own actions as unjustified.",
+        "The most important step a man can take. It's not the first one, is it?",
+        "Sometimes, the prize is not worth the costs.",
+    ]
+    for quote in quotes:
+        add_quote(session, book, quote)
+
+    add_quote(session, other_book, "The past need not become our future.")
+    session.commit()
+
+    searches = [None, ["the", "not", "confident"]]
+    for words in searches:
+        for order_by in [None, *QuoteOrder]:
+            for reverse_order in [False, True]:
+                expected = quote_repo.list(
+                    session,
+                    words=words,
+                    order_by=order_by,
+                    reverse_order=reverse_order,
+                )
+
+                pages = []
+                after = None
+                while True:
+                    page = quote_repo.list(
+                        session,
+                        words=words,
+                        order_by=order_by,
+                        reverse_order=reverse_order,
+                        limit=2,
+                        after=after,
+                    )
+                    if not page:
+                        break
+
+                    pages.extend(page)
+                    after = quote_repo.cursor(page[-1], order_by)
+
+                assert [row["Quote"].id for row in pages] == [
+                    row["Quote"].id for row in expected
+                ]
+
+
+def test_quote_repository_count(session: Session):
+    quote_repo = QuoteRepository()
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    brandon_book = add_book(session, "The Final Empire", author_brandon)
+    shared_book = add_book(session, "A Memory of Light", author_jordan)
+    shared_book.authors.append(author_brandon)
+
+    add_quote(session, brandon_book, "Men rarely see their own actions as unjustified.")
+    add_quote(
+        session, brandon_book, "I've always been very confident in my immaturity."
+    )
+    add_quote(session, shared_book, "Death is lighter than a feather.", fav=True)
+    session.commit()
+
+    assert len(quote_repo.list(session)) == 4
+    assert quote_repo.count(session) == 3
+    assert quote_repo.count(session, book_id=brandon_book.id) == 2
+    assert quote_repo.count(session, author_id=author_brandon.id) == 3
+    assert quote_repo.count(session, author_id=author_jordan.id) == 1
+    assert quote_repo.count(session, words=["feather", "immaturity"]) == 2
+    assert quote_repo.count(session, fav=True) == 1
+
+    results = quote_repo.list(session, book_id=shared_book.id)
+    assert {row["Quote"].quote for row in results} == {
+        "Death is lighter than a feather."
+    }
+
+
+def test_quote_repository_delete_matching(session: Session):
+    quote_repo = QuoteRepository()
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    first = add_quote(session, book, "Men rarely see their own actions as unjustified.")
+    second = add_quote(
+        session, book, "I've always been very confident in my immaturity."
+    )
+    add_quote(session, book, "Death is lighter than a feather.", fav=True)
+    session.commit()
+    first_id, second_id = first.id, second.id
+
+    assert quote_repo.delete_matching(session, fav=True) == 1
+    assert quote_repo.delete_matching(session, words=["feather"]) == 0
+    assert quote_repo.delete_matching(session, ids=[(first_id, first_id)]) == 1
+    session.commit()
+
+    remaining = session.exec(select(Quote.id)).all()
+    assert remaining == [second_id]
+    assert quote_repo.count(session, ids=[(first_id, second_id + 1)]) == 1
+
+
+def test_quote_repository_update_matching(session: Session):
+    quote_repo = QuoteRepository()
+    author = add_author(session, "Brandon Sanderson")
+    book = add_book(session, "The Final Empire", author)
+    other_book = add_book(session, "The Well of Ascension", author)
+    add_quote(session, book, "Men rarely see their own actions as unjustified.")
+    add_quote(session, book, "I've always been very confident in my immaturity.")
+    add_quote(session, book, "Death is lighter than a feather.", fav=True)
+    session.commit()
+
+    updated = quote_repo.update_matching(
+        session,
+        {"book_id": other_book.id, "fav": True},
+        words=["unjustified", "immaturity"],
+    )
+    assert updated == 2
+    session.commit()
+
+    assert quote_repo.count(session, book_id=other_book.id) == 2
+    assert quote_repo.count(session, fav=True) == 3
+
+
+def test_quote_repository_sample(session: Session):
+    quote_repo = QuoteRepository()
+    sanderson = add_author(session, "Brandon Sanderson")
+    jordan = add_author(session, "Robert Jordan")
+    elantris = add_book(session, "Elantris", sanderson)
+    eye = add_book(session, "The Eye of the World", jordan)
+    quotes = [
+        add_quote(session, elantris if i % 2 else eye, f"Quote {i}", fav=i % 5 == 0)
+        for i in range(40)
+    ]
+    session.commit()
+
+    # Leave gaps in the IDs.
+    for quote in quotes[10:30]:
+        session.delete(quote)
+    session.commit()
+
+    rng = random.Random(0)
+    results = quote_repo.sample(session, 5, rng=rng)
+    ids = [result["Quote"].id for result in results]
+    assert len(set(ids)) == 5
+
+    results = quote_repo.sample(session, 100, author_id=jordan.id, rng=rng)
+    assert sorted(result["Quote"].quote for result in results) == sorted(
+        f"Quote {i}" for i in [*range(0, 10, 2), *range(30, 40, 2)]
+    )
+    assert {result["Author"].name for result in results} == {"Robert Jordan"}
+
+    results = quote_repo.sample(session, 3, book_id=elantris.id, fav=True, rng=rng)
+    assert sorted(result["Quote"].quote for result in results) == [
+        "Quote 35",
+        "Quote 5",
+    ]
+
+    favs = sum(
+        result["Quote"].fav
+        for _ in range(300)
+        for result in quote_repo.sample(session, 1, fav_weight=20, rng=rng)
+    )
+    assert favs > 200
+
+
+def test_quote_repository_sample_empty(session: Session):
+    assert QuoteRepository().sample(session, 3) == []
@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def clibr(tmp_path: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(ROOT / "main.py"), *args],
+        cwd=ROOT,
+        env=os.environ | {"XDG_CONFIG_HOME": str(tmp_path), "CLIBR_NO_DAEMON": "1"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def test_quote_text_is_only_set_on_a_single_quote(tmp_path):
+    clibr(tmp_path, "books", "add", "-t", "Dune", "-a", "Frank Herbert")
+    for quote in ["Fear is the mind-killer.", "The spice must flow."]:
+        clibr(tmp_path, "quotes", "add", "-q", quote, "-t", "Dune")
+
+    for selection in [["--where", "book=Dune"], ["--id", "1-2"], ["--id", "1,2"]]:
+        process = clibr(tmp_path, "quotes", "update", *selection, "-q", "Same")
+        assert "a quote can only be set on a single quote" in process.stderr
+
+    process = clibr(tmp_path, "quotes", "update", "--id", "2", "--set", "quote=Spice")
+    assert "1 quotes have been updated" in process.stdout
+
+    db = sqlite3.connect(tmp_path / "clibr" / "clibr.db")
+    quotes = db.execute("SELECT quote FROM quote ORDER BY id").fetchall()
+    db.close()
+
+    assert quotes == [("Fear is the mind-killer.",), ("Spice",)]
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def imported_modules(*args: str) -> set[str]:
+    script = (
+        "import sys, main\n"
+        f"try: main.app({list(args)!r})\n"
+        "except SystemExit: pass\n"
+        "print(' '.join(sys.modules), file=sys.stderr)\n"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(process.stderr.split())
+
+
+def test_help_does_not_import_the_database_layer():
+    for args in [(), ("--help",)]:
+        modules = imported_modules(*args)
+        assert "main" in modules
+        assert "sqlalchemy" not in modules
+        assert "commands.books" not in modules
+        assert "commands.quotes" not in modules
+
+
+def test_commands_only_import_their_own_module():
+    modules = imported_modules("quotes", "--help")
+    assert "commands.quotes" in modules
+    assert "commands.books" not in modules
+
+
+def test_startup_timing_is_reported_with_help():
+    process = subprocess.run(
+        [sys.executable, "main.py", "--startup-timing", "--help"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "Usage" in process.stdout
+    lines = process.stderr.splitlines()
+    assert lines[0].startswith("imports")
+    assert lines[-1].startswith("total")
+
+
+def test_groups_load_their_own_commands():
+    script = (
+        "import main, typer\n"
+        "first, second = (typer.main.get_command(main.app) for _ in range(2))\n"
+        "ctx = first.make_context('clibr', [])\n"
+        "assert first.get_command(ctx, 'stats') is first.get_command(ctx, 'stats')\n"
+        "assert second._loaded == {}\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
@@ -0,0 +1,54 @@
+from sqlmodel import Session
+
+from models import BookStatus
+from repositories import StatsRepository
+
+from .utils import add_author, add_book, add_quote, session
+
+
+def test_stats_repository_summary_empty(session: Session):
+    stats = StatsRepository().summary(session)
+    assert stats["books"] == 0
+    assert stats["quotes"] == 0
+    assert stats["quotes_per_book"] == 0
+    assert stats["books_per_author"] == 0
+    assert all(count == 0 for count in stats["by_status"].values())
+
+
+def test_stats_repository_summary(session: Session):
+    author_brandon = add_author(session, "Brandon Sanderson")
+    author_jordan = add_author(session, "Robert Jordan")
+    add_author(session, "Patrick Rothfuss")
+    elantris = add_book(session, "Elantris", author_brandon, fav=True)
+    add_book(session, "Warbreaker", author_brandon, status=BookStatus.finished)
+    shared_book = add_book(
+        session,
+        "A Memory of Light",
+        author_jordan,
+        status=BookStatus.finished,
+        fav=True,
+    )
+    shared_book.authors.append(author_brandon)
+
+    add_quote(session, elantris, "Remember, the past need not become our future.")
+    add_quote(session, elantris, "Hope is the only thing worth having.", fav=True)
+    add_quote(session, shared_book, "Death is lighter than a feather.")
+    session.commit()
+
+    stats = StatsRepository().summary(session)
+    assert stats["books"] == 3
+    assert stats["fav_books"] == 2
+    assert stats["by_status"][BookStatus.pending] == 1
+    assert stats["by_status"][BookStatus.finished] == 2
+    assert stats["by_status"][BookStatus.reading] == 0
+
+    assert stats["quotes"] == 3
+    assert stats["fav_quotes"] == 1
+    assert stats["books_with_quotes"] == 2
+    assert stats["max_quotes_per_book"] == 2
+    assert stats["quotes_per_book"] == 1.5
+
+    assert stats["authors"] == 3
+    assert stats["authors_with_books"] == 2
+    assert stats["max_books_per_author"] == 3
+    assert stats["books_per_author"] == 2
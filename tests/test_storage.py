@@ -0,0 +1,71 @@
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+
+import config
+import storage
+
+
+def pragma(connection, name: str):
+    return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_configure_applies_the_current_profile(tmp_path):
+    current = storage.PROFILES["balanced"]
+    engine = create_engine(f"sqlite:///{tmp_path / 'clibr.db'}", poolclass=QueuePool)
+    storage.configure(engine, lambda: current)
+
+    with engine.connect() as connection:
+        assert pragma(connection, "journal_mode") == "wal"
+        assert pragma(connection, "synchronous") == 1
+        assert pragma(connection, "cache_size") == -16 * 1024
+        assert pragma(connection, "temp_store") == 2
+        assert pragma(connection, "busy_timeout") == 5000
+
+    # Pooled connections switch profiles the next time they are used.
+    current = storage.PROFILES["bulk"]
+    with engine.connect() as connection:
+        assert pragma(connection, "synchronous") == 0
+        assert pragma(connection, "cache_size") == -64 * 1024
+
+    engine.dispose()
+
+
+def test_storage_profile_from_environment_and_config_file(tmp_path, monkeypatch):
+    cfg = config.Config()
+    monkeypatch.setattr(cfg, "CONFIG_PATH", tmp_path / "config.toml")
+    monkeypatch.delenv("CLIBR_STORAGE_PROFILE", raising=False)
+    assert cfg._storage_profile_name() == storage.DEFAULT_PROFILE
+
+    cfg.CONFIG_PATH.write_text('storage_profile = "safe"\n')
+    assert cfg._storage_profile_name() == "safe"
+
+    monkeypatch.setenv("CLIBR_STORAGE_PROFILE", "bulk")
+    assert cfg._storage_profile_name() == "bulk"
+
+    monkeypatch.setenv("CLIBR_STORAGE_PROFILE", "fastest")
+    assert cfg._storage_profile_name() == storage.DEFAULT_PROFILE
+
+
+def test_invalid_storage_profile_in_config_file(tmp_path, monkeypatch, capsys):
+    cfg = config.Config()
+    monkeypatch.setattr(cfg, "CONFIG_PATH", tmp_path / "config.toml")
+    monkeypatch.delenv("CLIBR_STORAGE_PROFILE", raising=False)
+
+    cfg.CONFIG_PATH.write_text("storage_profile = safe\n")
+    assert cfg._storage_profile_name() == storage.DEFAULT_PROFILE
+    assert "Can't read" in capsys.readouterr().err
+
+    for value in ["1", '["safe"]', '{ name = "safe" }']:
+        cfg.CONFIG_PATH.write_text(f"storage_profile = {value}\n")
+        assert cfg._storage_profile_name() == storage.DEFAULT_PROFILE
+        assert "Unknown storage profile" in capsys.readouterr().err
+
+
+def test_storage_profile_is_switched_for_a_block(monkeypatch):
+    cfg = config.Config()
+    monkeypatch.setattr(cfg, "STORAGE_PROFILE", "balanced")
+
+    with cfg.storage_profile("bulk"):
+        assert cfg.STORAGE_PROFILE == "bulk"
+
+    assert cfg.STORAGE_PROFILE == "balanced"
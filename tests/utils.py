@@ -1,6 +1,7 @@
 import pytest
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, create_engine
 
+from migrations import migrate
 from models import Author, Book, BookStatus, Quote
 from repositories import BookRepository, QuoteRepository, AuthorRepository
 
@@ -8,7 +9,7 @@ from repositories import BookRepository, QuoteRepository, AuthorRepository
 @pytest.fixture
 def session():
     test_engine = create_engine("sqlite:///:memory:")
-    SQLModel.metadata.create_all(test_engine)
+    migrate(test_engine)
 
     with Session(test_engine) as session:
         yield session
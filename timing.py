@@ -0,0 +1,29 @@
+import sys
+import time
+
+_START = time.perf_counter()
+_marks: list[tuple[str, float]] = []
+
+
+def mark(label: str) -> None:
+    """
+    Records that the startup phase called `label` has just finished.
+    """
+
+    _marks.append((label, time.perf_counter()))
+
+
+def elapsed() -> float:
+    return time.perf_counter() - _START
+
+
+def report() -> None:
+    previous = _START
+    lines = []
+    for label, at in _marks:
+        lines.append(f"{label:<24}{(at - previous) * 1000:>10.1f} ms")
+        previous = at
+
+    total = time.perf_counter() - _START
+    lines.append(f"{'total':<24}{total * 1000:>10.1f} ms")
+    print("\n".join(lines), file=sys.stderr)